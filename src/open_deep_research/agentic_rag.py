@@ -1,7 +1,9 @@
 import os
 import logging
 import json
-from typing import Annotated, Literal, Sequence, List, Optional, Union
+import threading
+import time
+from typing import Annotated, Dict, Literal, Sequence, List, Optional, Tuple, Union
 from typing_extensions import TypedDict
 from pathlib import Path
 
@@ -12,8 +14,7 @@ logger = logging.getLogger(__name__)
 # 导入必要的库
 from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader, DirectoryLoader
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.tools.retriever import create_retriever_tool
 from langchain_core.messages import BaseMessage, HumanMessage
@@ -24,6 +25,66 @@ from langgraph.graph import END, StateGraph, START
 from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
 
+from open_deep_research.model_registry import get_chat_model
+from open_deep_research.llm_scheduler import scheduled_invoke
+
+# 进程级的知识库向量库缓存：目录路径 -> (目录签名, 分块参数, 向量库)
+_directory_vectorstores: Dict[str, Tuple[tuple, tuple, Chroma]] = {}
+_directory_vectorstores_lock = threading.Lock()
+
+# 目录签名缓存：目录路径 -> (计算时间, 签名)，避免每次查询都遍历文件系统
+_directory_signatures: Dict[str, Tuple[float, tuple]] = {}
+_directory_signatures_lock = threading.Lock()
+# 查询路径上允许复用的签名最长时间（秒）
+SIGNATURE_MAX_AGE = 5.0
+
+def directory_signature(directory_path: str, max_age: float = 0.0) -> tuple:
+    """
+    计算目录中PDF文件的签名（路径、修改时间、大小），文件变化时签名随之变化
+
+    参数:
+        directory_path: PDF文件目录
+        max_age: 允许复用的缓存签名最长时间（秒），为0时总是重新遍历目录
+
+    返回:
+        签名元组，目录不存在或没有PDF时为空元组
+    """
+    key = os.path.abspath(directory_path)
+    now = time.monotonic()
+    if max_age > 0:
+        with _directory_signatures_lock:
+            cached = _directory_signatures.get(key)
+        if cached is not None and now - cached[0] <= max_age:
+            return cached[1]
+    entries = []
+    for root, _, files in os.walk(directory_path):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((path, stat.st_mtime, stat.st_size))
+    signature = tuple(sorted(entries))
+    with _directory_signatures_lock:
+        _directory_signatures[key] = (now, signature)
+    return signature
+
+def get_cached_vectorstore(directory_path: str) -> Optional[Chroma]:
+    """
+    获取已为该目录构建且仍与目录内容一致的向量库
+
+    参数:
+        directory_path: PDF文件目录
+
+    返回:
+        向量库，未构建或目录内容已变化时返回None
+    """
+    key = os.path.abspath(directory_path)
+    with _directory_vectorstores_lock:
+        cached = _directory_vectorstores.get(key)
+    if cached is None or cached[0] != directory_signature(directory_path, max_age=SIGNATURE_MAX_AGE):
+        return None
+    return cached[2]
+
 class AgenticRAG:
     """
     Agentic RAG系统类，用于集成所有组件
@@ -61,11 +122,12 @@ class AgenticRAG:
     
     def _initialize_model(self):
         """初始化LLM模型"""
+        # 通过模型注册表复用进程内已创建的模型实例
         if self.model_provider == "openai":
-            self.llm = ChatOpenAI(temperature=0, model=self.model_name)
+            self.llm = get_chat_model(self.model_name, "openai", temperature=0)
             logger.info(f"已初始化OpenAI模型: {self.model_name}")
         elif self.model_provider == "google_genai":
-            self.llm = ChatGoogleGenerativeAI(temperature=0, model=self.model_name)
+            self.llm = get_chat_model(self.model_name, "google_genai", temperature=0)
             logger.info(f"已初始化Gemini模型: {self.model_name}")
         else:
             raise ValueError(f"不支持的模型提供商: {self.model_provider}，目前支持 'openai' 或 'gemini'")
@@ -140,6 +202,16 @@ class AgenticRAG:
         """
         logger.info("正在创建检索器...")
         
+        # 只从目录加载时，复用之前为同一目录（内容未变化）构建的向量库
+        directory_only = bool(pdf_directory) and not (urls or pdf_paths or docs)
+        if directory_only:
+            with _directory_vectorstores_lock:
+                cached = _directory_vectorstores.get(os.path.abspath(pdf_directory))
+            if cached is not None and cached[1] == (chunk_size, chunk_overlap) \
+                    and cached[0] == directory_signature(pdf_directory):
+                logger.info(f"复用目录 {pdf_directory} 的向量库")
+                return self._set_retriever(cached[2])
+        
         all_docs = []
         
         # 处理各种输入源
@@ -184,6 +256,15 @@ class AgenticRAG:
             collection_name="agentic-rag-store",
             embedding=OpenAIEmbeddings(),
         )
+        if directory_only:
+            with _directory_vectorstores_lock:
+                _directory_vectorstores[os.path.abspath(pdf_directory)] = (
+                    directory_signature(pdf_directory), (chunk_size, chunk_overlap), vectorstore
+                )
+        return self._set_retriever(vectorstore)
+    
+    def _set_retriever(self, vectorstore: Chroma):
+        """根据向量库设置检索器和检索工具"""
         self.retriever = vectorstore.as_retriever()
         
         # 创建检索工具
@@ -229,7 +310,7 @@ class AgenticRAG:
             logger.info("调用代理")
             messages = state["messages"]
             model_with_tools = self.llm.bind_tools(self.tools)
-            response = model_with_tools.invoke(messages)
+            response = scheduled_invoke(model_with_tools, messages, self.model_provider)
             return {"messages": [response]}
         
         def grade_documents(state) -> Literal["generate", "rewrite"]:
@@ -257,7 +338,7 @@ class AgenticRAG:
             question = messages[0].content
             docs = messages[-1].content
             
-            scored_result = chain.invoke({"question": question, "context": docs})
+            scored_result = scheduled_invoke(chain, {"question": question, "context": docs}, self.model_provider)
             score = scored_result.binary_score
             
             if score == "yes":
@@ -285,7 +366,7 @@ class AgenticRAG:
                 )
             ]
             
-            response = self.llm.invoke(msg)
+            response = scheduled_invoke(self.llm, msg, self.model_provider)
             return {"messages": [response]}
         
         def generate(state):
@@ -305,7 +386,7 @@ class AgenticRAG:
             
             rag_chain = prompt | self.llm | StrOutputParser()
             
-            response = rag_chain.invoke({"context": docs, "question": question})
+            response = scheduled_invoke(rag_chain, {"context": docs, "question": question}, self.model_provider)
             return {"messages": [response]}
         
         # 定义图
@@ -380,6 +461,38 @@ class AgenticRAG:
         else:
             return final_answer
     
+    async def arun(self, query):
+        """
+        异步运行系统回答查询
+        
+        参数:
+            query: 用户查询
+        
+        返回:
+            回答内容
+        """
+        if not self.graph:
+            raise ValueError("请先构建工作流图")
+        
+        logger.info(f"异步处理查询: {query}")
+        
+        # 准备输入
+        inputs = {
+            "messages": [
+                HumanMessage(content=query),
+            ]
+        }
+        
+        # 异步执行，不阻塞调用方的事件循环
+        response = await self.graph.ainvoke(inputs)
+        
+        # 提取最终回答
+        final_answer = response["messages"][-1]
+        if hasattr(final_answer, 'content'):
+            return final_answer.content
+        else:
+            return final_answer
+    
     def stream_run(self, query):
         """
         流式运行系统回答查询，展示中间步骤
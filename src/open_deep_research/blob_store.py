@@ -0,0 +1,163 @@
+import os
+import zlib
+import hashlib
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+from open_deep_research.state import Section, Source
+
+# 图状态中的大文本字段被替换为此前缀开头的引用
+BLOB_REF_PREFIX = "blob:sha256:"
+
+class BlobStore:
+    """
+    本地内容寻址的Blob存储
+
+    文本按其SHA-256哈希存储一次（zlib压缩），图状态中只保留形如
+    "blob:sha256:<hash>"的引用，从而减少检查点体积和Send扇出时复制的数据量。
+    相同内容只会写入一次，写入通过临时文件+原子替换完成，可被多个线程并发使用。
+    """
+
+    def __init__(self, root: str):
+        """
+        初始化Blob存储
+
+        参数:
+            root: 存储目录，不存在时自动创建
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        # 使用哈希前两位作为子目录，避免单个目录下文件过多
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, text: str) -> str:
+        """
+        存储文本并返回其引用
+
+        参数:
+            text: 要存储的文本
+
+        返回:
+            Blob引用字符串
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(zlib.compress(data))
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return BLOB_REF_PREFIX + digest
+
+    def get(self, ref: str) -> str:
+        """
+        根据引用读取文本
+
+        参数:
+            ref: Blob引用字符串
+
+        返回:
+            原始文本
+        """
+        digest = ref[len(BLOB_REF_PREFIX):]
+        try:
+            with open(self._path(digest), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(f"Blob存储 {self.root} 中不存在: {ref}") from None
+
+# 进程级的Blob存储实例，按目录复用
+_blob_stores: Dict[str, BlobStore] = {}
+_blob_stores_lock = threading.Lock()
+
+def get_blob_store(root: str) -> BlobStore:
+    """获取（必要时创建）指定目录的Blob存储"""
+    root = os.path.abspath(root)
+    with _blob_stores_lock:
+        store = _blob_stores.get(root)
+        if store is None:
+            store = _blob_stores[root] = BlobStore(root)
+        return store
+
+def is_blob_ref(value) -> bool:
+    """判断一个值是否为Blob引用"""
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+def store_text(text: Optional[str], configurable) -> Optional[str]:
+    """
+    如果启用了Blob存储且文本足够大，则存储文本并返回引用，否则原样返回
+
+    参数:
+        text: 要存储的文本
+        configurable: 当前运行的Configuration
+
+    返回:
+        Blob引用或原始文本
+    """
+    if not configurable.blob_store_path or not text or is_blob_ref(text):
+        return text
+    if len(text.encode("utf-8")) < int(configurable.blob_min_size):
+        return text
+    return get_blob_store(configurable.blob_store_path).put(text)
+
+def load_text(value: Optional[str], configurable) -> Optional[str]:
+    """
+    如果值是Blob引用则读取原始文本，否则原样返回
+
+    参数:
+        value: Blob引用或文本
+        configurable: 当前运行的Configuration
+
+    返回:
+        原始文本
+    """
+    if not is_blob_ref(value):
+        return value
+    if not configurable.blob_store_path:
+        raise ValueError(f"遇到Blob引用 {value}，但未配置blob_store_path")
+    return get_blob_store(configurable.blob_store_path).get(value)
+
+def store_sources(sources: List[Source], configurable) -> List[Source]:
+    """将来源的内容和全文存入Blob存储，返回只包含引用的来源副本"""
+    if not configurable.blob_store_path:
+        return sources
+    return [
+        source.model_copy(update={
+            "content": store_text(source.content, configurable),
+            "raw_content": store_text(source.raw_content, configurable)
+        })
+        for source in sources
+    ]
+
+def load_sources(sources: List[Source], configurable) -> List[Source]:
+    """将来源中的Blob引用还原为原始文本"""
+    return [
+        source.model_copy(update={
+            "content": load_text(source.content, configurable),
+            "raw_content": load_text(source.raw_content, configurable)
+        })
+        if is_blob_ref(source.content) or is_blob_ref(source.raw_content) else source
+        for source in sources
+    ]
+
+def store_section(section: Section, configurable) -> Section:
+    """返回章节内容已存入Blob存储的章节副本"""
+    if not configurable.blob_store_path:
+        return section
+    return section.model_copy(update={"content": store_text(section.content, configurable)})
+
+def load_section(section: Section, configurable) -> Section:
+    """返回章节内容已还原为原始文本的章节副本"""
+    if not is_blob_ref(section.content):
+        return section
+    return section.model_copy(update={"content": load_text(section.content, configurable)})
@@ -0,0 +1,407 @@
+import os
+import zlib
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+# 小于该字节数的数据不压缩（压缩收益抵不上开销）
+_COMPRESS_MIN_SIZE = 256
+# 压缩后的类型标记后缀
+_COMPRESSED_SUFFIX = "+zlib"
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    基于SQLite的持久化检查点存储
+
+    图状态在每个超步后写入本地数据库（WAL模式），进程崩溃或中断后用同一个thread_id
+    重新调用图即可从最后一个检查点继续：已完成的并行章节任务作为待写入结果保存在检查点中，
+    恢复时不会重新执行，只有未完成的章节会重新运行。
+    与InMemorySaver一样，各通道的值按版本单独存储，每个检查点只写入发生变化的通道；
+    较大的序列化数据用zlib压缩。
+    """
+
+    def __init__(self, database_path: str):
+        """
+        初始化检查点存储
+
+        参数:
+            database_path: SQLite数据库文件路径
+        """
+        super().__init__()
+        directory = os.path.dirname(os.path.abspath(database_path))
+        os.makedirs(directory, exist_ok=True)
+        self.database_path = database_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL模式下NORMAL同步级别仍能保证崩溃后数据库一致，只是最后一次提交可能丢失
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                type TEXT NOT NULL,
+                blob BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT NOT NULL,
+                blob BLOB NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+        """)
+        self._conn.commit()
+
+    def __repr__(self) -> str:
+        return f"SQLiteCheckpointSaver({self.database_path!r})"
+
+    # 序列化
+
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= _COMPRESS_MIN_SIZE:
+            return type_ + _COMPRESSED_SUFFIX, zlib.compress(data)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.endswith(_COMPRESSED_SUFFIX):
+            type_, data = type_[:-len(_COMPRESSED_SUFFIX)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # 读取
+
+    def _load_channel_values(self, thread_id: str, checkpoint_ns: str,
+                             versions: ChannelVersions) -> Dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            row = self._conn.execute(
+                """SELECT type, blob FROM checkpoint_blobs
+                   WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?""",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row and row[0] != "empty":
+                values[channel] = row
+        return values
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[tuple]:
+        return self._conn.execute(
+            """SELECT task_id, channel, type, blob FROM checkpoint_writes
+               WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+               ORDER BY task_id, idx""",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+    def _build_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        """由checkpoints表的一行构造检查点元组（需持有锁）"""
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint: Checkpoint = self._loads(type_, checkpoint_blob)
+        channel_values = self._load_channel_values(thread_id, checkpoint_ns, checkpoint["channel_versions"])
+        writes = self._load_writes(thread_id, checkpoint_ns, checkpoint_id)
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": {k: self._loads(*v) for k, v in channel_values.items()},
+            },
+            metadata=self._loads(metadata_type, metadata_blob),
+            pending_writes=[(task_id, channel, self._loads(t, blob)) for task_id, channel, t, blob in writes],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        获取检查点，配置中带checkpoint_id时获取该检查点，否则获取该线程最新的检查点
+
+        参数:
+            config: 包含thread_id（及可选的checkpoint_ns、checkpoint_id）的配置
+
+        返回:
+            检查点元组，不存在时返回None
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"""SELECT {columns} FROM checkpoints
+                        WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?""",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"""SELECT {columns} FROM checkpoints
+                        WHERE thread_id = ? AND checkpoint_ns = ?
+                        ORDER BY checkpoint_id DESC LIMIT 1""",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            if row is None:
+                return None
+            return self._build_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """
+        按时间倒序列出检查点
+
+        参数:
+            config: 按thread_id、checkpoint_ns、checkpoint_id过滤
+            filter: 按元数据字段过滤
+            before: 只列出该检查点之前的检查点
+            limit: 最多返回的数量
+        """
+        conditions, params = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                           type, checkpoint, metadata_type, metadata
+                    FROM checkpoints {where} ORDER BY checkpoint_id DESC""",
+                params
+            ).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[4], row[5])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            with self._lock:
+                checkpoint_tuple = self._build_tuple(thread_id, checkpoint_ns, tuple(row))
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    # 写入
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        保存检查点，只写入new_versions中发生变化的通道值
+
+        参数:
+            config: 检查点所属的配置（其中的checkpoint_id为父检查点）
+            checkpoint: 检查点
+            metadata: 检查点元数据
+            new_versions: 本次发生变化的通道版本
+
+        返回:
+            指向新检查点的配置
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_copy = checkpoint.copy()
+        values: Dict[str, Any] = checkpoint_copy.pop("channel_values")  # type: ignore[misc]
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version),
+             *(self._dumps(values[channel]) if channel in values else ("empty", None)))
+            for channel, version in new_versions.items()
+        ]
+        type_, checkpoint_blob = self._dumps(checkpoint_copy)
+        metadata_type, metadata_blob = self._dumps(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoint_blobs VALUES (?, ?, ?, ?, ?, ?)", blobs
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, checkpoint_blob, metadata_type, metadata_blob)
+                )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """
+        保存任务的中间写入（已完成任务的结果），恢复时这些任务不会重新执行
+
+        参数:
+            config: 写入所属检查点的配置
+            writes: (通道, 值)列表
+            task_id: 产生写入的任务id
+            task_path: 任务路径
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+             channel, *self._dumps(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # 特殊通道（错误、中断等，idx为负）的写入覆盖旧值，普通通道的写入只保留第一次
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row for row in rows if row[4] < 0]
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row for row in rows if row[4] >= 0]
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除线程的所有检查点和写入"""
+        with self._lock:
+            with self._conn:
+                for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # 异步接口：SQLite操作在线程池中执行，不阻塞事件循环
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # 与InMemorySaver相同的版本格式：单调递增的整数部分加随机小数部分
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+# 进程级的检查点存储，按数据库路径复用
+_checkpointers: Dict[str, SQLiteCheckpointSaver] = {}
+_checkpointers_lock = threading.Lock()
+
+def get_checkpointer(database_path: str) -> SQLiteCheckpointSaver:
+    """
+    获取指定数据库路径的检查点存储（同一路径复用同一个实例）
+
+    参数:
+        database_path: SQLite数据库文件路径
+
+    返回:
+        检查点存储
+    """
+    path = os.path.abspath(database_path)
+    with _checkpointers_lock:
+        checkpointer = _checkpointers.get(path)
+        if checkpointer is None:
+            checkpointer = SQLiteCheckpointSaver(path)
+            _checkpointers[path] = checkpointer
+        return checkpointer
@@ -1,7 +1,7 @@
 import os
 from enum import Enum
-from dataclasses import dataclass, fields
-from typing import Any, Optional, Dict 
+from dataclasses import dataclass, field, fields
+from typing import Any, Optional, Dict, List
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
@@ -45,6 +45,7 @@ class SearchAPI(Enum):
     LINKUP = "linkup"
     DUCKDUCKGO = "duckduckgo"
     GOOGLESEARCH = "googlesearch"
+    REPLAY = "replay"
 
 @dataclass(kw_only=True)
 class Configuration:
@@ -68,7 +69,41 @@ class Configuration:
    #  writer_model: str = "gemini-2.0-flash" 
     search_api: SearchAPI = SearchAPI.TAVILY # Default to TAVILY
     search_api_config: Optional[Dict[str, Any]] = None 
+    search_api_fallbacks: Optional[List[str]] = None # 主搜索API熔断或失败时依次尝试的备用搜索API
+    circuit_breaker_failure_threshold: int = 3 # 搜索API连续失败多少次后熔断
+    circuit_breaker_recovery_timeout: float = 60.0 # 熔断后等待多少秒进入半开状态并发送探测请求
+    search_record_dir: Optional[str] = None # 录制模式：将真实搜索API的响应保存到该目录，供replay搜索离线回放
     knowledge_base_path: Optional[str] = None # 知识库文件夹路径，默认为None
+    query_router_mode: str = "llm" # 查询源路由方式："llm"每次调用LLM，"heuristic"只用本地路由，"hybrid"本地路由不确定时才调用LLM
+    query_router_confidence: float = 0.6 # hybrid模式下本地路由的置信度达到该值才直接采用
+    speculative_search: bool = False # 推测式搜索：在LLM决定查询来源的同时并行执行Web搜索和知识库检索，决策后取消另一路
+    shared_search_plan: bool = False # 共享搜索计划：批准计划后统一生成所有章节的查询，合并近似重复的查询后只搜索一次
+    query_dedup_threshold: float = 0.8 # 两个查询的字符二元组Jaccard相似度达到该值即视为重复
+    batch_query_generation: bool = False # 批量查询生成：批准计划后用一次（或分组的几次）调用为所有章节生成查询
+    query_batch_size: int = 8 # 批量查询生成时每次调用包含的章节数
+    reuse_source_pool: bool = False # 复用共享来源池（含规划阶段的搜索结果），相关来源足够时跳过章节搜索
+    source_pool_min_relevance: float = 0.5 # 来源标题和摘要覆盖查询实词（英文单词/中文二元词）的比例达到该值才视为相关
+    source_pool_min_sources: int = 3 # 来源池中至少有这么多相关来源才跳过搜索
+    source_pool_max_sources: int = 10 # 每次从来源池中最多选取的来源数
+    revision_threshold: int = 85 # 章节内容评估总分达到该值即不再修改
+    max_revisions: int = 3 # 每个章节的最大修改次数
+    revision_min_improvement: float = 2.0 # 一轮修改的分数提升小于该值视为停滞
+    revision_plateau_patience: Optional[int] = None # 连续停滞多少轮后停止修改，None表示不做停滞判定
+    section_token_budget: Optional[int] = None # 每个章节的token预算（估计值），用尽后停止评审和修改
+    section_time_budget_seconds: Optional[float] = None # 每个章节从开始写作算起的时间预算（秒），用尽后停止评审和修改
+    revision_mode: str = "full" # 章节修改方式："full"重写整个章节，"delta"只输出段落级修改操作并在本地应用（失败时回退到full）
+    combined_section_evaluation: bool = False # 合并评估：write_section中一次结构化调用同时完成评审和内容质量评估
+    export_formats: Optional[List[str]] = field(default_factory=lambda: ["html"]) # 报告导出格式，可选"html"、"markdown"、"pdf"、"docx"（PDF/DOCX需要本地安装pandoc或wkhtmltopdf），由后台导出器完成
+    export_dir: str = "output" # 导出文件的输出目录
+    html_render_mode: str = "template" # HTML网页生成方式："template"使用固定模板在本地渲染，"designer"由LLM设计网页
+    max_concurrent_final_sections: int = 3 # 同时撰写的最终章节（摘要、引言、结论等）数量上限
+    blob_store_path: Optional[str] = None # 内容寻址Blob存储目录，设置后大文本字段在图状态中只保存哈希引用
+    blob_min_size: int = 2048 # 超过该字节数的文本才存入Blob存储
+    llm_cache_path: Optional[str] = None # LLM响应缓存的SQLite数据库路径，设置后启用缓存
+    llm_cache_ttl_seconds: Optional[float] = 7 * 24 * 3600 # 缓存条目有效期（秒）
+    llm_cache_max_entries: Optional[int] = 10_000 # 最大缓存条目数，超出时淘汰最久未访问的条目
+    llm_cache_semantic_threshold: Optional[float] = None # 语义缓存的相似度阈值（如0.97），设置后对近似提示使用嵌入相似度查找
+    llm_rate_limits: Optional[Dict[str, Dict[str, int]]] = None # 各提供商的调用限额，如{"deepseek": {"rpm": 60, "tpm": 1000000, "max_in_flight": 4}}
 
     @classmethod
     def from_runnable_config(
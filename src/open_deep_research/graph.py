@@ -1,15 +1,24 @@
-from typing import Literal
+import os
+import re
+import time
+import asyncio
+import weakref
+from contextlib import aclosing
+from functools import lru_cache
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.utils.json import parse_json_markdown, parse_partial_json
+from pydantic import ValidationError
 
 from langgraph.constants import Send
 from langgraph.graph import START, END, StateGraph
 from langgraph.types import interrupt, Command
+from langgraph.config import get_stream_writer
 
 from open_deep_research.state import (
     ReportStateInput,
@@ -21,7 +30,14 @@ from open_deep_research.state import (
     Queries,
     Feedback,
     ContentEvaluation,
-    SimpleContentEvaluation
+    SimpleContentEvaluation,
+    SearchQuery,
+    Section,
+    BatchQueries,
+    CombinedSectionEvaluation,
+    SectionPatch,
+    Source,
+    merge_sources
 )
 
 from open_deep_research.prompts import (
@@ -30,29 +46,80 @@ from open_deep_research.prompts import (
     query_writer_instructions, 
     section_writer_instructions,
     final_section_writer_instructions,
+    final_section_writer_shared_inputs,
+    final_section_writer_inputs,
     section_grader_instructions,
     section_writer_inputs,
     enhanced_query_writer_instructions,
+    batch_query_writer_instructions,
     enhanced_report_planner_query_writer_instructions,
     enhanced_html_template_instructions,
-    content_evaluator_instructions,
     enhanced_content_evaluator_instructions,
+    enhanced_content_evaluator_inputs,
+    json_evaluation_output_instructions,
+    combined_section_grading_instructions,
     section_revision_instructions,
-    enhanced_section_revision_instructions
+    section_revision_inputs,
+    enhanced_section_revision_instructions,
+    enhanced_section_revision_inputs,
+    delta_revision_output_instructions
 )
 
 from open_deep_research.configuration import Configuration
+from open_deep_research.blob_store import (
+    store_text,
+    load_text,
+    store_sources,
+    load_sources,
+    store_section,
+    load_section
+)
 from open_deep_research.utils import (
     format_sections, 
     get_config_value, 
-    get_search_params, 
-    select_and_execute_search
+    execute_configured_search,
+    format_sources,
+    make_text_source,
+    cluster_similar_queries,
+    select_relevant_sources,
+    split_paragraphs,
+    number_paragraphs,
+    apply_paragraph_edits,
+    renumber_citations
+)
+
+from open_deep_research.model_registry import get_chat_model, get_structured_model
+from open_deep_research.llm_cache import get_llm_cache
+from open_deep_research.prompt_cache import build_prompt_messages
+from open_deep_research.report_export import get_report_exporter, parse_export_formats
+from open_deep_research.llm_scheduler import (
+    scheduled_ainvoke,
+    scheduled_astream,
+    call_tokens,
+    estimate_tokens,
+    PRIORITY_CRITICAL,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW
 )
+from open_deep_research.revision_policy import RevisionPolicy, PolicyDecision, record_decision, REASON_EVALUATION_FAILED
+from open_deep_research.query_router import get_query_router
 
 # 导入AgenticRAG相关模块
-from open_deep_research.agentic_rag import AgenticRAG, create_tool_node, check_tool_calls
+from open_deep_research.agentic_rag import (
+    AgenticRAG,
+    create_tool_node,
+    check_tool_calls,
+    directory_signature,
+    get_cached_vectorstore,
+    SIGNATURE_MAX_AGE,
+)
 from pydantic import BaseModel, Field
 
+class QuerySource(BaseModel):
+    """查询来源决策"""
+    decision: str = Field(description="决策: 'web' 表示需要Web搜索以获取最新信息, 'kb' 表示可以从知识库获取")
+    reasoning: str = Field(description="决策推理过程")
+
 ## Nodes -- 
 
 async def generate_report_plan(state: ReportState, config: RunnableConfig):
@@ -80,9 +147,6 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     report_structure = configurable.report_structure
     number_of_queries = configurable.number_of_queries
-    search_api = get_config_value(configurable.search_api)
-    search_api_config = configurable.search_api_config or {}  # 获取配置字典，默认为空
-    params_to_pass = get_search_params(search_api, search_api_config)  # 过滤参数
 
     # 如果需要，将JSON对象转换为字符串
     if isinstance(report_structure, dict):
@@ -91,8 +155,7 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     # 设置写作模型（用于查询写作的模型）
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    structured_llm = get_structured_model(writer_model_name, writer_provider, Queries, cache=get_llm_cache(configurable))
 
     # 获取当前时间信息，用于时间敏感查询
     current_time = datetime.now()
@@ -120,16 +183,17 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     """
 
     # 使用增强提示生成查询
-    results = structured_llm.invoke([
+    results = await scheduled_ainvoke(structured_llm, [
         SystemMessage(content=system_instructions_query),
         HumanMessage(content=user_message_query)
-    ])
+    ], writer_provider, PRIORITY_CRITICAL, configurable)
 
     # 网络搜索
     query_list = [query.search_query for query in results.queries]
 
     # 使用参数搜索网络
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    sources = await execute_configured_search(configurable, query_list)
+    source_str = format_sources(sources)
 
     # 格式化系统指令
     system_instructions_sections = report_planner_instructions.format(topic=topic, report_organization=report_structure, context=source_str, feedback=feedback)
@@ -145,27 +209,30 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     # 运行规划器
     if planner_model == "claude-3-7-sonnet-latest":
         # 为claude-3-7-sonnet-latest作为规划器模型分配思考预算
-        planner_llm = init_chat_model(model=planner_model, 
-                                      model_provider=planner_provider, 
-                                      max_tokens=20_000, 
-                                      thinking={"type": "enabled", "budget_tokens": 16_000})
+        structured_llm = get_structured_model(planner_model, 
+                                              planner_provider, 
+                                              Sections,
+                                              max_tokens=20_000, 
+                                              thinking={"type": "enabled", "budget_tokens": 16_000},
+                                              cache=get_llm_cache(configurable))
 
     else:
         # 对于其他模型，不特别分配思考令牌
-        planner_llm = init_chat_model(model=planner_model, 
-                                      model_provider=planner_provider)
+        structured_llm = get_structured_model(planner_model, planner_provider, Sections, cache=get_llm_cache(configurable))
     
     # 生成报告章节
-    structured_llm = planner_llm.with_structured_output(Sections)
-    report_sections = structured_llm.invoke([SystemMessage(content=system_instructions_sections),
-                                             HumanMessage(content=planner_message)])
+    report_sections = await scheduled_ainvoke(structured_llm,
+                                              [SystemMessage(content=system_instructions_sections),
+                                               HumanMessage(content=planner_message)],
+                                              planner_provider, PRIORITY_CRITICAL, configurable)
 
-    # 获取章节
-    sections = report_sections.sections
+    # 获取章节，并记录各章节在计划中的位置，最终汇编时按位置排序
+    sections = [s.model_copy(update={"index": i}) for i, s in enumerate(report_sections.sections)]
 
-    return {"sections": sections}
+    # 规划阶段的搜索结果放入共享来源池，供章节研究复用
+    return {"sections": sections, **_source_pool_update(store_sources(sources, configurable), configurable)}
 
-def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan","build_section_with_web_research"]]:
+def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan","plan_shared_search","generate_batch_queries","build_section_with_web_research"]]:
     """获取关于报告计划的人类反馈并引导到下一步。
     此节点：
     1. 格式化当前报告计划以供人类审查
@@ -201,9 +268,17 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
 
     # If the user approves the report plan, kick off section writing
     if isinstance(feedback, bool) and feedback is True:
+        configurable = Configuration.from_runnable_config(config)
+        # 启用共享搜索计划时，先为所有章节统一生成查询并去重搜索
+        if configurable.shared_search_plan:
+            return Command(goto="plan_shared_search")
+        # 启用批量查询生成时，先为所有章节一次性生成查询
+        if configurable.batch_query_generation:
+            return Command(goto="generate_batch_queries")
         # Treat this as approve and kick off section writing
         return Command(goto=[
-            Send("build_section_with_web_research", {"topic": topic, "section": s, "search_iterations": 0}) 
+            Send("build_section_with_web_research", {"topic": topic, "section": s, "search_iterations": 0,
+                                                     **_shared_pool_payload(state, configurable)}) 
             for s in sections 
             if s.research
         ])
@@ -216,6 +291,180 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     else:
         raise TypeError(f"Interrupt value of type {type(feedback)} is not supported.")
 
+def _source_pool_update(sources: List[Source], configurable: Configuration) -> dict:
+    """把来源加入共享来源池的状态更新；未启用reuse_source_pool时不收集，避免状态和检查点膨胀"""
+    if not configurable.reuse_source_pool:
+        return {}
+    return {"source_pool": sources}
+
+def _shared_pool_payload(state: ReportState, configurable: Configuration) -> dict:
+    """章节子图Send负载中的来源池快照。
+
+    只有启用reuse_source_pool时章节才会读取来源池，否则不随Send复制。池中来源在加入时
+    已经过store_sources处理，配置了blob_store_path时只包含id和Blob引用。
+    """
+    if not configurable.reuse_source_pool or not state.get("source_pool"):
+        return {}
+    return {"shared_sources": state["source_pool"]}
+
+async def plan_shared_search(state: ReportState, config: RunnableConfig) -> Command[Literal["build_section_with_web_research"]]:
+    """为所有章节生成查询，合并相近查询后统一搜索，再把结果分发给各章节。
+    
+    此节点：
+    1. 并行为每个需要研究的章节生成搜索查询
+    2. 按字符二元组的Jaccard相似度合并各章节之间近似重复的查询
+    3. 所有不重复的查询通过一次批量搜索执行
+    4. 按查询把搜索结果分发回对应章节，章节子图直接从写作开始，结果同时加入共享来源池
+    
+    参数：
+        state: 当前图状态，包含已批准的章节
+        config: 模型和搜索API的配置
+        
+    返回：
+        命令，为每个章节启动带有查询和搜索结果的章节子图
+    """
+    topic = state["topic"]
+    configurable = Configuration.from_runnable_config(config)
+    research_sections = [s for s in state["sections"] if s.research]
+
+    # 生成各章节的查询（批量生成或逐章节并行生成）
+    if configurable.batch_query_generation:
+        section_queries = await _generate_batch_queries(topic, research_sections, configurable)
+    else:
+        section_queries = await asyncio.gather(*[
+            _generate_section_queries(topic, section, configurable) for section in research_sections
+        ])
+
+    # 合并近似重复的查询，每个簇只保留第一个查询作为代表
+    all_queries = [query.search_query for queries in section_queries for query in queries]
+    representatives = cluster_similar_queries(all_queries, float(configurable.query_dedup_threshold))
+    unique_queries = list(dict.fromkeys(all_queries[i] for i in representatives))
+    print(f"共享搜索计划：{len(all_queries)}个查询合并为{len(unique_queries)}个")
+
+    # 所有不重复的查询作为一批只搜索一次，再按Source.query把来源对应回查询；
+    # 同一来源被多个查询检索到时只归入第一个查询（search_results_to_sources按来源去重）
+    stored = store_sources(await execute_configured_search(configurable, unique_queries), configurable)
+    sources_by_query = {query: [] for query in unique_queries}
+    for source in stored:
+        if source.query in sources_by_query:
+            sources_by_query[source.query].append(source)
+    pool_update = _source_pool_update(stored, configurable)
+    pool_state = {"source_pool": merge_sources(state.get("source_pool", []), stored)}
+
+    sends = []
+    offset = 0
+    for section, queries in zip(research_sections, section_queries):
+        section_sources = {}
+        for i in range(offset, offset + len(queries)):
+            for source in sources_by_query[all_queries[representatives[i]]]:
+                section_sources.setdefault(source.id, source)
+        offset += len(queries)
+        sends.append(Send("build_section_with_web_research", {
+            "topic": topic,
+            "section": section,
+            "search_queries": queries,
+            "sources": list(section_sources.values()),
+            "search_iterations": 1,
+            **_shared_pool_payload(pool_state, configurable)
+        }))
+    # 预先搜索到的来源也合并进共享来源池
+    return Command(update=pool_update, goto=sends)
+
+async def generate_batch_queries(state: ReportState, config: RunnableConfig) -> Command[Literal["build_section_with_web_research"]]:
+    """一次性为所有需要研究的章节生成搜索查询。
+    
+    此节点：
+    1. 按query_batch_size把章节分组，每组用一次结构化输出调用生成查询
+    2. 各组的调用并行执行
+    3. 为每个章节启动章节子图，子图跳过查询生成直接开始搜索
+    
+    参数：
+        state: 当前图状态，包含已批准的章节
+        config: 模型配置
+        
+    返回：
+        命令，为每个章节启动带有查询的章节子图
+    """
+    topic = state["topic"]
+    configurable = Configuration.from_runnable_config(config)
+    research_sections = [s for s in state["sections"] if s.research]
+
+    section_queries = await _generate_batch_queries(topic, research_sections, configurable)
+
+    return Command(goto=[
+        Send("build_section_with_web_research", {
+            "topic": topic,
+            "section": section,
+            "search_queries": queries,
+            "search_iterations": 0,
+            **_shared_pool_payload(state, configurable)
+        })
+        for section, queries in zip(research_sections, section_queries)
+    ])
+
+async def _generate_batch_queries(topic: str, sections: List[Section], configurable: Configuration) -> List[List[SearchQuery]]:
+    """分组批量生成多个章节的搜索查询，各组并行调用。
+
+    参数：
+        topic: 报告主题
+        sections: 章节列表
+        configurable: 当前运行的配置
+
+    返回：
+        与sections顺序一致的查询列表
+    """
+    batch_size = max(1, int(configurable.query_batch_size))
+    chunks = [sections[i:i + batch_size] for i in range(0, len(sections), batch_size)]
+    results = await asyncio.gather(*[_generate_query_batch(topic, chunk, configurable) for chunk in chunks])
+    return [queries for chunk_queries in results for queries in chunk_queries]
+
+async def _generate_query_batch(topic: str, sections: List[Section], configurable: Configuration) -> List[List[SearchQuery]]:
+    """用一次结构化输出调用为一组章节生成查询，模型遗漏的章节单独补充生成。
+
+    参数：
+        topic: 报告主题
+        sections: 一组章节
+        configurable: 当前运行的配置
+
+    返回：
+        与sections顺序一致的查询列表
+    """
+    current_time = datetime.now()
+    sections_text = "\n".join(
+        f"{i}. {section.name}：{section.description}" for i, section in enumerate(sections)
+    )
+    system_instructions = batch_query_writer_instructions.format(
+        topic=topic,
+        sections=sections_text,
+        number_of_queries=configurable.number_of_queries,
+        current_time=current_time.isoformat(),
+        current_year=current_time.year,
+        current_month=current_time.month
+    )
+
+    writer_provider = get_config_value(configurable.writer_provider)
+    writer_model_name = get_config_value(configurable.writer_model)
+    structured_llm = get_structured_model(writer_model_name, writer_provider, BatchQueries, cache=get_llm_cache(configurable))
+
+    batch = await scheduled_ainvoke(structured_llm, [
+        SystemMessage(content=system_instructions),
+        HumanMessage(content=f"请为以上{len(sections)}个章节分别生成搜索查询。")
+    ], writer_provider, PRIORITY_NORMAL, configurable)
+
+    queries_by_index = {
+        item.section_index: item.queries
+        for item in batch.sections
+        if 0 <= item.section_index < len(sections) and item.queries
+    }
+    missing = [i for i in range(len(sections)) if i not in queries_by_index]
+    if missing:
+        print(f"批量查询生成遗漏了{len(missing)}个章节，单独补充生成")
+        fallback = await asyncio.gather(*[
+            _generate_section_queries(topic, sections[i], configurable) for i in missing
+        ])
+        queries_by_index.update(zip(missing, fallback))
+    return [queries_by_index[i] for i in range(len(sections))]
+
 # 生成用于研究特定部分的搜索查询。
 async def generate_queries(state: SectionState, config: RunnableConfig):
     """生成用于研究特定部分的搜索查询。
@@ -240,6 +489,22 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
+
+    queries = await _generate_section_queries(topic, section, configurable)
+
+    return {"search_queries": queries}
+
+async def _generate_section_queries(topic: str, section: Section, configurable: Configuration) -> List[SearchQuery]:
+    """为单个章节生成搜索查询。
+
+    参数：
+        topic: 报告主题
+        section: 章节
+        configurable: 当前运行的配置
+
+    返回：
+        搜索查询列表
+    """
     number_of_queries = configurable.number_of_queries
 
     # Get current time information
@@ -272,67 +537,66 @@ These queries should cover different aspects and perspectives to gather comprehe
     # Generate queries  
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    structured_llm = get_structured_model(writer_model_name, writer_provider, Queries, cache=get_llm_cache(configurable))
 
     # Generate queries with enhanced prompting
-    queries = structured_llm.invoke([
+    queries = await scheduled_ainvoke(structured_llm, [
         SystemMessage(content=system_instructions),
         HumanMessage(content=user_message)
-    ])
+    ], writer_provider, PRIORITY_NORMAL, configurable)
 
-    return {"search_queries": queries.queries}
+    return queries.queries
+
+async def _route_query_source_locally(query_list: List[str], configurable: Configuration) -> Optional[str]:
+    """使用本地路由器决定查询来源。
 
-def evaluate_query_source(state: SectionState, config: RunnableConfig) -> Literal["search_web", "search_knowledge_base"]:
-    """评估查询并决定使用知识库还是Web搜索。
-    
-    此节点：
-    1. 接收生成的搜索查询
-    2. 使用LLM评估这些查询是否可以从本地知识库中获得，或需要最新的Web搜索
-    3. 根据评估结果返回下一步操作
-    
     参数：
-        state: 当前状态，包含搜索查询
-        config: 评估模型的配置
-        
+        query_list: 查询列表
+        configurable: 当前运行的配置
+
     返回：
-        决策结果，指示下一步是进行Web搜索还是知识库检索
+        'web'或'kb'；使用LLM路由或本地路由不确定时返回None
+    """
+    router_mode = get_config_value(configurable.query_router_mode)
+    if router_mode == "llm":
+        return None
+    route = await asyncio.to_thread(get_query_router().route, query_list, configurable.knowledge_base_path or "./doc")
+    if router_mode == "heuristic" or route.confidence >= float(configurable.query_router_confidence):
+        print(f"查询源决策（本地路由，置信度{route.confidence:.2f}）: {route.reasoning}")
+        return route.decision
+    return None
+
+async def _route_query_source_with_llm(state: SectionState, query_list: List[str], configurable: Configuration) -> str:
+    """使用规划模型决定查询来源，并将决策回馈给本地路由器。
+
+    参数：
+        state: 当前状态，包含主题和章节
+        query_list: 查询列表
+        configurable: 当前运行的配置
+
+    返回：
+        'web'或'kb'
     """
-    
-    # 获取状态
-    search_queries = state["search_queries"]
     topic = state["topic"]
     section = state["section"]
-    
-    # 获取配置
-    configurable = Configuration.from_runnable_config(config)
-    
+
     # 获取评估模型
     planner_provider = get_config_value(configurable.planner_provider)
     planner_model = get_config_value(configurable.planner_model)
     
-    # 定义评分模型
-    class QuerySource(BaseModel):
-        """查询来源决策"""
-        decision: str = Field(description="决策: 'web' 表示需要Web搜索以获取最新信息, 'kb' 表示可以从知识库获取")
-        reasoning: str = Field(description="决策推理过程")
-    
     # 初始化模型
     if planner_model == "claude-3-7-sonnet-latest":
-        evaluator_model = init_chat_model(
-            model=planner_model, 
-            model_provider=planner_provider,
+        evaluator_model = get_structured_model(
+            planner_model, 
+            planner_provider,
+            QuerySource,
             max_tokens=4000, 
-            thinking={"type": "enabled", "budget_tokens": 2000}
-        ).with_structured_output(QuerySource)
+            thinking={"type": "enabled", "budget_tokens": 2000},
+            cache=get_llm_cache(configurable)
+        )
     else:
-        evaluator_model = init_chat_model(
-            model=planner_model, 
-            model_provider=planner_provider
-        ).with_structured_output(QuerySource)
+        evaluator_model = get_structured_model(planner_model, planner_provider, QuerySource, cache=get_llm_cache(configurable))
     
-    # 准备查询内容
-    query_list = [query.search_query for query in search_queries]
     query_text = "\n".join([f"{i+1}. {q}" for i, q in enumerate(query_list)])
     
     # 创建评估提示
@@ -372,89 +636,133 @@ def evaluate_query_source(state: SectionState, config: RunnableConfig) -> Litera
     )
     
     # 获取评估结果
-    evaluation = evaluator_model.invoke([
+    evaluation = await scheduled_ainvoke(evaluator_model, [
         SystemMessage(content=formatted_prompt),
         HumanMessage(content="请分析以上查询并决定是使用Web搜索还是知识库检索。")
-    ])
+    ], planner_provider, PRIORITY_NORMAL, configurable)
     
     # 记录决策理由
     print(f"查询源决策理由: {evaluation.reasoning}")
+    decision_label = evaluation.decision.lower()
+
+    # 将LLM的决策回馈给本地路由器的分类器
+    if get_config_value(configurable.query_router_mode) != "llm":
+        get_query_router().learn(query_list, decision_label)
+
+    return decision_label
+
+async def evaluate_query_source(state: SectionState, config: RunnableConfig) -> Literal["search_web", "search_knowledge_base"]:
+    """评估查询并决定使用知识库还是Web搜索。
+    
+    此节点：
+    1. 接收生成的搜索查询
+    2. 先由本地路由器根据知识库相关度、时效性词语和分类器判断查询来源
+    3. 本地路由不确定时，使用LLM评估这些查询是否可以从本地知识库中获得，或需要最新的Web搜索
+    4. 根据评估结果返回下一步操作
+    
+    参数：
+        state: 当前状态，包含搜索查询
+        config: 评估模型的配置
+        
+    返回：
+        决策结果，指示下一步是进行Web搜索还是知识库检索
+    """
     
+    # 获取配置
+    configurable = Configuration.from_runnable_config(config)
+    
+    # 准备查询内容
+    query_list = [query.search_query for query in state["search_queries"]]
+
+    # 先用本地路由器根据廉价信号决策，只有不确定时才调用LLM
+    decision_label = await _route_query_source_locally(query_list, configurable)
+    if decision_label is None:
+        decision_label = await _route_query_source_with_llm(state, query_list, configurable)
+
     # 检测函数是作为条件边还是作为节点调用
     # 作为条件边使用时会传递一个特殊的'__run_as_condition'配置
     is_condition = config.get("__run_as_condition", False) if config else False
     
     if is_condition:
         # 作为条件边运行时，返回下一个节点名称
-        if evaluation.decision.lower() == "web":
+        if decision_label == "web":
             return "search_web" 
         else:
             return "search_knowledge_base"
     else:
         # 作为节点运行时，返回状态更新的字典
-        decision = "search_web" if evaluation.decision.lower() == "web" else "search_knowledge_base"
+        decision = "search_web" if decision_label == "web" else "search_knowledge_base"
         # 返回经过决策的结果，并将决策存储在状态中
         return {"search_decision": decision}
 
-async def search_knowledge_base(state: SectionState, config: RunnableConfig):
-    """从知识库中检索与查询相关的信息。
-    
-    此节点：
-    1. 获取生成的查询
-    2. 使用AgenticRAG从知识库中检索相关信息
-    3. 将结果格式化为可用的上下文
-    
+async def _search_knowledge_base_sources(query_list: List[str], configurable: Configuration, web_fallback: bool = True) -> List[Source]:
+    """使用AgenticRAG从知识库检索，知识库中没有文档时退回到Web搜索。
+
     参数：
-        state: 当前状态，包含搜索查询
-        config: 检索配置
-        
+        query_list: 查询列表
+        configurable: 当前运行的配置
+        web_fallback: 知识库中没有文档时是否自动执行Web搜索；为False时抛出ValueError，由调用方处理
+
     返回：
-        包含检索结果和更新的迭代计数的字典
+        检索到的来源列表
     """
-        # 获取配置
-    configurable = Configuration.from_runnable_config(config)
-    
     # 获取评估模型
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model = get_config_value(configurable.writer_model)
-
-    # 获取状态
-    search_queries = state["search_queries"]
-    query_list = [query.search_query for query in search_queries]
     
     # 初始化AgenticRAG
     rag = AgenticRAG(model_name=writer_model, model_provider=writer_provider)
     
-    # 获取配置
-    configurable = Configuration.from_runnable_config(config)
-    
     # 配置知识库路径
     pdf_directory = configurable.knowledge_base_path or "./doc"
     
-    # 创建检索器
+    # 创建检索器（加载PDF和构建向量库是阻塞操作，放到线程中执行）
     try:
-        rag.create_retriever(pdf_directory=pdf_directory)
+        await asyncio.to_thread(rag.create_retriever, pdf_directory=pdf_directory)
     except ValueError:
+        if not web_fallback:
+            raise
         # 如果没有找到文档，尝试从Web获取
         print("知识库中没有找到文档，正在切换到Web搜索...")
         # 执行Web搜索作为后备
-        search_api = get_config_value(configurable.search_api)
-        search_api_config = configurable.search_api_config or {}
-        params_to_pass = get_search_params(search_api, search_api_config)
-        source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
-        return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
+        return await execute_configured_search(configurable, query_list)
     
     # 构建图
-    model_name = get_config_value(configurable.writer_model)
-    rag.build_graph(model_name=model_name)
+    rag.build_graph(model_name=writer_model)
     
     # 合并查询以获得更全面的结果
     combined_query = " ".join(query_list)
     
     # 执行检索
-    result = rag.run(combined_query)
+    result = await rag.arun(combined_query)
     
-    return {"source_str": result, "search_iterations": state["search_iterations"] + 1}
+    return [make_text_source(result, title="知识库检索结果", query=combined_query)]
+
+async def search_knowledge_base(state: SectionState, config: RunnableConfig):
+    """从知识库中检索与查询相关的信息。
+    
+    此节点：
+    1. 获取生成的查询
+    2. 使用AgenticRAG从知识库中检索相关信息
+    3. 将结果格式化为可用的上下文
+    
+    参数：
+        state: 当前状态，包含搜索查询
+        config: 检索配置
+        
+    返回：
+        包含检索结果和更新的迭代计数的字典
+    """
+    # 获取配置
+    configurable = Configuration.from_runnable_config(config)
+
+    # 获取状态
+    query_list = [query.search_query for query in state["search_queries"]]
+
+    sources = await _search_knowledge_base_sources(query_list, configurable)
+    
+    stored = store_sources(sources, configurable)
+    return {"sources": stored, **_source_pool_update(stored, configurable), "search_iterations": state["search_iterations"] + 1}
 
 async def search_web(state: SectionState, config: RunnableConfig):
     """执行该部分查询的网络搜索。
@@ -477,19 +785,199 @@ async def search_web(state: SectionState, config: RunnableConfig):
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
-    search_api = get_config_value(configurable.search_api)
-    search_api_config = configurable.search_api_config or {}  # Get the config dict, default to empty
-    params_to_pass = get_search_params(search_api, search_api_config)  # Filter parameters
 
     # Web search
     query_list = [query.search_query for query in search_queries]
 
     # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    sources = await execute_configured_search(configurable, query_list)
+
+    # Large source texts are kept in the blob store, only hashes go into state
+    stored = store_sources(sources, configurable)
+    return {"sources": stored, **_source_pool_update(stored, configurable), "search_iterations": state["search_iterations"] + 1}
+
+async def speculative_search(state: SectionState, config: RunnableConfig):
+    """推测式搜索：在决定查询来源的同时并行执行Web搜索和知识库检索。
+    
+    此节点：
+    1. 知识库中没有文档时，不做路由直接执行Web搜索
+    2. 本地路由器有把握时，直接执行对应的搜索
+    3. 否则同时启动LLM路由和Web搜索；知识库的向量库已构建时也同时启动知识库检索
+    4. 路由决策完成后取消另一路搜索，只保留选中来源的结果
+    
+    参数：
+        state: 当前状态，包含搜索查询
+        config: 搜索和评估模型的配置
+        
+    返回：
+        包含搜索结果、查询来源决策和更新的迭代计数的字典
+    """
+    configurable = Configuration.from_runnable_config(config)
+    query_list = [query.search_query for query in state["search_queries"]]
+    pdf_directory = configurable.knowledge_base_path or "./doc"
+
+    if not directory_signature(pdf_directory, max_age=SIGNATURE_MAX_AGE):
+        decision_label = "web"
+        sources = await execute_configured_search(configurable, query_list)
+    else:
+        decision_label = await _route_query_source_locally(query_list, configurable)
+        if decision_label is not None:
+            if decision_label == "web":
+                sources = await execute_configured_search(configurable, query_list)
+            else:
+                sources = await _search_knowledge_base_sources(query_list, configurable)
+        else:
+            web_task = asyncio.create_task(execute_configured_search(configurable, query_list))
+            # 构建向量库的嵌入计算在线程中执行，取消任务无法中止，所以只在向量库已构建时推测执行知识库检索
+            kb_task = None
+            if get_cached_vectorstore(pdf_directory) is not None:
+                kb_task = asyncio.create_task(_search_knowledge_base_sources(query_list, configurable, web_fallback=False))
+            try:
+                decision_label = await _route_query_source_with_llm(state, query_list, configurable)
+            except BaseException:
+                web_task.cancel()
+                if kb_task is not None:
+                    kb_task.cancel()
+                raise
+            # 取消未被选中的搜索，并取走其异常，避免未处理异常的警告
+            loser = kb_task if decision_label == "web" else web_task
+            if loser is not None:
+                loser.cancel()
+                loser.add_done_callback(lambda task: task.cancelled() or task.exception())
+            if decision_label == "web":
+                sources = await web_task
+            else:
+                try:
+                    sources = await (kb_task or _search_knowledge_base_sources(query_list, configurable, web_fallback=False))
+                except ValueError:
+                    # 知识库文档在路由期间被移除，此时才补做一次Web搜索
+                    print("知识库中没有找到文档，正在切换到Web搜索...")
+                    sources = await execute_configured_search(configurable, query_list)
+
+    stored = store_sources(sources, configurable)
+    return {
+        "sources": stored,
+        **_source_pool_update(stored, configurable),
+        "search_iterations": state["search_iterations"] + 1,
+        "search_decision": "search_web" if decision_label == "web" else "search_knowledge_base"
+    }
+
+async def select_pool_sources(state: SectionState, config: RunnableConfig) -> Command[Literal["evaluate_query_source", "speculative_search", "write_section"]]:
+    """从共享来源池中选取与查询相关的来源，足够时跳过本轮网络搜索。
+    
+    此节点：
+    1. 在来源池中查找本章节尚未使用、且覆盖当前查询的来源
+    2. 相关来源数量达到source_pool_min_sources时，直接用这些来源撰写章节
+    3. 否则继续正常的查询来源路由和搜索
+    
+    参数：
+        state: 当前状态，包含搜索查询和来源池
+        config: 来源池复用的配置
+        
+    返回：
+        命令，转到写作或搜索
+    """
+    configurable = Configuration.from_runnable_config(config)
+    query_list = [query.search_query for query in state["search_queries"]]
+
+    # 排除本章节此前各轮已经使用过的来源（评审认为不足的材料不应再次被选中）
+    used_ids = set(state.get("used_source_ids", [])) | {source.id for source in state.get("sources", [])}
+    pool = merge_sources(state.get("shared_sources", []), state.get("source_pool", []))
+    candidates = [source for source in pool if source.id not in used_ids]
+    stored_by_id = {source.id: source for source in candidates}
+    selected = select_relevant_sources(
+        load_sources(candidates, configurable),
+        query_list,
+        min_relevance=float(configurable.source_pool_min_relevance),
+        max_sources=int(configurable.source_pool_max_sources)
+    )
+
+    if len(selected) >= int(configurable.source_pool_min_sources):
+        print(f"从来源池中复用{len(selected)}个来源，跳过搜索")
+        return Command(
+            update={
+                "sources": [stored_by_id[source.id] for source in selected],
+                "used_source_ids": sorted(used_ids),
+                "search_iterations": state["search_iterations"] + 1
+            },
+            goto="write_section"
+        )
+    return Command(update={"used_source_ids": sorted(used_ids)}, goto=_search_entry_node(configurable))
+
+def _search_entry_node(configurable: Configuration) -> str:
+    """根据配置选择先路由后搜索，还是推测式并行搜索"""
+    return "speculative_search" if configurable.speculative_search else "evaluate_query_source"
+
+def route_query_source(state: SectionState, config: RunnableConfig) -> Literal["select_pool_sources", "evaluate_query_source", "speculative_search"]:
+    """选择搜索前的下一步：先尝试复用来源池，或直接进入查询来源路由"""
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.reuse_source_pool and (state.get("shared_sources") or state.get("source_pool")):
+        return "select_pool_sources"
+    return _search_entry_node(configurable)
+
+def route_section_start(state: SectionState, config: RunnableConfig) -> Literal["generate_queries", "select_pool_sources", "evaluate_query_source", "speculative_search", "write_section"]:
+    """章节子图的入口：跳过已由共享搜索计划完成的步骤"""
+    if state.get("sources"):
+        return "write_section"
+    if state.get("search_queries"):
+        return route_query_source(state, config)
+    return "generate_queries"
+
+def _emit_stream_event(event: dict):
+    """通过图的custom流通道发送事件（不在图中运行时忽略）"""
+    try:
+        get_stream_writer()(event)
+    except RuntimeError:
+        pass
+
+def _content_text(content) -> str:
+    """提取消息内容中的文本。
+
+    Anthropic等模型（尤其开启thinking时）以内容块列表的形式流式返回，
+    只拼接其中的文本块，跳过thinking等其他类型的块。
+    """
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
+
+async def _stream_section_content(model, messages: list, provider: str, priority: int, configurable: Configuration,
+                                  section_name: str, stage: str) -> tuple[str, int]:
+    """流式生成章节正文，并通过custom流通道逐块推送。
+
+    每个文本块以{"type": "section_token", ...}事件发送，生成完成后立即发送包含完整草稿的
+    {"type": "section_draft", ...}事件，客户端无需等待节点返回即可拿到正文。
 
-    return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
+    参数：
+        model: 写作模型
+        messages: 输入消息
+        provider: 模型提供商
+        priority: 调度优先级
+        configurable: 当前运行的配置
+        section_name: 章节名称
+        stage: 生成阶段（"write"、"revise"或"final"）
 
-def write_section(state: SectionState, config: RunnableConfig) -> Command[Literal["evaluate_query_source", "evaluate_section_content"]]:
+    返回：
+        (章节正文, 本次调用消耗的token数)
+    """
+    aggregate = None
+    async with aclosing(scheduled_astream(model, messages, provider, priority, configurable)) as stream:
+        async for chunk in stream:
+            aggregate = chunk if aggregate is None else aggregate + chunk
+            text = _content_text(chunk.content)
+            if text:
+                _emit_stream_event({"type": "section_token", "section": section_name, "stage": stage,
+                                    "content": text})
+    content = _content_text(aggregate.content) if aggregate is not None else ""
+    _emit_stream_event({"type": "section_draft", "section": section_name, "stage": stage, "content": content})
+    return content, call_tokens(messages, aggregate)
+
+async def write_section(state: SectionState, config: RunnableConfig) -> Command[Literal["select_pool_sources", "evaluate_query_source", "speculative_search", "evaluate_section_content", "revise_section_content", END]]:
     """撰写报告的一部分并评估是否需要更多研究。
     
     此节点：
@@ -510,10 +998,15 @@ def write_section(state: SectionState, config: RunnableConfig) -> Command[Litera
     # Get state 
     topic = state["topic"]
     section = state["section"]
-    source_str = state["source_str"]
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
+    policy = RevisionPolicy.from_configuration(configurable)
+    section_started_at = state.get("section_started_at") or time.time()
+    section_tokens = state.get("section_tokens", 0)
+
+    # Format the structured sources only now, at prompt time
+    source_str = format_sources(load_sources(state["sources"], configurable))
 
     # Format system instructions
     section_writer_inputs_formatted = section_writer_inputs.format(topic=topic, 
@@ -525,13 +1018,29 @@ def write_section(state: SectionState, config: RunnableConfig) -> Command[Litera
     # Generate section  
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider) 
+    writer_model = get_chat_model(writer_model_name, writer_provider, cache=get_llm_cache(configurable)) 
 
-    section_content = writer_model.invoke([SystemMessage(content=section_writer_instructions),
-                                           HumanMessage(content=section_writer_inputs_formatted)])
+    writer_messages = build_prompt_messages(section_writer_instructions, section_writer_inputs_formatted,
+                                            "", writer_provider)
+    section_content, call_token_count = await _stream_section_content(
+        writer_model, writer_messages, writer_provider, PRIORITY_NORMAL, configurable, section.name, "write"
+    )
+    section_tokens += call_token_count
     
     # Write content to the section object  
-    section.content = section_content.content
+    section.content = section_content
+    budget_update = {"section_tokens": section_tokens, "section_started_at": section_started_at}
+
+    # 章节预算用尽时不再评审和补充搜索，直接进入内容评估
+    research_decision = policy.decide_research(section_tokens, section_started_at)
+    if not research_decision.proceed:
+        record_decision("research", section.name, research_decision,
+                        search_iterations=state["search_iterations"], tokens=section_tokens)
+        print(f"章节 '{section.name}' 预算用尽（{research_decision.reason}），跳过评审")
+        return Command(
+            update={"section": section, **budget_update},
+            goto="evaluate_section_content"
+        )
 
     # Grade prompt 
     section_grader_message = ("Grade the report and consider follow-up questions for missing information. "
@@ -547,35 +1056,176 @@ def write_section(state: SectionState, config: RunnableConfig) -> Command[Litera
     planner_provider = get_config_value(configurable.planner_provider)
     planner_model = get_config_value(configurable.planner_model)
 
+    # 合并评估模式：一次结构化调用同时完成评审（是否补充研究）和内容质量评估
+    if configurable.combined_section_evaluation:
+        return await _grade_and_evaluate_section(state, config, section, configurable, budget_update)
+
+    # 已达到最大搜索深度时评审结果不影响去向，草稿完成后直接进入内容评估
+    if state["search_iterations"] >= int(configurable.max_search_depth):
+        return Command(
+            update={"section": section, **budget_update},
+            goto="evaluate_section_content"
+        )
+
     if planner_model == "claude-3-7-sonnet-latest":
         # Allocate a thinking budget for claude-3-7-sonnet-latest as the planner model
-        reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider, 
-                                           max_tokens=20_000, 
-                                           thinking={"type": "enabled", "budget_tokens": 16_000}).with_structured_output(Feedback)
+        reflection_model = get_structured_model(planner_model, 
+                                                planner_provider, 
+                                                Feedback,
+                                                max_tokens=20_000, 
+                                                thinking={"type": "enabled", "budget_tokens": 16_000},
+                                                cache=get_llm_cache(configurable))
     else:
-        reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider).with_structured_output(Feedback)
+        reflection_model = get_structured_model(planner_model, planner_provider, Feedback, cache=get_llm_cache(configurable))
     # Generate feedback
-    feedback = reflection_model.invoke([SystemMessage(content=section_grader_instructions_formatted),
-                                        HumanMessage(content=section_grader_message)])
-
-    # If the section is passing or the max search depth is reached, proceed to content evaluation
-    if feedback.grade == "pass" or state["search_iterations"] >= configurable.max_search_depth:
+    grader_messages = [SystemMessage(content=section_grader_instructions_formatted),
+                       HumanMessage(content=section_grader_message)]
+    feedback = await scheduled_ainvoke(reflection_model, grader_messages,
+                                       planner_provider, PRIORITY_NORMAL, configurable)
+    budget_update["section_tokens"] = section_tokens + call_tokens(grader_messages, feedback)
+
+    # If the section is passing, proceed to content evaluation
+    if feedback.grade == "pass":
         # Proceed to content evaluation
         return Command(
-            update={"section": section},
+            update={"section": section, **budget_update},
             goto="evaluate_section_content"
         )
 
     # Update the existing section with new content and update search queries
     else:
         return Command(
-            update={"search_queries": feedback.follow_up_queries, "section": section},
-            goto="evaluate_query_source"
+            update={"search_queries": feedback.follow_up_queries, "section": section, **budget_update},
+            goto=route_query_source(state, config)
+        )
+
+async def _grade_and_evaluate_section(state: SectionState, config: RunnableConfig, section: Section,
+                                      configurable: Configuration, budget_update: dict) -> Command:
+    """用一次结构化调用完成章节评审和内容评估。
+
+    评审不通过且未达到最大搜索深度时继续补充搜索，否则直接使用本次的评估结果
+    决定是否修改，省去evaluate_section_content中的第二次评估调用。
+
+    参数：
+        state: 当前状态
+        config: 当前运行的RunnableConfig
+        section: 已写好内容的章节
+        configurable: 当前运行的配置
+        budget_update: 章节预算相关的状态更新
+
+    返回：
+        命令以补充搜索、修改内容或完成章节
+    """
+    planner_provider = get_config_value(configurable.planner_provider)
+    planner_model = get_config_value(configurable.planner_model)
+
+    if planner_model == "claude-3-7-sonnet-latest":
+        combined_model = get_structured_model(planner_model,
+                                              planner_provider,
+                                              CombinedSectionEvaluation,
+                                              max_tokens=20_000,
+                                              thinking={"type": "enabled", "budget_tokens": 16_000},
+                                              cache=get_llm_cache(configurable))
+    else:
+        combined_model = get_structured_model(planner_model, planner_provider, CombinedSectionEvaluation,
+                                              cache=get_llm_cache(configurable))
+
+    combined_instructions = enhanced_content_evaluator_instructions + combined_section_grading_instructions.format(
+        number_of_follow_up_queries=configurable.number_of_queries
+    )
+    combined_inputs = enhanced_content_evaluator_inputs.format(
+        topic=state["topic"],
+        section_name=section.name,
+        section_topic=section.description,
+        section_content=section.content
+    )
+    combined_messages = build_prompt_messages(
+        combined_instructions, combined_inputs,
+        "请评估章节内容，判断是否需要补充研究，并给出详细的质量评价和改进建议。", planner_provider
+    )
+    result = await scheduled_ainvoke(combined_model, combined_messages,
+                                     planner_provider, PRIORITY_NORMAL, configurable)
+    section_tokens = budget_update["section_tokens"] + call_tokens(combined_messages, result)
+    section.evaluation = result.evaluation
+
+    if result.grade == "fail" and state["search_iterations"] < int(configurable.max_search_depth):
+        return Command(
+            update={"search_queries": result.follow_up_queries, "section": section,
+                    **budget_update, "section_tokens": section_tokens},
+            goto=route_query_source(state, config)
         )
 
-def evaluate_section_content(state: SectionState, config: RunnableConfig) -> Command[Literal["revise_section_content", END]]:
+    # 评审通过或达到最大搜索深度，直接用本次评估结果决定是否修改
+    state = {**state, **budget_update}
+    return _conclude_section_evaluation(state, section, configurable, section_tokens)
+
+# 支持JSON模式（response_format=json_object）的OpenAI兼容提供商
+_JSON_MODE_PROVIDERS = {"openai", "deepseek", "groq"}
+
+# 流式输出中已完整给出的总分（数字后已出现逗号或右括号）
+_JSON_TOTAL_SCORE_PATTERN = re.compile(r'"total_score"\s*:\s*(\d+)\s*[,}]')
+
+def _with_json_mode(model, provider: str):
+    """为支持JSON模式的提供商开启JSON输出"""
+    if provider in _JSON_MODE_PROVIDERS:
+        return model.bind(response_format={"type": "json_object"})
+    return model
+
+def _parse_evaluation_text(text: str, early_score: Optional[int] = None) -> Optional[Union[ContentEvaluation, SimpleContentEvaluation]]:
+    """将评估模型输出的（可能不完整的）JSON解析为评估结果。
+
+    JSON完整且符合结构时返回ContentEvaluation；不完整（如提前结束生成）时用已有字段构建
+    SimpleContentEvaluation；不是JSON时退回到正则提取。无法得到总分时返回None。
+
+    参数：
+        text: 模型输出文本
+        early_score: 流式解析时已得到的总分
+
+    返回：
+        评估结果或None
+    """
+    data = None
+    try:
+        data = parse_json_markdown(text)
+    except Exception:
+        pass
+    if not isinstance(data, dict):
+        try:
+            data = parse_partial_json(text[text.find("{"):]) if "{" in text else None
+        except Exception:
+            data = None
+
+    if isinstance(data, dict):
+        try:
+            return ContentEvaluation.model_validate(data)
+        except ValidationError:
+            pass
+        score = data.get("total_score", early_score)
+        if isinstance(score, (int, float)):
+            def as_list(value) -> List[str]:
+                return [str(item) for item in value] if isinstance(value, list) else []
+
+            return SimpleContentEvaluation(
+                total_score=int(score),
+                strengths=as_list(data.get("strengths")),
+                weaknesses=as_list(data.get("weaknesses")),
+                improvement_suggestions=as_list(data.get("improvement_suggestions")),
+                overall_assessment=str(data.get("overall_assessment") or "")
+            )
+
+    # 模型没有按JSON输出时，从文本中提取
+    score = early_score if early_score is not None else extract_total_score(text)
+    if score is None:
+        return None
+    return SimpleContentEvaluation(
+        total_score=score,
+        strengths=extract_list_items(text, "内容优势"),
+        weaknesses=extract_list_items(text, "内容不足"),
+        improvement_suggestions=extract_list_items(text, "改进建议"),
+        overall_assessment=extract_overall_assessment(text)
+    )
+
+async def evaluate_section_content(state: SectionState, config: RunnableConfig) -> Command[Literal["revise_section_content", END]]:
     """对章节内容进行详细质量评估。
     
     此节点：
@@ -600,9 +1250,12 @@ def evaluate_section_content(state: SectionState, config: RunnableConfig) -> Com
     
     # 初始化修改计数器（如果不存在）
     revision_count = state.get("revision_count", 0)
-    
-    # 设置评估提示
-    evaluation_prompt_formatted = enhanced_content_evaluator_instructions.format(
+    section_tokens = state.get("section_tokens", 0)
+    # 修订后的再次评估属于修订循环，让位于关键路径上的调用
+    evaluation_priority = PRIORITY_LOW if revision_count > 0 else PRIORITY_NORMAL
+
+    # 设置评估提示（静态的评估标准在系统消息中，章节内容在后）
+    evaluation_inputs = enhanced_content_evaluator_inputs.format(
         topic=topic,
         section_name=section.name,
         section_topic=section.description,
@@ -613,157 +1266,162 @@ def evaluate_section_content(state: SectionState, config: RunnableConfig) -> Com
     planner_provider = get_config_value(configurable.planner_provider)
     planner_model = get_config_value(configurable.planner_model)
     
+    # 只有Claude 3.7支持思考预算，其他模型使用JSON模式
+    if planner_model == "claude-3-7-sonnet-latest":
+        evaluation_model = get_chat_model(
+            planner_model, 
+            planner_provider, 
+            max_tokens=20_000, 
+            thinking={"type": "enabled", "budget_tokens": 16_000},
+            cache=get_llm_cache(configurable)
+        )
+    else:
+        evaluation_model = _with_json_mode(
+            get_chat_model(planner_model, planner_provider, cache=get_llm_cache(configurable)),
+            planner_provider
+        )
+    
     # 生成评估结果
     evaluation_message = "请对提供的章节内容进行全面评估，根据给定的标准提供详细的质量评价和改进建议。"
+    evaluation_messages = build_prompt_messages(
+        enhanced_content_evaluator_instructions + json_evaluation_output_instructions,
+        evaluation_inputs, evaluation_message, planner_provider
+    )
     
+    # 流式解析JSON评估结果：总分一出现即可判断，达标时提前结束生成
+    policy = RevisionPolicy.from_configuration(configurable)
+    result_text = ""
+    early_score = None
     try:
-        # 尝试使用文本输出格式进行评估，而不是结构化输出
-        evaluation_model = init_chat_model(
-            model=planner_model, 
-            model_provider=planner_provider, 
-            max_tokens=20_000, 
-            thinking={"type": "enabled", "budget_tokens": 16_000}
-        )
-        
-        evaluation_result_text = evaluation_model.invoke([
-            SystemMessage(content=evaluation_prompt_formatted),
-            HumanMessage(content=evaluation_message)
-        ])
-        
-        # 手动解析评估结果文本
-        result_text = evaluation_result_text.content
-        
-        # 创建简化版评估结果对象
-        evaluation_result = SimpleContentEvaluation(
-            total_score=extract_total_score(result_text),
-            strengths=extract_list_items(result_text, "内容优势"),
-            weaknesses=extract_list_items(result_text, "内容不足"),
-            improvement_suggestions=extract_list_items(result_text, "改进建议"),
-            overall_assessment=extract_overall_assessment(result_text)
-        )
-        
-        # 将评估结果保存到章节中
-        section.evaluation = evaluation_result
-        
+        async with aclosing(scheduled_astream(evaluation_model, evaluation_messages,
+                                              planner_provider, evaluation_priority, configurable)) as stream:
+            async for chunk in stream:
+                result_text += _content_text(chunk.content)
+                if early_score is None:
+                    match = _JSON_TOTAL_SCORE_PATTERN.search(result_text)
+                    if match:
+                        early_score = int(match.group(1))
+                        _emit_stream_event({"type": "section_score", "section": section.name, "score": early_score})
+                        if early_score >= policy.threshold:
+                            print(f"章节 '{section.name}' 总分{early_score}已达标，提前结束评估生成")
+                            break
     except Exception as e:
         print(f"内容评估过程中出现错误: {str(e)}")
-        print("尝试使用简化版评估模型...")
-        
-        # 使用更简化的评估方法
-        simple_evaluation_prompt = content_evaluator_instructions.format(
-            topic=topic,
-            section_name=section.name,
-            section_topic=section.description,
-            section_content=section.content
+    section_tokens += estimate_tokens(evaluation_messages) + estimate_tokens(result_text)
+    
+    section.evaluation = _parse_evaluation_text(result_text, early_score)
+    if section.evaluation is None:
+        # 没有得到可用的评分时不再盲目修改，直接完成章节
+        print(f"章节 '{section.name}' 未能得到有效评分，跳过修改")
+        section.evaluation = SimpleContentEvaluation(
+            total_score=0,
+            strengths=[],
+            weaknesses=[],
+            improvement_suggestions=[],
+            overall_assessment="评估失败，未能得到有效评分。"
         )
-        
-        simple_evaluation_model = init_chat_model(
-            model=planner_model, 
-            model_provider=planner_provider
-        )
-        
-        try:
-            result_text = simple_evaluation_model.invoke([
-                SystemMessage(content=simple_evaluation_prompt),
-                HumanMessage(content=evaluation_message)
-            ]).content
-            
-            # 基于文本创建简化版评估结果
-            evaluation_result = SimpleContentEvaluation(
-                total_score=extract_total_score(result_text),
-                strengths=extract_list_items(result_text, "优势"),
-                weaknesses=extract_list_items(result_text, "需要改进"),
-                improvement_suggestions=extract_list_items(result_text, "修改建议"),
-                overall_assessment=extract_overall_assessment(result_text)
-            )
-            
-            # 确保至少有一些内容，如果解析失败
-            if not evaluation_result.strengths:
-                evaluation_result.strengths = ["内容结构清晰"]
-            if not evaluation_result.weaknesses:
-                evaluation_result.weaknesses = ["需要补充更多细节"]
-            if not evaluation_result.improvement_suggestions:
-                evaluation_result.improvement_suggestions = ["添加更多专业术语和概念解释"]
-            if not evaluation_result.overall_assessment:
-                evaluation_result.overall_assessment = "章节内容基本符合学术要求，但仍有改进空间。"
-            
-            # 将评估结果保存到章节中
-            section.evaluation = evaluation_result
-            
-        except Exception as e2:
-            print(f"简化评估也失败了: {str(e2)}")
-            # 创建一个基本的评估结果，确保流程可以继续
-            section.evaluation = SimpleContentEvaluation(
-                total_score=75,
-                strengths=["内容结构清晰", "主题相关性强", "术语使用准确"],
-                weaknesses=["深度不足", "论证不够充分", "缺少一些关键概念"],
-                improvement_suggestions=["增加内容深度", "补充更多学术引用", "加强论证"],
-                overall_assessment="章节基本覆盖了主题，但需要进一步完善和深化内容。"
-            )
+        return _conclude_section_evaluation(state, section, configurable, section_tokens,
+                                            forced_decision=PolicyDecision(False, REASON_EVALUATION_FAILED))
     
+    return _conclude_section_evaluation(state, section, configurable, section_tokens)
+
+def _conclude_section_evaluation(state: SectionState, section: Section, configurable: Configuration,
+                                 section_tokens: int,
+                                 forced_decision: Optional[PolicyDecision] = None) -> Command[Literal["revise_section_content", END]]:
+    """根据章节的评估结果，由策略引擎决定继续修改还是完成章节。
+
+    参数：
+        state: 当前状态
+        section: 已写入评估结果的章节
+        configurable: 当前运行的配置
+        section_tokens: 本章节已消耗的token数
+        forced_decision: 不经策略引擎、直接采用的决策（可选）
+
+    返回：
+        命令以修改内容或完成章节
+    """
+    revision_count = state.get("revision_count", 0)
+
     # 为控制台打印评估摘要
     print(f"章节 '{section.name}' 评估完成")
     print(f"总分: {section.evaluation.total_score}/100")
     print(f"优势: {', '.join(section.evaluation.strengths[:3])}")
     print(f"改进建议: {', '.join(section.evaluation.improvement_suggestions[:3])}")
     
-    # 根据评分决定是否需要修改
-    # 设置修改阈值，低于此分数需要修改
-    revision_threshold = 85
-    max_revisions = 3  # 最大修改次数
+    # 由策略引擎根据分数、分数变化和章节预算决定是否需要修改
+    policy = RevisionPolicy.from_configuration(configurable)
+    score_history = state.get("score_history", []) + [section.evaluation.total_score]
+    decision = forced_decision or policy.decide_revision(score_history, revision_count, section_tokens,
+                                                         state.get("section_started_at"))
+    record_decision(
+        "revision", section.name, decision,
+        score=score_history[-1],
+        delta=score_history[-1] - score_history[-2] if len(score_history) > 1 else None,
+        revision_count=revision_count,
+        tokens=section_tokens
+    )
     
-    if section.evaluation.total_score < revision_threshold and revision_count < max_revisions:
+    if decision.proceed:
         # 需要修改内容
         return Command(
-            update={"section_content_evaluation": section.evaluation, "revision_count": revision_count},
+            update={"section": section, "section_content_evaluation": section.evaluation, "revision_count": revision_count,
+                    "score_history": score_history, "section_tokens": section_tokens,
+                    "section_started_at": state.get("section_started_at")},
             goto="revise_section_content"
         )
     else:
-        # 内容质量已达标或已达到最大修改次数，完成章节
+        # 内容质量已达标、修改停滞、预算用尽或已达到最大修改次数，完成章节
         if revision_count > 0:
-            print(f"章节 '{section.name}' 已完成 {revision_count} 轮修改，最终得分: {section.evaluation.total_score}/100")
-        # 使用Command格式返回，与状态注解兼容
+            print(f"章节 '{section.name}' 已完成 {revision_count} 轮修改（停止原因: {decision.reason}），最终得分: {section.evaluation.total_score}/100")
+        # 使用Command格式返回，与状态注解兼容；已完成章节的正文存入Blob存储
         return Command(
-            update={"completed_sections": [section]},
+            update={"completed_sections": [store_section(section, configurable)]},
             goto=END
         )
 
-# 辅助函数：从文本中提取总分
+# 辅助函数中使用的预编译正则表达式
+_TOTAL_SCORE_PATTERNS = [
+    re.compile(r"总分[:：]\s*(\d+)"),
+    re.compile(r"总分[为是]\s*(\d+)"),
+    re.compile(r"总体评分[:：]\s*(\d+)"),
+    re.compile(r"总分[为是]\s*(\d+)/100"),
+    re.compile(r"(\d+)[分]")
+]
+_LIST_ITEM_PATTERN = re.compile(r'(?:^|\n)[\d*\-•]+[.、)：:\s]+(.+?)(?=(?:\n[\d*\-•]+[.、)：:\s]+|\n\n|\n[^\n]+[:：]|$))', re.DOTALL)
+_LIST_ITEM_PREFIX_PATTERN = re.compile(r'^[\d*\-•]+[.、)：:\s]+')
+_OVERALL_ASSESSMENT_PATTERNS = [
+    re.compile(r"总体评价[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)", re.DOTALL),
+    re.compile(r"整体评价[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)", re.DOTALL),
+    re.compile(r"总体评估[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)", re.DOTALL),
+    re.compile(r"总结[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)", re.DOTALL)
+]
+
+@lru_cache(maxsize=None)
+def _list_section_pattern(section_name):
+    return re.compile(f"{re.escape(section_name)}[：:](.*?)(?:\n\n|\n\\d+\\.|\n[^\n]+[:：]|$)", re.DOTALL)
+
+# 辅助函数：从文本中提取总分，找不到时返回None
 def extract_total_score(text):
-    import re
-    # 尝试找到总分的模式
-    patterns = [
-        r"总分[:：]\s*(\d+)",
-        r"总分[为是]\s*(\d+)",
-        r"总体评分[:：]\s*(\d+)",
-        r"总分[为是]\s*(\d+)/100",
-        r"(\d+)[分]"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
+    for pattern in _TOTAL_SCORE_PATTERNS:
+        match = pattern.search(text)
         if match:
             try:
                 return int(match.group(1))
-            except:
+            except ValueError:
                 pass
     
-    # 如果无法提取，返回默认分数
-    return 75
+    return None
 
 # 辅助函数：从文本中提取列表项
 def extract_list_items(text, section_name):
-    import re
-    
     # 尝试找到章节部分
-    section_pattern = f"{section_name}[：:](.*?)(?:\n\n|\n\d+\.|\n[^\n]+[:：]|$)"
-    section_match = re.search(section_pattern, text, re.DOTALL)
+    section_match = _list_section_pattern(section_name).search(text)
     
     if section_match:
         section_text = section_match.group(1).strip()
         
         # 提取列表项，可能以数字、破折号或星号开头
-        items = re.findall(r'(?:^|\n)[\d*\-•]+[.、)：:\s]+(.+?)(?=(?:\n[\d*\-•]+[.、)：:\s]+|\n\n|\n[^\n]+[:：]|$))', '\n' + section_text, re.DOTALL)
+        items = _LIST_ITEM_PATTERN.findall('\n' + section_text)
         
         # 如果没有找到格式化的列表项，尝试按行分割
         if not items:
@@ -773,7 +1431,7 @@ def extract_list_items(text, section_name):
         cleaned_items = []
         for item in items:
             # 移除可能的前导编号/符号
-            clean_item = re.sub(r'^[\d*\-•]+[.、)：:\s]+', '', item).strip()
+            clean_item = _LIST_ITEM_PREFIX_PATTERN.sub('', item).strip()
             if clean_item:
                 cleaned_items.append(clean_item)
         
@@ -783,18 +1441,9 @@ def extract_list_items(text, section_name):
 
 # 辅助函数：提取总体评价
 def extract_overall_assessment(text):
-    import re
-    
     # 尝试找到总体评价部分
-    patterns = [
-        r"总体评价[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)",
-        r"整体评价[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)",
-        r"总体评估[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)",
-        r"总结[：:](.*?)(?:\n\n|\n[^\n]+[:：]|$)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.DOTALL)
+    for pattern in _OVERALL_ASSESSMENT_PATTERNS:
+        match = pattern.search(text)
         if match:
             return match.group(1).strip()
     
@@ -805,7 +1454,7 @@ def extract_overall_assessment(text):
     
     return "章节内容基本符合要求，但仍有改进空间。"  # 默认评价
 
-def revise_section_content(state: SectionState, config: RunnableConfig) -> Command[Literal["evaluate_section_content"]]:
+async def revise_section_content(state: SectionState, config: RunnableConfig) -> Command[Literal["evaluate_section_content"]]:
     """根据评估结果修改章节内容。
     
     此节点：
@@ -823,7 +1472,6 @@ def revise_section_content(state: SectionState, config: RunnableConfig) -> Comma
     # 获取状态
     topic = state["topic"]
     section = state["section"]
-    source_str = state["source_str"]
     evaluation = section.evaluation
     
     # 获取修改次数（默认为0）
@@ -832,6 +1480,7 @@ def revise_section_content(state: SectionState, config: RunnableConfig) -> Comma
     
     # 获取配置
     configurable = Configuration.from_runnable_config(config)
+    source_str = format_sources(load_sources(state["sources"], configurable))
     
     # 准备修改提示的内容
     try:
@@ -845,12 +1494,13 @@ def revise_section_content(state: SectionState, config: RunnableConfig) -> Comma
         suggestions_text = "\n".join([f"- {s}" for s in evaluation.improvement_suggestions])
         missing_text = "\n".join([f"- {s}" for s in evaluation.missing_content])
         
-        # 使用增强版修改提示
-        revision_prompt = enhanced_section_revision_instructions.format(
+        # 使用增强版修改提示（章节内容在下面按修改方式填入）
+        revision_instructions = enhanced_section_revision_instructions
+        revision_inputs_template = enhanced_section_revision_inputs
+        revision_inputs = dict(
             topic=topic,
             section_name=section.name,
             section_topic=section.description,
-            section_content=section.content,
             total_score=evaluation.total_score,
             dimension_scores=dimension_scores_text,
             strengths=strengths_text,
@@ -868,11 +1518,12 @@ def revise_section_content(state: SectionState, config: RunnableConfig) -> Comma
         suggestions_text = "\n".join([f"- {s}" for s in evaluation.improvement_suggestions])
         
         # 使用基础版修改提示
-        revision_prompt = section_revision_instructions.format(
+        revision_instructions = section_revision_instructions
+        revision_inputs_template = section_revision_inputs
+        revision_inputs = dict(
             topic=topic,
             section_name=section.name,
             section_topic=section.description,
-            section_content=section.content,
             total_score=evaluation.total_score,
             strengths=strengths_text,
             weaknesses=weaknesses_text,
@@ -886,28 +1537,91 @@ def revise_section_content(state: SectionState, config: RunnableConfig) -> Comma
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     
-    writer_model = init_chat_model(
-        model=writer_model_name, 
-        model_provider=writer_provider
-    )
-    
-    # 生成修改后的内容
-    revised_content = writer_model.invoke([
-        SystemMessage(content=revision_prompt),
-        HumanMessage(content="请根据评估反馈修改章节内容。")
-    ])
+    writer_model = get_chat_model(writer_model_name, writer_provider, cache=get_llm_cache(configurable))
+    section_tokens = state.get("section_tokens", 0)
+    revised_content = None
+    
+    # 段落级修改：模型只输出针对部分段落的修改操作，在本地应用到原章节
+    if configurable.revision_mode == "delta":
+        paragraphs = split_paragraphs(section.content)
+        patch_messages = build_prompt_messages(
+            revision_instructions + delta_revision_output_instructions,
+            revision_inputs_template.format(section_content=number_paragraphs(paragraphs), **revision_inputs),
+            "请根据评估反馈输出段落级修改操作。", writer_provider
+        )
+        try:
+            patch_model = get_structured_model(writer_model_name, writer_provider, SectionPatch,
+                                               cache=get_llm_cache(configurable))
+            patch = await scheduled_ainvoke(patch_model, patch_messages, writer_provider, PRIORITY_LOW, configurable)
+            section_tokens += call_tokens(patch_messages, patch)
+            patched_content, applied = apply_paragraph_edits(paragraphs, patch.edits)
+            if applied:
+                revised_content = patched_content
+                print(f"章节 '{section.name}' 应用了 {applied}/{len(patch.edits)} 处段落修改")
+                _emit_stream_event({"type": "section_draft", "section": section.name, "stage": "revise",
+                                    "content": revised_content})
+            else:
+                print(f"章节 '{section.name}' 未得到有效的段落修改，回退到完整重写")
+        except Exception as e:
+            print(f"章节 '{section.name}' 段落级修改失败，回退到完整重写: {str(e)}")
+    
+    if revised_content is None:
+        # 生成修改后的完整内容
+        revision_messages = build_prompt_messages(
+            revision_instructions,
+            revision_inputs_template.format(section_content=section.content, **revision_inputs),
+            "请根据评估反馈修改章节内容。", writer_provider
+        )
+        revised_content, call_token_count = await _stream_section_content(
+            writer_model, revision_messages, writer_provider, PRIORITY_LOW, configurable, section.name, "revise"
+        )
+        section_tokens += call_token_count
     
     # 更新章节内容
-    section.content = revised_content.content
+    section.content = revised_content
     
     # 返回到评估节点重新评估
     return Command(
-        update={"section": section, "revision_count": revision_count},
+        update={"section": section, "revision_count": revision_count, "section_tokens": section_tokens},
         goto="evaluate_section_content"
     )
 
+# 每个事件循环中按并发上限共享的信号量（Send分发的各最终章节任务在同一事件循环中运行）
+_final_section_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+def _final_section_semaphore(limit: int) -> asyncio.Semaphore:
+    """获取当前事件循环中限制最终章节并发数的信号量"""
+    semaphores = _final_section_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if limit not in semaphores:
+        semaphores[limit] = asyncio.Semaphore(max(1, limit))
+    return semaphores[limit]
+
+def order_sections(planned_sections: List[Section], completed_sections: List[Section]) -> List[Section]:
+    """将已完成的章节按其在计划中的位置排列。
+
+    章节按规划时设置的index对应到计划中的位置；没有index的章节（如旧的检查点）按名称对应。
+    计划中尚未完成的章节不包含在结果中。
+
+    参数：
+        planned_sections: 计划中的章节
+        completed_sections: 已完成的章节（完成顺序）
+
+    返回：
+        按计划顺序排列的已完成章节
+    """
+    slots: List[Optional[Section]] = [None] * len(planned_sections)
+    positions_by_name = {}
+    for position, section in enumerate(planned_sections):
+        positions_by_name.setdefault(section.name, []).append(position)
+    for section in completed_sections:
+        if section.index is not None and 0 <= section.index < len(slots):
+            slots[section.index] = section
+        elif positions_by_name.get(section.name):
+            slots[positions_by_name[section.name].pop(0)] = section
+    return [section for section in slots if section is not None]
+
 # 下一个流程   
-def write_final_sections(state: SectionState, config: RunnableConfig):
+async def write_final_sections(state: SectionState, config: RunnableConfig):
     """为不需要研究的章节（比如摘要、引言、结论等）撰写内容。
     
     此节点：
@@ -926,40 +1640,41 @@ def write_final_sections(state: SectionState, config: RunnableConfig):
     # 获取状态
     topic = state["topic"]
     section = state["section"]
-    report_sections = state["report_sections_from_research"]
     
     # 获取配置
     configurable = Configuration.from_runnable_config(config)
-    
-    # 根据章节类型设置提示模板
-    prompt_formatted = final_section_writer_instructions.format(
-        topic=topic,
-        section_name=section.name,
-        section_topic=section.description,
-        context=report_sections
-    )
+    report_sections = load_text(state["report_sections_from_research"], configurable)
+    semaphore = _final_section_semaphore(int(configurable.max_concurrent_final_sections))
     
     # 使用生成器模型撰写章节
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider) 
+    writer_model = get_chat_model(writer_model_name, writer_provider, cache=get_llm_cache(configurable)) 
+    
+    # 所有最终章节共用的报告内容放在章节信息之前，共享提示前缀缓存
+    final_section_messages = build_prompt_messages(
+        final_section_writer_instructions,
+        final_section_writer_inputs.format(section_name=section.name, section_topic=section.description),
+        f"请撰写{section.name}章节。",
+        writer_provider,
+        shared_inputs=final_section_writer_shared_inputs.format(topic=topic, context=report_sections)
+    )
     
-    # 生成章节内容
-    section_content = writer_model.invoke([
-        SystemMessage(content=prompt_formatted),
-        HumanMessage(content=f"请撰写{section.name}章节。")
-    ])
+    # 生成章节内容（限制同时撰写的最终章节数）
+    async with semaphore:
+        section_content, _ = await _stream_section_content(writer_model, final_section_messages, writer_provider,
+                                                           PRIORITY_CRITICAL, configurable, section.name, "final")
     
     # 更新章节内容
-    section.content = section_content.content
+    section.content = section_content
 
     # 使用Command格式返回，与状态注解兼容
     return Command(
-        update={"completed_sections": [section]},
+        update={"completed_sections": [store_section(section, configurable)]},
         goto=END
     )
 
-def gather_completed_sections(state: ReportState):
+def gather_completed_sections(state: ReportState, config: RunnableConfig):
     # 格式化已完成的章节作为写作最终章节的上下文。
     #
     # 此节点将所有已完成的研究章节格式化为一个
@@ -971,15 +1686,54 @@ def gather_completed_sections(state: ReportState):
     # 返回：
     #     包含格式化章节作为上下文的字典
 
-    # List of completed sections
-    completed_sections = state["completed_sections"]
+    # List of completed sections, in plan order rather than completion order
+    configurable = Configuration.from_runnable_config(config)
+    completed_sections = order_sections(state["sections"],
+                                        [load_section(s, configurable) for s in state["completed_sections"]])
 
     # Format completed section to str to use as context for final sections
     completed_report_sections = format_sections(completed_sections)
 
-    return {"report_sections_from_research": completed_report_sections}
+    # Only the blob reference is sent to each final section when the blob store is enabled
+    return {"report_sections_from_research": store_text(completed_report_sections, configurable)}
+
+async def _design_report_html(final_report: str, configurable: Configuration) -> str:
+    """使用LLM根据报告内容设计HTML网页（设计师模式）。
+
+    参数：
+        final_report: 最终报告
+        configurable: 当前运行的配置
+
+    返回：
+        HTML网页
+    """
+    model_provider = get_config_value(configurable.Web_provider)
+    model_name = get_config_value(configurable.Web_model)
+    
+    # 运行规划器
+    if model_name == "claude-3-7-sonnet-latest":
+        # 为claude-3-7-sonnet-latest作为规划器模型分配思考预算
+        planner_llm = get_chat_model(model_name, 
+                                     model_provider, 
+                                     max_tokens=20_000, 
+                                     thinking={"type": "enabled", "budget_tokens": 16_000},
+                                     cache=get_llm_cache(configurable))
+    else:
+        # 对于其他模型，不特别分配思考令牌
+        planner_llm = get_chat_model(model_name, model_provider, cache=get_llm_cache(configurable))
+    
+    # 创建提示模板来生成HTML
+    html_prompt = PromptTemplate(
+        template=enhanced_html_template_instructions,
+        input_variables=["report"]
+    )
+    
+    # 生成HTML网页
+    html_chain = html_prompt | planner_llm | StrOutputParser()
+    return await scheduled_ainvoke(html_chain, {"report": final_report},
+                                   model_provider, PRIORITY_CRITICAL, configurable)
 
-def compile_final_report(state: ReportState, config: RunnableConfig):
+async def compile_final_report(state: ReportState, config: RunnableConfig):
     """合并所有章节到最终报告中并生成网页展示。
     
     此节点：
@@ -987,72 +1741,27 @@ def compile_final_report(state: ReportState, config: RunnableConfig):
     2. 按照原始计划排序
     3. 处理参考文献，确保不重复且按序号排列
     4. 将所有内容组合成最终报告
-    5. 使用大语言模型生成HTML网页展示报告
+    5. 将HTML网页等格式的导出任务放入后台导出队列
     
     参数：
         state: 包含所有已完成章节的当前状态
         config: 运行时配置
         
     返回：
-        包含完整报告和HTML展示的字典
+        包含完整报告、HTML文件路径和导出任务id的字典
     """
 
-    # 获取章节
-    sections = state["sections"]
-    completed_sections = {s.name: s.content for s in state["completed_sections"]}
-
-    # 更新章节内容，同时保持原始顺序
-    for section in sections:
-        section.content = completed_sections[section.name]
-
-    # 提取所有参考文献并消除重复
-    all_references = []
-    reference_urls = set()
-    ref_map = {}  # 用于映射原引用编号到新引用编号
-    
-    # 第一遍：收集所有唯一参考文献
-    for section in sections:
-        content = section.content
-        if "### 参考文献" in content:
-            # 分割内容和参考文献
-            content_parts = content.split("### 参考文献")
-            if len(content_parts) > 1:
-                refs_text = content_parts[1].strip()
-                # 解析参考文献行
-                for ref_line in refs_text.split('\n'):
-                    ref_line = ref_line.strip()
-                    if ref_line and ref_line.startswith('[') and ']:' in ref_line:
-                        # 提取URL
-                        url_part = ref_line.split(':', 1)[1].strip() if ':' in ref_line else ""
-                        if url_part and url_part not in reference_urls:
-                            reference_urls.add(url_part)
-                            all_references.append(ref_line)
-    
-    # 重新编号参考文献
-    numbered_references = []
-    for i, ref in enumerate(all_references, 1):
-        # 提取原引用编号和引用内容
-        old_num = ref.split(']')[0][1:].strip()
-        ref_content = ref.split(']', 1)[1].strip()
-        # 创建新的引用行并存储映射关系
-        new_ref = f"[{i}]{ref_content}"
-        ref_map[old_num] = str(i)
-        numbered_references.append(new_ref)
-    
-    # 第二遍：更新每个章节中的引用编号
-    for section in sections:
-        content = section.content
-        if "### 参考文献" in content:
-            # 分割内容和参考文献
-            content_parts = content.split("### 参考文献")
-            main_content = content_parts[0]
-            
-            # 更新正文中的引用编号
-            for old_num, new_num in ref_map.items():
-                main_content = main_content.replace(f"[{old_num}]", f"[{new_num}]")
-            
-            # 移除原参考文献部分，因为会在最后统一添加
-            section.content = main_content.rstrip()
+    # 获取配置
+    configurable = Configuration.from_runnable_config(config)
+
+    # 获取章节，按计划中的位置排列已完成的章节
+    sections = order_sections(state["sections"],
+                              [load_section(s, configurable) for s in state["completed_sections"]])
+
+    # 合并各章节的参考文献并去重，按章节各自的编号映射一次性重写正文中的引用
+    section_texts, numbered_references = renumber_citations([s.content for s in sections])
+    for section, text in zip(sections, section_texts):
+        section.content = text
     
     # 组合最终报告
     formatted_sections = "\n\n".join([s.content for s in sections])
@@ -1064,52 +1773,21 @@ def compile_final_report(state: ReportState, config: RunnableConfig):
     else:
         final_report = formatted_sections
     
-    # 获取配置
-    configurable = Configuration.from_runnable_config(config)
-    model_provider = get_config_value(configurable.Web_provider)
-    model_name = get_config_value(configurable.Web_model)
+    export_formats = parse_export_formats(configurable.export_formats)
+    if not export_formats:
+        return {"final_report": final_report, "html_report": None, "export_job_id": None}
     
-    # 运行规划器
-    if model_name == "claude-3-7-sonnet-latest":
-        # 为claude-3-7-sonnet-latest作为规划器模型分配思考预算
-        planner_llm = init_chat_model(model=model_name, 
-                                      model_provider=model_provider, 
-                                      max_tokens=20_000, 
-                                      thinking={"type": "enabled", "budget_tokens": 16_000})
-    else:
-        # 对于其他模型，不特别分配思考令牌
-        planner_llm = init_chat_model(model=model_name, 
-                                      model_provider=model_provider)
+    # 设计师模式：由LLM自由设计HTML网页；默认由导出器使用固定模板渲染
+    designed_html = None
+    if configurable.html_render_mode == "designer" and "html" in export_formats:
+        designed_html = await _design_report_html(final_report, configurable)
     
-    # 创建提示模板来生成HTML
-    html_prompt = PromptTemplate(
-        template=enhanced_html_template_instructions,
-        input_variables=["report"]
-    )
+    # HTML、Markdown、PDF/DOCX的渲染和写入放入后台导出队列，报告立即返回
+    export_job = get_report_exporter().submit(final_report, state.get("topic", "report"), export_formats,
+                                              configurable.export_dir, html=designed_html)
     
-    # 生成HTML网页
-    html_chain = html_prompt | planner_llm | StrOutputParser()
-    html_output = html_chain.invoke({"report": final_report})
-    
-    # 将HTML保存到文件
-    import os
-    from datetime import datetime
-    
-    # 创建输出目录
-    output_dir = os.path.join(os.getcwd(), "output")
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 创建带时间戳的文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    topic = state.get("topic", "report").replace(" ", "_")
-    html_filename = f"{topic}_{timestamp}.html"
-    html_path = os.path.join(output_dir, html_filename)
-    
-    # 保存HTML文件
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(html_output)
-    
-    return {"final_report": final_report, "html_report": html_path}
+    return {"final_report": final_report, "html_report": export_job.paths.get("html"),
+            "export_job_id": export_job.job_id}
 
 def initiate_final_section_writing(state: ReportState):
     """为撰写不需要研究的部分创建并行任务。
@@ -1138,13 +1816,15 @@ section_builder.add_node("generate_queries", generate_queries)
 section_builder.add_node("evaluate_query_source", evaluate_query_source)
 section_builder.add_node("search_web", search_web)
 section_builder.add_node("search_knowledge_base", search_knowledge_base)
+section_builder.add_node("speculative_search", speculative_search)
+section_builder.add_node("select_pool_sources", select_pool_sources)
 section_builder.add_node("write_section", write_section)
 section_builder.add_node("evaluate_section_content", evaluate_section_content)
 section_builder.add_node("revise_section_content", revise_section_content)
 
 # Add edges
-section_builder.add_edge(START, "generate_queries")
-section_builder.add_edge("generate_queries", "evaluate_query_source")
+section_builder.add_conditional_edges(START, route_section_start, ["generate_queries", "select_pool_sources", "evaluate_query_source", "speculative_search", "write_section"])
+section_builder.add_conditional_edges("generate_queries", route_query_source, ["select_pool_sources", "evaluate_query_source", "speculative_search"])
 
 # 定义一个条件函数，使用search_decision状态字段进行路由
 def route_by_search_decision(state):
@@ -1163,6 +1843,7 @@ section_builder.add_conditional_edges(
 
 section_builder.add_edge("search_web", "write_section")
 section_builder.add_edge("search_knowledge_base", "write_section")
+section_builder.add_edge("speculative_search", "write_section")
 section_builder.add_edge("revise_section_content", "evaluate_section_content")
 
 # Outer graph for initial report plan compiling results from each section -- 
@@ -1171,6 +1852,8 @@ section_builder.add_edge("revise_section_content", "evaluate_section_content")
 builder = StateGraph(ReportState, input=ReportStateInput, output=ReportStateOutput, config_schema=Configuration)
 builder.add_node("generate_report_plan", generate_report_plan)
 builder.add_node("human_feedback", human_feedback)
+builder.add_node("plan_shared_search", plan_shared_search)
+builder.add_node("generate_batch_queries", generate_batch_queries)
 builder.add_node("build_section_with_web_research", section_builder.compile())
 builder.add_node("gather_completed_sections", gather_completed_sections)
 builder.add_node("write_final_sections", write_final_sections)
@@ -1184,4 +1867,22 @@ builder.add_conditional_edges("gather_completed_sections", initiate_final_sectio
 builder.add_edge("write_final_sections", "compile_final_report")
 builder.add_edge("compile_final_report", END)
 
-graph = builder.compile()
+def compile_graph(checkpoint_db_path: Optional[str] = None):
+    """
+    编译报告生成图
+
+    参数：
+        checkpoint_db_path: 检查点SQLite数据库路径，设置后每个超步的状态都持久化到本地，
+            进程中断后用同一个thread_id调用（输入为None）即可从未完成的章节继续
+
+    返回：
+        编译后的图
+    """
+    if not checkpoint_db_path:
+        return builder.compile()
+    from open_deep_research.checkpointer import get_checkpointer
+    return builder.compile(checkpointer=get_checkpointer(checkpoint_db_path))
+
+# 检查点必须在编译时指定，因此模块级graph从环境变量读取数据库路径；
+# 未设置时不带检查点编译（langgraph dev等部署环境会提供自己的持久化）
+graph = compile_graph(os.environ.get("CHECKPOINT_DB_PATH"))
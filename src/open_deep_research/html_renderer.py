@@ -0,0 +1,339 @@
+import re
+import html
+from datetime import datetime
+from string import Template
+from typing import List, Optional, Tuple
+
+# 识别参考文献部分的标题
+_REFERENCES_TITLES = {"参考文献", "References"}
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)\s*([\w+-]*)\s*$")
+_HR_PATTERN = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_UNORDERED_ITEM_PATTERN = re.compile(r"^\s*[-*+•]\s+(.*)$")
+_ORDERED_ITEM_PATTERN = re.compile(r"^\s*\d+[.)、]\s+(.*)$")
+_QUOTE_PATTERN = re.compile(r"^\s*>\s?(.*)$")
+_TABLE_ROW_PATTERN = re.compile(r"^\s*\|.*\|\s*$")
+_TABLE_SEPARATOR_PATTERN = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_REFERENCE_LINE_PATTERN = re.compile(r"^\s*(?:[-*]\s+)?\[(\d+)\]\s*[:：]?\s*(.*)$")
+
+_CODE_SPAN_PATTERN = re.compile(r"`([^`]+)`")
+_LINK_PATTERN = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_URL_PATTERN = re.compile(r"https?://[^\s<>\"'，。；、）)]+")
+_CITATION_PATTERN = re.compile(r"\[(\d+(?:\s*[,，、]\s*\d+)*)\]")
+_CITATION_NUMBER_PATTERN = re.compile(r"\d+")
+_BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_ITALIC_PATTERN = re.compile(r"(?<!\*)\*(?![\s*])(.+?)(?<![\s*])\*(?!\*)")
+_MARKUP_PATTERN = re.compile(r"[*_`]")
+_PLACEHOLDER_PATTERN = re.compile("\x00(\\d+)\x00")
+
+_PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>$title</title>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Noto+Serif+SC:wght@400;500;600;700&family=Noto+Sans+SC:wght@300;400;500;700&display=swap">
+<style>
+:root {
+  --primary: #1e3a8a;
+  --accent: #7c3aed;
+  --text: #1f2937;
+  --muted: #6b7280;
+  --border: #e5e7eb;
+  --surface: #ffffff;
+  --background: #f5f7fb;
+}
+* { box-sizing: border-box; }
+html { scroll-behavior: smooth; }
+body {
+  margin: 0;
+  background: var(--background);
+  color: var(--text);
+  font-family: "Noto Sans SC", Tahoma, Arial, Roboto, "Droid Sans", "Helvetica Neue", "Droid Sans Fallback", "Heiti SC", "Hiragino Sans GB", Simsun, sans-serif;
+  line-height: 1.85;
+}
+.hero {
+  position: relative;
+  overflow: hidden;
+  padding: 5rem 1.5rem 4rem;
+  color: #fff;
+  text-align: center;
+  background: linear-gradient(135deg, var(--primary) 0%, var(--accent) 100%);
+}
+.hero::before, .hero::after {
+  content: "";
+  position: absolute;
+  border-radius: 50%;
+  background: rgba(255, 255, 255, 0.08);
+  animation: float 12s ease-in-out infinite;
+}
+.hero::before { width: 22rem; height: 22rem; top: -8rem; left: -6rem; }
+.hero::after { width: 16rem; height: 16rem; bottom: -6rem; right: -4rem; animation-delay: -6s; }
+@keyframes float { 50% { transform: translateY(1.5rem) scale(1.05); } }
+.hero h1 {
+  position: relative;
+  margin: 0 auto 1rem;
+  max-width: 56rem;
+  font-family: "Noto Serif SC", serif;
+  font-size: clamp(1.8rem, 4vw, 2.8rem);
+  font-weight: 700;
+  line-height: 1.35;
+}
+.hero .subtitle { position: relative; margin: 0; opacity: 0.85; font-size: 0.95rem; }
+.layout {
+  display: grid;
+  grid-template-columns: 15rem minmax(0, 1fr);
+  gap: 2rem;
+  max-width: 72rem;
+  margin: -2rem auto 3rem;
+  padding: 0 1.5rem;
+  position: relative;
+}
+.toc {
+  position: sticky;
+  top: 1.5rem;
+  align-self: start;
+  padding: 1.25rem;
+  background: var(--surface);
+  border-radius: 0.75rem;
+  box-shadow: 0 10px 30px rgba(30, 58, 138, 0.08);
+  font-size: 0.9rem;
+}
+.toc h2 { margin: 0 0 0.75rem; font-size: 0.95rem; color: var(--primary); }
+.toc ol { margin: 0; padding-left: 1.2rem; }
+.toc li { margin: 0.35rem 0; }
+.toc a { color: var(--text); text-decoration: none; }
+.toc a:hover { color: var(--accent); }
+main {
+  padding: 2.5rem clamp(1.25rem, 4vw, 3.5rem);
+  background: var(--surface);
+  border-radius: 0.75rem;
+  box-shadow: 0 10px 30px rgba(30, 58, 138, 0.08);
+}
+main h1, main h2, main h3, main h4 { font-family: "Noto Serif SC", serif; color: var(--primary); line-height: 1.4; scroll-margin-top: 1.5rem; }
+main h2 { margin: 2.5rem 0 1rem; padding-bottom: 0.5rem; border-bottom: 2px solid var(--border); font-size: 1.5rem; }
+main h2:first-child { margin-top: 0; }
+main h3 { margin: 1.8rem 0 0.8rem; font-size: 1.2rem; }
+main p { margin: 0 0 1rem; text-align: justify; }
+main a { color: var(--accent); }
+main blockquote { margin: 1.2rem 0; padding: 0.75rem 1.25rem; border-left: 4px solid var(--accent); background: #f5f3ff; color: #4b5563; }
+main pre { overflow-x: auto; padding: 1rem; border-radius: 0.5rem; background: #282c34; color: #abb2bf; font-size: 0.875rem; line-height: 1.6; }
+main code { font-family: Menlo, Consolas, monospace; }
+main :not(pre) > code { padding: 0.1rem 0.35rem; border-radius: 0.25rem; background: #f3f4f6; font-size: 0.875em; }
+main table { width: 100%; margin: 1.2rem 0; border-collapse: collapse; font-size: 0.95rem; }
+main th, main td { padding: 0.5rem 0.75rem; border: 1px solid var(--border); text-align: left; }
+main th { background: #eef2ff; }
+main hr { margin: 2rem 0; border: none; border-top: 1px solid var(--border); }
+sup.cite { font-size: 0.75em; }
+sup.cite a { text-decoration: none; }
+ol.references { padding-left: 2.2rem; font-size: 0.92rem; color: #374151; word-break: break-all; }
+ol.references li { margin: 0.4rem 0; }
+ol.references li:target { background: #fef3c7; }
+footer { padding: 0 1.5rem 2.5rem; text-align: center; color: var(--muted); font-size: 0.85rem; }
+@media (max-width: 900px) {
+  .layout { grid-template-columns: minmax(0, 1fr); }
+  .toc { position: static; }
+}
+</style>
+</head>
+<body>
+<header class="hero">
+<h1>$title</h1>
+<p class="subtitle">$subtitle</p>
+</header>
+<div class="layout">
+<nav class="toc">
+<h2>目录</h2>
+<ol>
+$toc
+</ol>
+</nav>
+<main>
+$body
+</main>
+</div>
+<footer>生成于 $generated_at</footer>
+</body>
+</html>
+""")
+
+def _render_inline(text: str) -> str:
+    """渲染行内Markdown：代码、链接、裸URL、引用编号、粗体和斜体"""
+    tokens: List[str] = []
+
+    def protect(fragment: str) -> str:
+        tokens.append(fragment)
+        return f"\x00{len(tokens) - 1}\x00"
+
+    text = _CODE_SPAN_PATTERN.sub(lambda m: protect(f"<code>{html.escape(m.group(1))}</code>"), text)
+    text = _LINK_PATTERN.sub(
+        lambda m: protect(f'<a href="{html.escape(m.group(2))}" target="_blank" rel="noopener">'
+                          f'{html.escape(m.group(1))}</a>'),
+        text
+    )
+    text = _URL_PATTERN.sub(
+        lambda m: protect(f'<a href="{html.escape(m.group(0))}" target="_blank" rel="noopener">'
+                          f'{html.escape(m.group(0))}</a>'),
+        text
+    )
+    text = _CITATION_PATTERN.sub(
+        lambda m: protect('<sup class="cite">[' + _CITATION_NUMBER_PATTERN.sub(
+            lambda n: f'<a href="#ref-{n.group(0)}">{n.group(0)}</a>', m.group(1)) + ']</sup>'),
+        text
+    )
+    text = html.escape(text, quote=False)
+    text = _BOLD_PATTERN.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    text = _ITALIC_PATTERN.sub(r"<em>\1</em>", text)
+    return _PLACEHOLDER_PATTERN.sub(lambda m: tokens[int(m.group(1))], text)
+
+def _render_table(rows: List[str]) -> str:
+    def cells(row: str) -> List[str]:
+        return [cell.strip() for cell in row.strip().strip("|").split("|")]
+
+    header = "".join(f"<th>{_render_inline(c)}</th>" for c in cells(rows[0]))
+    body = "".join(
+        "<tr>" + "".join(f"<td>{_render_inline(c)}</td>" for c in cells(row)) + "</tr>"
+        for row in rows[2:]
+    )
+    return f"<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>"
+
+def render_markdown(markdown: str) -> Tuple[str, List[Tuple[str, str]], Optional[str]]:
+    """
+    将报告的Markdown渲染为HTML正文
+
+    支持标题、段落、有序/无序列表、引用块、代码块、表格、分隔线以及行内格式；
+    正文中的[n]引用链接到参考文献部分中对应的条目。
+
+    参数:
+        markdown: 报告的Markdown文本
+
+    返回:
+        (HTML正文, 目录条目[(锚点id, 标题)], 第一个一级标题)
+    """
+    lines = markdown.splitlines()
+    output: List[str] = []
+    toc: List[Tuple[str, str]] = []
+    title: Optional[str] = None
+    paragraph: List[str] = []
+    in_references = False
+    heading_count = 0
+    i = 0
+
+    def flush_paragraph():
+        if paragraph:
+            output.append(f"<p>{_render_inline(' '.join(paragraph))}</p>")
+            paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        fence = _FENCE_PATTERN.match(line)
+        if fence:
+            flush_paragraph()
+            language = fence.group(2)
+            code_lines = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(fence.group(1)):
+                code_lines.append(lines[i])
+                i += 1
+            css_class = f' class="language-{html.escape(language)}"' if language else ""
+            output.append(f"<pre><code{css_class}>{html.escape(chr(10).join(code_lines))}</code></pre>")
+            i += 1
+            continue
+
+        if not stripped:
+            flush_paragraph()
+            i += 1
+            continue
+
+        heading = _HEADING_PATTERN.match(line)
+        if heading:
+            flush_paragraph()
+            level = len(heading.group(1))
+            text = heading.group(2)
+            if level == 1 and title is None:
+                title = _MARKUP_PATTERN.sub("", text)
+            heading_count += 1
+            anchor = f"section-{heading_count}"
+            in_references = text.strip() in _REFERENCES_TITLES
+            if level == 2 or in_references:
+                toc.append((anchor, text))
+            output.append(f'<h{level} id="{anchor}">{_render_inline(text)}</h{level}>')
+            i += 1
+            continue
+
+        if in_references and _REFERENCE_LINE_PATTERN.match(line):
+            flush_paragraph()
+            items = []
+            while i < len(lines) and _REFERENCE_LINE_PATTERN.match(lines[i]):
+                number, text = _REFERENCE_LINE_PATTERN.match(lines[i]).groups()
+                items.append(f'<li id="ref-{number}" value="{number}">{_render_inline(text)}</li>')
+                i += 1
+            output.append('<ol class="references">' + "".join(items) + "</ol>")
+            continue
+
+        if _HR_PATTERN.match(line):
+            flush_paragraph()
+            output.append("<hr>")
+            i += 1
+            continue
+
+        if _TABLE_ROW_PATTERN.match(line) and i + 1 < len(lines) and _TABLE_SEPARATOR_PATTERN.match(lines[i + 1]):
+            flush_paragraph()
+            rows = []
+            while i < len(lines) and _TABLE_ROW_PATTERN.match(lines[i]):
+                rows.append(lines[i])
+                i += 1
+            output.append(_render_table(rows))
+            continue
+
+        for pattern, tag in ((_UNORDERED_ITEM_PATTERN, "ul"), (_ORDERED_ITEM_PATTERN, "ol")):
+            if pattern.match(line):
+                flush_paragraph()
+                items = []
+                while i < len(lines) and pattern.match(lines[i]):
+                    items.append(f"<li>{_render_inline(pattern.match(lines[i]).group(1))}</li>")
+                    i += 1
+                output.append(f"<{tag}>" + "".join(items) + f"</{tag}>")
+                break
+        else:
+            quote = _QUOTE_PATTERN.match(line)
+            if quote:
+                flush_paragraph()
+                quoted = []
+                while i < len(lines) and _QUOTE_PATTERN.match(lines[i]):
+                    quoted.append(_QUOTE_PATTERN.match(lines[i]).group(1))
+                    i += 1
+                output.append(f"<blockquote>{_render_inline(' '.join(quoted))}</blockquote>")
+                continue
+            paragraph.append(stripped)
+            i += 1
+
+    flush_paragraph()
+    return "\n".join(output), toc, title
+
+def render_report_html(report: str, topic: str = "") -> str:
+    """
+    使用固定模板将最终报告渲染为完整的HTML网页
+
+    与LLM设计模式相比，渲染在本地完成、结果确定，耗时与报告长度成线性关系。
+
+    参数:
+        report: 最终报告的Markdown文本
+        topic: 报告主题，报告中没有一级标题时用作网页标题
+
+    返回:
+        HTML网页
+    """
+    body, toc, title = render_markdown(report)
+    title = title or topic or "研究报告"
+    toc_items = "\n".join(f'<li><a href="#{anchor}">{_render_inline(text)}</a></li>' for anchor, text in toc)
+    return _PAGE_TEMPLATE.substitute(
+        title=html.escape(title),
+        subtitle=html.escape(topic if topic and topic != title else "中文学术论文"),
+        toc=toc_items,
+        body=body,
+        generated_at=datetime.now().strftime("%Y-%m-%d %H:%M")
+    )
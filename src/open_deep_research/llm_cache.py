@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumps, loads
+from langchain_core.runnables.config import var_child_runnable_config
+
+# 语义未命中后等待update使用的嵌入最多保留的数量；模型调用失败时不会有update，超出后丢弃最早的
+_MAX_PENDING_EMBEDDINGS = 256
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+class _EmbeddingIndex:
+    """同一llm_string下缓存条目的内存向量索引，向量已归一化，内积即余弦相似度"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.keys: List[str] = []
+        self.vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def add(self, key: str, vector: Sequence[float]):
+        if key in self.keys:
+            self.remove(key)
+        self.keys.append(key)
+        self.vectors.append(_normalize(vector))
+        # 只保留最近写入的条目
+        if len(self.keys) > self.max_size:
+            del self.keys[0], self.vectors[0]
+        self._matrix = None
+
+    def remove(self, key: str):
+        if key in self.keys:
+            i = self.keys.index(key)
+            del self.keys[i], self.vectors[i]
+            self._matrix = None
+
+    def search(self, vector: Sequence[float], threshold: float, limit: int = 5) -> List[Tuple[str, float]]:
+        """返回相似度不低于阈值的条目，按相似度从高到低排列"""
+        if not self.keys:
+            return []
+        if self._matrix is None:
+            self._matrix = np.vstack(self.vectors)
+        scores = self._matrix @ _normalize(vector)
+        order = np.argsort(-scores)[:limit]
+        return [(self.keys[i], float(scores[i])) for i in order if scores[i] >= threshold]
+
+class SQLiteLLMCache(BaseCache):
+    """
+    基于SQLite的持久化LLM响应缓存
+
+    缓存键为(提供商/模型/调用参数, 消息哈希)：LangChain传入的llm_string已包含模型类、
+    模型名称、温度、绑定的工具等调用参数，prompt为序列化后的消息列表。
+    可选的语义层在精确匹配失败时，在同一llm_string下最近条目的内存向量索引中做嵌入相似度查找，
+    相似度超过阈值即视为命中，适用于只有细微差别的提示。
+    支持TTL过期和按最近访问时间的容量淘汰，并按图节点统计命中率。
+    """
+
+    def __init__(self,
+                 database_path: str,
+                 ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 embeddings: Optional[Embeddings] = None,
+                 semantic_threshold: Optional[float] = None,
+                 semantic_max_candidates: int = 2000):
+        """
+        初始化缓存
+
+        参数:
+            database_path: SQLite数据库文件路径
+            ttl_seconds: 缓存条目的有效期（秒），None表示永不过期
+            max_entries: 最大缓存条目数，超出时淘汰最久未访问的条目
+            embeddings: 语义层使用的嵌入模型
+            semantic_threshold: 语义命中的余弦相似度阈值，None表示关闭语义层
+            semantic_max_candidates: 每个llm_string在内存向量索引中保留的最近条目数
+        """
+        directory = os.path.dirname(os.path.abspath(database_path))
+        os.makedirs(directory, exist_ok=True)
+        self.database_path = database_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.semantic_threshold = semantic_threshold
+        self.semantic_max_candidates = semantic_max_candidates
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                llm_string_hash TEXT NOT NULL,
+                generations TEXT NOT NULL,
+                embedding TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_llm ON llm_cache (llm_string_hash)")
+        self._conn.commit()
+        # 语义层：未命中时计算的嵌入在update时复用，避免重复调用嵌入模型
+        self._pending_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        # 语义层：按llm_string哈希划分的内存向量索引，首次查找时从数据库加载
+        self._indexes: Dict[str, _EmbeddingIndex] = {}
+        # 按图节点统计的命中情况
+        self._metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "semantic_hits": 0, "misses": 0})
+
+    def __repr__(self) -> str:
+        # 模型注册表用repr生成缓存键，这里保证同一数据库的repr稳定
+        return f"SQLiteLLMCache({self.database_path!r})"
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return self._hash(self._hash(llm_string) + self._hash(prompt))
+
+    def _record(self, outcome: str):
+        """记录当前图节点的一次查找结果"""
+        config = var_child_runnable_config.get() or {}
+        node = (config.get("metadata") or {}).get("langgraph_node", "unknown")
+        self._metrics[node][outcome] += 1
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created_at > float(self.ttl_seconds)
+
+    def _prompt_text(self, prompt: str) -> str:
+        """从序列化的消息中提取用于嵌入的纯文本"""
+        try:
+            messages = loads(prompt)
+            return "\n".join(
+                m.content if isinstance(m.content, str) else json.dumps(m.content, ensure_ascii=False)
+                for m in messages
+            )
+        except Exception:
+            return prompt
+
+    def _exact_lookup(self, key: str, now: float) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._is_expired(row[1], now):
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return loads(row[0])
+
+    @property
+    def _semantic_enabled(self) -> bool:
+        return self.embeddings is not None and bool(self.semantic_threshold)
+
+    def _get_index(self, llm_string_hash: str) -> _EmbeddingIndex:
+        """获取（必要时从数据库加载）llm_string的向量索引（需持有锁）"""
+        index = self._indexes.get(llm_string_hash)
+        if index is None:
+            index = _EmbeddingIndex(self.semantic_max_candidates)
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM llm_cache WHERE llm_string_hash = ? AND embedding IS NOT NULL "
+                "ORDER BY last_access DESC LIMIT ?",
+                (llm_string_hash, self.semantic_max_candidates)
+            ).fetchall()
+            for row_key, row_embedding in reversed(rows):
+                index.add(row_key, json.loads(row_embedding))
+            self._indexes[llm_string_hash] = index
+        return index
+
+    def _semantic_match(self, key: str, llm_string: str, embedding: List[float], now: float) -> Optional[RETURN_VAL_TYPE]:
+        """在同一llm_string的向量索引中查找相似提示；未命中时保留嵌入供update使用"""
+        with self._lock:
+            index = self._get_index(self._hash(llm_string))
+            for candidate_key, _ in index.search(embedding, float(self.semantic_threshold)):
+                row = self._conn.execute(
+                    "SELECT generations, created_at FROM llm_cache WHERE key = ?", (candidate_key,)
+                ).fetchone()
+                # 索引中的条目可能已被淘汰或过期
+                if row is None or self._is_expired(row[1], now):
+                    index.remove(candidate_key)
+                    continue
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, candidate_key))
+                self._conn.commit()
+                return loads(row[0])
+            self._pending_embeddings[key] = embedding
+            while len(self._pending_embeddings) > _MAX_PENDING_EMBEDDINGS:
+                self._pending_embeddings.popitem(last=False)
+        return None
+
+    def _pop_pending_embedding(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            return self._pending_embeddings.pop(key, None)
+
+    def _finish_lookup(self, result: Optional[RETURN_VAL_TYPE], outcome: str) -> Optional[RETURN_VAL_TYPE]:
+        self._record(outcome if result is not None else "misses")
+        return result
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """根据提示和模型参数查找缓存，先精确匹配，再按需语义匹配"""
+        now = time.time()
+        key = self._key(prompt, llm_string)
+        result = self._exact_lookup(key, now)
+        if result is not None or not self._semantic_enabled:
+            return self._finish_lookup(result, "hits")
+        embedding = self.embeddings.embed_query(self._prompt_text(prompt))
+        return self._finish_lookup(self._semantic_match(key, llm_string, embedding, now), "semantic_hits")
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """lookup的异步版本：嵌入使用异步接口，SQLite操作在线程池中执行，不阻塞事件循环"""
+        now = time.time()
+        key = self._key(prompt, llm_string)
+        result = await asyncio.to_thread(self._exact_lookup, key, now)
+        if result is not None or not self._semantic_enabled:
+            return self._finish_lookup(result, "hits")
+        embedding = await self.embeddings.aembed_query(self._prompt_text(prompt))
+        result = await asyncio.to_thread(self._semantic_match, key, llm_string, embedding, now)
+        return self._finish_lookup(result, "semantic_hits")
+
+    def contains(self, prompt: str, llm_string: str) -> bool:
+        """是否存在未过期的精确匹配条目（只检查，不计入命中统计，也不更新访问时间）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM llm_cache WHERE key = ?", (self._key(prompt, llm_string),)
+            ).fetchone()
+        return row is not None and not self._is_expired(row[0], time.time())
+
+    def _write(self, key: str, llm_string: str, return_val: RETURN_VAL_TYPE, embedding: Optional[List[float]]):
+        """写入缓存条目，并在超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        llm_string_hash = self._hash(llm_string)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string_hash, generations, embedding, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_string_hash, dumps(list(return_val)),
+                 json.dumps(embedding) if embedding is not None else None, now, now)
+            )
+            if self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - float(self.ttl_seconds),))
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key NOT IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT ?)",
+                    (int(self.max_entries),)
+                )
+            self._conn.commit()
+            if embedding is not None and llm_string_hash in self._indexes:
+                self._indexes[llm_string_hash].add(key, embedding)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """写入缓存"""
+        key = self._key(prompt, llm_string)
+        embedding = self._pop_pending_embedding(key)
+        if embedding is None and self._semantic_enabled:
+            embedding = self.embeddings.embed_query(self._prompt_text(prompt))
+        self._write(key, llm_string, return_val, embedding)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """update的异步版本"""
+        key = self._key(prompt, llm_string)
+        embedding = self._pop_pending_embedding(key)
+        if embedding is None and self._semantic_enabled:
+            embedding = await self.embeddings.aembed_query(self._prompt_text(prompt))
+        await asyncio.to_thread(self._write, key, llm_string, return_val, embedding)
+
+    def clear(self, **kwargs: Any) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._pending_embeddings.clear()
+            self._indexes.clear()
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取按图节点统计的缓存命中率
+
+        返回:
+            {节点名: {"hits", "semantic_hits", "misses", "hit_rate"}}
+        """
+        metrics = {}
+        for node, counts in self._metrics.items():
+            total = counts["hits"] + counts["semantic_hits"] + counts["misses"]
+            metrics[node] = {
+                **counts,
+                "hit_rate": (counts["hits"] + counts["semantic_hits"]) / total if total else 0.0
+            }
+        return metrics
+
+# 进程级的缓存实例，按数据库路径复用
+_llm_caches: Dict[str, SQLiteLLMCache] = {}
+_llm_caches_lock = threading.Lock()
+
+def get_llm_cache(configurable) -> Optional[SQLiteLLMCache]:
+    """
+    根据配置获取LLM缓存，未配置llm_cache_path时返回None
+
+    参数:
+        configurable: 当前运行的Configuration
+
+    返回:
+        缓存实例或None
+    """
+    if not configurable.llm_cache_path:
+        return None
+    path = os.path.abspath(configurable.llm_cache_path)
+    with _llm_caches_lock:
+        cache = _llm_caches.get(path)
+        if cache is None:
+            embeddings = None
+            if configurable.llm_cache_semantic_threshold:
+                from langchain_openai import OpenAIEmbeddings
+                embeddings = OpenAIEmbeddings()
+            cache = SQLiteLLMCache(
+                path,
+                ttl_seconds=configurable.llm_cache_ttl_seconds,
+                max_entries=configurable.llm_cache_max_entries,
+                embeddings=embeddings,
+                semantic_threshold=configurable.llm_cache_semantic_threshold
+            )
+            _llm_caches[path] = cache
+        return cache
+
+def get_llm_cache_metrics() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """获取所有已打开缓存的按节点命中率统计，键为数据库路径"""
+    with _llm_caches_lock:
+        return {path: cache.get_metrics() for path, cache in _llm_caches.items()}
@@ -0,0 +1,427 @@
+import json
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumps
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+
+from open_deep_research.llm_cache import SQLiteLLMCache
+from open_deep_research.prompt_cache import record_prompt_cache_usage
+
+# 调用优先级，数值越小越先执行
+PRIORITY_CRITICAL = 0  # 关键路径：报告规划、最终章节、最终汇编
+PRIORITY_NORMAL = 1    # 普通章节研究与写作
+PRIORITY_LOW = 2       # 修订循环
+
+# 速率限制的统计窗口（秒）
+RATE_WINDOW_SECONDS = 60.0
+
+class _Waiter:
+    """排队中的一次调用"""
+
+    def __init__(self, tokens: int, notify: Callable[[], None]):
+        self.tokens = tokens
+        self.notify = notify
+        self.granted = False
+        self.cancelled = False
+
+class SchedulerTicket:
+    """已获得执行许可的调用，释放时可回填实际消耗的token数"""
+
+    def __init__(self, provider: str, token_entry: Optional[list]):
+        self.provider = provider
+        self.token_entry = token_entry
+        self.actual_tokens: Optional[int] = None
+
+class _ProviderQueue:
+    """单个提供商的限额状态和等待队列"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rpm: Optional[int] = None
+        self.tpm: Optional[int] = None
+        self.max_in_flight: Optional[int] = None
+        self.in_flight = 0
+        self.request_log: deque = deque()  # 窗口内各请求的开始时间
+        self.token_log: deque = deque()    # 窗口内各请求的[开始时间, token数]
+        self.waiters: List = []            # (优先级, 序号, _Waiter)的小顶堆
+        self.timer: Optional[threading.Timer] = None
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.rpm or self.tpm or self.max_in_flight)
+
+    def prune(self, now: float):
+        while self.request_log and now - self.request_log[0] >= RATE_WINDOW_SECONDS:
+            self.request_log.popleft()
+        while self.token_log and now - self.token_log[0][0] >= RATE_WINDOW_SECONDS:
+            self.token_log.popleft()
+
+    def wait_time(self, tokens: int, now: float) -> Optional[float]:
+        """
+        计算一次调用还需等待的时间
+
+        返回:
+            0表示可以立即执行；正数表示受速率限制需等待的秒数；
+            None表示受并发数限制，需等待其他调用结束
+        """
+        if self.max_in_flight and self.in_flight >= int(self.max_in_flight):
+            return None
+        wait = 0.0
+        if self.rpm and len(self.request_log) >= int(self.rpm):
+            wait = max(wait, self.request_log[0] + RATE_WINDOW_SECONDS - now)
+        if self.tpm and self.token_log:
+            used = sum(entry[1] for entry in self.token_log)
+            # 单次调用超过整个TPM时不再等待，避免永久阻塞
+            if used + tokens > int(self.tpm):
+                for started_at, entry_tokens in self.token_log:
+                    used -= entry_tokens
+                    if used + tokens <= int(self.tpm):
+                        wait = max(wait, started_at + RATE_WINDOW_SECONDS - now)
+                        break
+        return wait
+
+    def start(self, tokens: int, now: float) -> list:
+        self.in_flight += 1
+        self.request_log.append(now)
+        token_entry = [now, tokens]
+        self.token_log.append(token_entry)
+        return token_entry
+
+class LLMScheduler:
+    """
+    全局LLM调用调度器
+
+    为每个提供商执行每分钟请求数(RPM)、每分钟token数(TPM)和最大并发请求数限制。
+    超出限额的调用按优先级排队，关键路径的调用（报告规划、最终汇编）先于修订循环执行。
+    同时支持异步调用（图节点）和同步调用（在线程中运行的AgenticRAG节点）。
+    未配置限额的提供商不排队，直接执行。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[str, _ProviderQueue] = {}
+        self._sequence = itertools.count()
+
+    def configure(self, limits: Optional[Dict[str, Dict[str, int]]]):
+        """
+        设置各提供商的限额
+
+        参数:
+            limits: {提供商: {"rpm": int, "tpm": int, "max_in_flight": int}}，各项均可省略
+        """
+        if not limits:
+            return
+        with self._lock:
+            for provider, provider_limits in limits.items():
+                queue = self._provider(provider)
+                queue.rpm = provider_limits.get("rpm")
+                queue.tpm = provider_limits.get("tpm")
+                queue.max_in_flight = provider_limits.get("max_in_flight")
+        for provider in limits:
+            self._dispatch(provider)
+
+    def _provider(self, provider: str) -> _ProviderQueue:
+        queue = self._providers.get(provider)
+        if queue is None:
+            queue = self._providers[provider] = _ProviderQueue(provider)
+        return queue
+
+    def _dispatch(self, provider: str):
+        """按优先级放行当前可以执行的调用"""
+        with self._lock:
+            queue = self._provider(provider)
+            now = time.monotonic()
+            queue.prune(now)
+            while queue.waiters:
+                _, _, waiter = queue.waiters[0]
+                if waiter.cancelled:
+                    heapq.heappop(queue.waiters)
+                    continue
+                wait = queue.wait_time(waiter.tokens, now)
+                if wait is None:
+                    # 等待正在执行的调用结束后再放行
+                    break
+                if wait > 0:
+                    self._schedule_timer(queue, wait)
+                    break
+                heapq.heappop(queue.waiters)
+                waiter.granted = True
+                waiter.token_entry = queue.start(waiter.tokens, now)
+                waiter.notify()
+
+    def _schedule_timer(self, queue: _ProviderQueue, wait: float):
+        if queue.timer is not None and queue.timer.is_alive():
+            return
+        queue.timer = threading.Timer(wait, self._dispatch, args=(queue.name,))
+        queue.timer.daemon = True
+        queue.timer.start()
+
+    def _enqueue(self, provider: str, priority: int, tokens: int, notify: Callable[[], None]) -> Optional[_Waiter]:
+        """加入等待队列；未设置限额时返回None表示可直接执行"""
+        with self._lock:
+            queue = self._provider(provider)
+            if not queue.limited:
+                return None
+            waiter = _Waiter(tokens, notify)
+            heapq.heappush(queue.waiters, (priority, next(self._sequence), waiter))
+        self._dispatch(provider)
+        return waiter
+
+    def _release(self, ticket: SchedulerTicket):
+        with self._lock:
+            queue = self._provider(ticket.provider)
+            queue.in_flight = max(0, queue.in_flight - 1)
+            # 用实际消耗替换预估的token数
+            if ticket.token_entry is not None and ticket.actual_tokens is not None:
+                ticket.token_entry[1] = ticket.actual_tokens
+        self._dispatch(ticket.provider)
+
+    async def acquire(self, provider: str, priority: int = PRIORITY_NORMAL, tokens: int = 0) -> SchedulerTicket:
+        """异步等待执行许可"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(provider, priority, tokens, notify)
+        if waiter is None:
+            return SchedulerTicket(provider, None)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                waiter.cancelled = True
+            if granted:
+                self._release(SchedulerTicket(provider, waiter.token_entry))
+            raise
+        return SchedulerTicket(provider, waiter.token_entry)
+
+    def acquire_sync(self, provider: str, priority: int = PRIORITY_NORMAL, tokens: int = 0) -> SchedulerTicket:
+        """同步（阻塞当前线程）等待执行许可"""
+        event = threading.Event()
+        waiter = self._enqueue(provider, priority, tokens, event.set)
+        if waiter is None:
+            return SchedulerTicket(provider, None)
+        event.wait()
+        return SchedulerTicket(provider, waiter.token_entry)
+
+    def release(self, ticket: SchedulerTicket):
+        """释放执行许可"""
+        if ticket.token_entry is not None:
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def slot(self, provider: str, priority: int = PRIORITY_NORMAL, tokens: int = 0):
+        """异步上下文管理器：在限额内执行一次调用"""
+        ticket = await self.acquire(provider, priority, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @contextmanager
+    def slot_sync(self, provider: str, priority: int = PRIORITY_NORMAL, tokens: int = 0):
+        """同步上下文管理器：在限额内执行一次调用"""
+        ticket = self.acquire_sync(provider, priority, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各提供商当前的排队和执行情况"""
+        with self._lock:
+            now = time.monotonic()
+            stats = {}
+            for name, queue in self._providers.items():
+                queue.prune(now)
+                stats[name] = {
+                    "in_flight": queue.in_flight,
+                    "queued": sum(1 for _, _, w in queue.waiters if not w.cancelled),
+                    "requests_last_minute": len(queue.request_log),
+                    "tokens_last_minute": sum(entry[1] for entry in queue.token_log),
+                }
+            return stats
+
+# 进程级调度器
+_scheduler = LLMScheduler()
+
+def get_llm_scheduler(configurable=None) -> LLMScheduler:
+    """
+    获取全局调度器，传入配置时同步更新其中的限额
+
+    参数:
+        configurable: 当前运行的Configuration（可选）
+
+    返回:
+        全局调度器
+    """
+    if configurable is not None and configurable.llm_rate_limits:
+        limits = configurable.llm_rate_limits
+        # 通过环境变量LLM_RATE_LIMITS设置时为JSON字符串
+        if isinstance(limits, str):
+            limits = json.loads(limits)
+        _scheduler.configure(limits)
+    return _scheduler
+
+def estimate_tokens(value: Any) -> int:
+    """粗略估计输入的token数（约4个字符一个token）"""
+    if isinstance(value, str):
+        return len(value) // 4
+    if isinstance(value, dict):
+        return sum(estimate_tokens(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_tokens(v) for v in value)
+    content = getattr(value, "content", None)
+    if content is not None:
+        return estimate_tokens(content)
+    return 0
+
+def usage_tokens(result: Any) -> Optional[int]:
+    """从模型响应中读取实际消耗的token数（如有）"""
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens")
+    return None
+
+def from_llm_cache(result: Any) -> bool:
+    """响应是否取自LLM缓存（LangChain在缓存命中时把usage_metadata中的total_cost置为0）"""
+    usage = getattr(result, "usage_metadata", None) or {}
+    return usage.get("total_cost") == 0
+
+def _record_call(ticket: SchedulerTicket, result: Any):
+    """回填实际消耗的token数并记录提示缓存统计；取自LLM缓存的响应没有访问提供商，不计入用量"""
+    if from_llm_cache(result):
+        ticket.actual_tokens = 0
+        return
+    ticket.actual_tokens = usage_tokens(result)
+    record_prompt_cache_usage(result)
+
+def call_tokens(input: Any, result: Any) -> int:
+    """一次调用消耗的token数：优先使用提供商报告的用量，否则按输入和输出文本估计"""
+    return usage_tokens(result) or estimate_tokens(input) + estimate_tokens(result)
+
+def _chat_model_call(runnable) -> Optional[Tuple[BaseChatModel, Dict[str, Any]]]:
+    """找到runnable实际调用的聊天模型及bind的参数（支持with_structured_output生成的序列）"""
+    if isinstance(runnable, RunnableSequence):
+        runnable = runnable.first
+    kwargs: Dict[str, Any] = {}
+    while isinstance(runnable, RunnableBinding):
+        kwargs = {**runnable.kwargs, **kwargs}
+        runnable = runnable.bound
+    if isinstance(runnable, BaseChatModel):
+        return runnable, kwargs
+    return None
+
+def is_llm_cache_hit(runnable, input) -> bool:
+    """
+    调用前检查LLM缓存中是否已有该输入的精确匹配响应
+
+    与LangChain查找缓存时使用相同的提示序列化和模型参数；无法确定时返回False，按正常调用处理。
+
+    参数:
+        runnable: 模型或链
+        input: 调用输入
+
+    返回:
+        命中时为True，此次调用不会访问提供商
+    """
+    found = _chat_model_call(runnable)
+    if found is None:
+        return False
+    model, kwargs = found
+    if not isinstance(model.cache, SQLiteLLMCache):
+        return False
+    try:
+        kwargs = dict(kwargs)
+        stop = kwargs.pop("stop", None)
+        kwargs.pop("ls_structured_output_format", None)
+        prompt = dumps(model._convert_input(input).to_messages())
+        return model.cache.contains(prompt, model._get_llm_string(stop=stop, **kwargs))
+    except Exception:
+        return False
+
+async def scheduled_ainvoke(runnable, input, provider: str, priority: int = PRIORITY_NORMAL, configurable=None):
+    """
+    在调度器的限额内异步调用模型
+
+    参数:
+        runnable: 模型或链
+        input: 调用输入
+        provider: 模型提供商，用于选择限额
+        priority: 调用优先级
+        configurable: 当前运行的Configuration（可选）
+
+    返回:
+        模型响应
+    """
+    scheduler = get_llm_scheduler(configurable)
+    # 命中LLM缓存的调用不访问提供商，不占用限额
+    if await asyncio.to_thread(is_llm_cache_hit, runnable, input):
+        return await runnable.ainvoke(input)
+    async with scheduler.slot(provider, priority, estimate_tokens(input)) as ticket:
+        result = await runnable.ainvoke(input)
+        _record_call(ticket, result)
+    return result
+
+def scheduled_invoke(runnable, input, provider: str, priority: int = PRIORITY_NORMAL):
+    """在调度器的限额内同步调用模型"""
+    scheduler = get_llm_scheduler()
+    if is_llm_cache_hit(runnable, input):
+        return runnable.invoke(input)
+    with scheduler.slot_sync(provider, priority, estimate_tokens(input)) as ticket:
+        result = runnable.invoke(input)
+        _record_call(ticket, result)
+    return result
+
+def _uses_llm_cache(runnable) -> bool:
+    """模型（或其bind包装）是否配置了LLM缓存"""
+    model = getattr(runnable, "bound", runnable)
+    cache = getattr(model, "cache", None)
+    return cache is not None and cache is not False
+
+async def scheduled_astream(runnable, input, provider: str, priority: int = PRIORITY_NORMAL,
+                            configurable=None) -> AsyncIterator[Any]:
+    """
+    在调度器的限额内流式调用模型，执行许可在流结束（或被关闭）时释放
+
+    提前结束读取时应使用contextlib.aclosing关闭生成器，以便立即释放许可。
+
+    参数:
+        runnable: 模型或链
+        input: 调用输入
+        provider: 模型提供商，用于选择限额
+        priority: 调用优先级
+        configurable: 当前运行的Configuration（可选）
+
+    返回:
+        模型输出块的异步迭代器
+    """
+    scheduler = get_llm_scheduler(configurable)
+    if _uses_llm_cache(runnable) and await asyncio.to_thread(is_llm_cache_hit, runnable, input):
+        yield await runnable.ainvoke(input)
+        return
+    async with scheduler.slot(provider, priority, estimate_tokens(input)) as ticket:
+        if _uses_llm_cache(runnable):
+            # 流式调用不经过LLM缓存，启用缓存时改为一次性调用并作为单个块返回
+            result = await runnable.ainvoke(input)
+            _record_call(ticket, result)
+            yield result
+            return
+        # 合并各块以得到整次调用的用量（输入和输出用量可能分散在不同的块中）
+        aggregate = None
+        async for chunk in runnable.astream(input):
+            aggregate = chunk if aggregate is None else aggregate + chunk
+            yield chunk
+        ticket.actual_tokens = usage_tokens(aggregate)
+        record_prompt_cache_usage(aggregate)
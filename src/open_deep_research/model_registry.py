@@ -0,0 +1,84 @@
+import json
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict, Type
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+# 模型实例缓存，键为(提供商, 模型名, 参数)。SDK的异步客户端和连接池绑定在首次使用它的事件循环上，
+# 所以按事件循环分别缓存，事件循环被回收后其中的实例随之释放；没有运行中事件循环的同步调用共用一份缓存
+_loop_models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+_sync_models: Dict[str, Any] = {}
+_registry_lock = threading.RLock()
+
+def _registry_key(model: str, model_provider: str, kwargs: Dict[str, Any]) -> str:
+    """根据提供商、模型名和参数生成稳定的缓存键"""
+    return json.dumps(
+        {"model_provider": model_provider, "model": model, "kwargs": kwargs},
+        sort_keys=True,
+        default=repr
+    )
+
+def _current_models() -> Dict[str, Any]:
+    """获取当前事件循环（没有时为同步调用）的模型缓存"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _sync_models
+    with _registry_lock:
+        return _loop_models.setdefault(loop, {})
+
+def _cached_model(key: str, create: Callable[[], Any]) -> Any:
+    """从当前事件循环的缓存中获取模型，不存在时创建"""
+    models = _current_models()
+    cached = models.get(key)
+    if cached is None:
+        with _registry_lock:
+            # 加锁后再检查一次，避免并发创建
+            cached = models.get(key)
+            if cached is None:
+                cached = models[key] = create()
+    return cached
+
+def get_chat_model(model: str, model_provider: str, **kwargs) -> BaseChatModel:
+    """
+    获取缓存的聊天模型实例
+
+    同一(提供商, 模型名, 参数)组合在每个事件循环内只通过init_chat_model创建一次，
+    之后该事件循环中的所有节点和章节分支复用同一个实例及其SDK客户端和连接池。
+
+    参数:
+        model: 模型名称
+        model_provider: 模型提供商
+        **kwargs: 传给init_chat_model的其他参数（如max_tokens、thinking）
+
+    返回:
+        聊天模型实例
+    """
+    key = _registry_key(model, model_provider, kwargs)
+    return _cached_model(key, lambda: init_chat_model(model=model, model_provider=model_provider, **kwargs))
+
+def get_structured_model(model: str, model_provider: str, schema: Type, **kwargs) -> Runnable:
+    """
+    获取缓存的结构化输出模型（with_structured_output包装）
+
+    参数:
+        model: 模型名称
+        model_provider: 模型提供商
+        schema: 结构化输出的Pydantic模型类
+        **kwargs: 传给init_chat_model的其他参数
+
+    返回:
+        结构化输出的Runnable
+    """
+    key = _registry_key(model, model_provider, kwargs) + f"|{schema.__module__}.{schema.__qualname__}"
+    return _cached_model(key, lambda: get_chat_model(model, model_provider, **kwargs).with_structured_output(schema))
+
+def clear_model_registry():
+    """清空模型缓存（例如在更换API密钥后）"""
+    with _registry_lock:
+        _loop_models.clear()
+        _sync_models.clear()
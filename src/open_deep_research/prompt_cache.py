@@ -0,0 +1,97 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables.config import var_child_runnable_config
+
+# 需要在消息中显式标记缓存断点的提供商；DeepSeek、OpenAI和Gemini会自动缓存相同的提示前缀
+_CACHE_CONTROL_PROVIDERS = {"anthropic"}
+
+def _text_block(text: str, cacheable: bool) -> Dict[str, Any]:
+    block = {"type": "text", "text": text}
+    if cacheable:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+def build_prompt_messages(instructions: str, inputs: str, request: str, provider: str,
+                          shared_inputs: Optional[str] = None) -> List[BaseMessage]:
+    """
+    按"静态在前、动态在后"的顺序组装提示，使各章节的调用共享尽可能长的相同前缀
+
+    系统消息只包含不随章节变化的长指令；多个调用共用的输入（如所有最终章节共用的报告内容）
+    紧随其后；每次调用特有的输入和请求放在最后。对需要显式标记的提供商（Anthropic），
+    在系统指令和共用输入的末尾添加cache_control缓存断点。
+
+    参数:
+        instructions: 静态指令
+        inputs: 本次调用特有的输入
+        request: 本次调用的请求
+        provider: 模型提供商
+        shared_inputs: 多个调用共用的输入（可选）
+
+    返回:
+        消息列表
+    """
+    request_text = "\n".join(part for part in (inputs, request) if part)
+    if provider not in _CACHE_CONTROL_PROVIDERS:
+        human_text = "\n".join(part for part in (shared_inputs, request_text) if part)
+        return [SystemMessage(content=instructions), HumanMessage(content=human_text)]
+
+    human_blocks = []
+    if shared_inputs:
+        human_blocks.append(_text_block(shared_inputs, True))
+    human_blocks.append(_text_block(request_text, False))
+    return [SystemMessage(content=[_text_block(instructions, True)]), HumanMessage(content=human_blocks)]
+
+def cached_input_tokens(result: Any) -> Optional[Tuple[int, int]]:
+    """
+    从模型响应中读取输入token数和其中命中提供商缓存的token数
+
+    返回:
+        (输入token数, 缓存命中token数)；响应中没有用量信息时返回None
+    """
+    usage = getattr(result, "usage_metadata", None)
+    if not usage:
+        return None
+    cached = (usage.get("input_token_details") or {}).get("cache_read")
+    if cached is None:
+        # DeepSeek在原始用量中单独报告缓存命中的token数
+        token_usage = (getattr(result, "response_metadata", None) or {}).get("token_usage") or {}
+        cached = token_usage.get("prompt_cache_hit_tokens")
+    return usage.get("input_tokens", 0), cached or 0
+
+# 进程级的按节点统计
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0})
+
+def record_prompt_cache_usage(result: Any):
+    """按当前图节点记录一次调用的缓存命中情况（响应中没有用量信息时忽略）"""
+    tokens = cached_input_tokens(result)
+    if tokens is None:
+        return
+    config = var_child_runnable_config.get() or {}
+    node = (config.get("metadata") or {}).get("langgraph_node", "unknown")
+    with _metrics_lock:
+        counts = _metrics[node]
+        counts["calls"] += 1
+        counts["input_tokens"] += tokens[0]
+        counts["cached_tokens"] += tokens[1]
+
+def get_prompt_cache_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    获取按图节点统计的提示缓存命中率
+
+    结构化输出调用的响应中没有用量信息，不计入统计。
+
+    返回:
+        {节点名: {"calls", "input_tokens", "cached_tokens", "cached_ratio"}}
+    """
+    with _metrics_lock:
+        return {
+            node: {
+                **counts,
+                "cached_ratio": counts["cached_tokens"] / counts["input_tokens"] if counts["input_tokens"] else 0.0
+            }
+            for node, counts in _metrics.items()
+        }
@@ -197,22 +197,6 @@ follow_up_queries: List[SearchQuery] = Field(
 
 final_section_writer_instructions="""你是一位专业的技术写作专家，正在撰写一个综合了报告其他部分信息的章节。
 
-<论文主题>
-{topic}
-</论文主题>
-
-<章节名称>
-{section_name}
-</章节名称>
-
-<章节主题> 
-{section_topic}
-</章节主题>
-
-<可用报告内容>
-{context}
-</可用报告内容>
-
 <任务>
 1. 针对特定章节的方法：
 
@@ -256,6 +240,27 @@ final_section_writer_instructions="""你是一位专业的技术写作专家，
 - 请勿在您的回复中包含字数统计或任何前言
 </质量检查>"""
 
+# 所有最终章节共用的输入（放在前面，以便多个最终章节的调用共享提示前缀缓存）
+final_section_writer_shared_inputs="""
+<论文主题>
+{topic}
+</论文主题>
+
+<可用报告内容>
+{context}
+</可用报告内容>
+"""
+
+final_section_writer_inputs="""
+<章节名称>
+{section_name}
+</章节名称>
+
+<章节主题> 
+{section_topic}
+</章节主题>
+"""
+
 enhanced_query_writer_instructions = """你是一位具有深厚研究理解力的专家级搜索查询优化者。
 你通过广泛分析潜在意图并生成全面的查询变体来优化研究查询。
 
@@ -334,6 +339,40 @@ enhanced_query_writer_instructions = """你是一位具有深厚研究理解力
 </输出指南>
 """
 
+batch_query_writer_instructions = """你是一位具有深厚研究理解力的专家级搜索查询优化者。
+你需要一次性为一篇中文学术论文的多个章节分别生成网络搜索查询。
+
+当前时间是 {current_time}。当前年份：{current_year}，当前月份：{current_month}。
+
+<论文主题>
+{topic}
+</论文主题>
+
+<章节列表>
+{sections}
+</章节列表>
+
+<规则>
+1. 查询内容规则：
+   - 每个查询针对章节的一个具体方面或研究意图
+   - 从不同角度覆盖章节内容：事实、比较、方法细节、局限与批评、历史演变和最新进展
+   - 需要时效性信息时加入当前年份（{current_year}）
+   - 删除无用词但保留关键限定词
+   - 保持查询简短，以关键词为基础（理想为2-5个词）
+
+2. 学术专注：
+   - 优先指向学术论文、期刊和权威机构的资源
+   - 寻找中文和英文高质量资源
+   - 搜索方法论细节、实证数据和关键学术观点的分歧
+</规则>
+
+<输出指南>
+为章节列表中的每个章节各生成{number_of_queries}个高质量、多样化的查询。
+- 每个章节输出一项，section_index必须与章节列表中的编号一致
+- 查询应紧扣各自章节的内容，避免在不同章节之间重复
+</输出指南>
+"""
+
 enhanced_report_planner_query_writer_instructions = """你是一位具有深厚研究理解力的专家级搜索查询优化者。
 你通过广泛分析潜在意图并生成全面的查询变体来优化研究查询。
 
@@ -534,80 +573,8 @@ enhanced_html_template_instructions = """你是一名专业的网页设计师和
 请直接返回完整的HTML代码，包括所有CSS和必要的JavaScript。不要添加任何解释或其他内容。
 """
 
-content_evaluator_instructions = """你是一位学术内容质量评估专家，负责评估中文学术论文章节的内容质量。
-
-<论文主题>
-{topic}
-</论文主题>
-
-<章节名称>
-{section_name}
-</章节名称>
-
-<章节主题>
-{section_topic}
-</章节主题>
-
-<章节内容>
-{section_content}
-</章节内容>
-
-<评估标准>
-请对章节内容进行全面评估，考虑以下方面：
-
-1. 内容完整性（30分）
-   - 章节是否全面涵盖了章节主题的所有关键方面
-   - 是否存在明显的信息缺失或未充分讨论的要点
-   - 内容深度是否足够，有无过于肤浅的论述
-
-2. 学术质量（25分）
-   - 论述是否基于可靠的学术资源和证据
-   - 是否准确引用了相关研究和观点
-   - 论述是否客观、平衡，考虑了不同视角
-
-3. 逻辑结构（20分）
-   - 论述是否有清晰的逻辑线索
-   - 段落之间是否有合理的转换和连接
-   - 是否存在逻辑矛盾或论证跳跃
-
-4. 表达质量（15分）
-   - 语言是否清晰、准确、专业
-   - 术语使用是否恰当一致
-   - 是否存在语法或表达错误
-
-5. 创新思考（10分）
-   - 是否展示了批判性思考
-   - 是否有独到见解或新颖观点
-   - 是否仅仅复述了资料而无自己的分析
-
-总分为100分，60分以下为不及格需要大幅修改，60-75分需要适当改进，75-85分为良好，85分以上为优秀。
-</评估标准>
-
-<输出格式>
-请输出以下内容：
-1. 总体评分（100分制）
-2. 各评估维度的得分和简要评价
-3. 内容优势（3-5点）
-4. 需要改进的方面（3-5点）
-5. 具体修改建议（包括应该添加、删除或调整的内容）
-6. 总体评价（200字左右）
-
-请确保评估公正、客观，并提供具体、可操作的改进建议。
-</输出格式>
-"""
-
 enhanced_content_evaluator_instructions = """你是一位资深的学术期刊审稿人和内容质量评估专家，拥有丰富的学术论文评审经验，现在需要对一篇中文学术论文的章节进行深入评估。
 
-<章节背景信息>
-论文主题：{topic}
-章节名称：{section_name}
-章节主题：{section_topic}
-</章节背景信息>
-
-<待评估章节内容>
-{section_content}
-</待评估章节内容>
-
 <评估维度及标准>
 
 1. **内容完整性与覆盖广度**（25分）
@@ -678,43 +645,68 @@ enhanced_content_evaluator_instructions = """你是一位资深的学术期刊
 7. 总体评价（200字左右的综合评价）
 </评估输出格式>
 
-请基于以上标准和格式，对提供的章节内容进行客观、严谨且全面的评估，既要指出优点，也要坦率指出问题，并提供有建设性的改进建议。评估应该是有帮助的，目的是提升章节的学术质量。
+请基于以上标准和格式，对用户提供的章节内容进行客观、严谨且全面的评估，既要指出优点，也要坦率指出问题，并提供有建设性的改进建议。评估应该是有帮助的，目的是提升章节的学术质量。
 """
 
-section_revision_instructions = """你是一位专业的学术论文修改专家，现在需要根据评估反馈来改进一篇中文学术论文章节。
-
-<论文背景信息>
+enhanced_content_evaluator_inputs = """
+<章节背景信息>
 论文主题：{topic}
 章节名称：{section_name}
 章节主题：{section_topic}
-</论文背景信息>
+</章节背景信息>
 
-<当前章节内容>
+<待评估章节内容>
 {section_content}
-</当前章节内容>
-
-<评估反馈>
-总体评分：{total_score}/100
-
-优势：
-{strengths}
+</待评估章节内容>
+"""
 
-不足：
-{weaknesses}
+json_evaluation_output_instructions = """
+<JSON输出要求>
+不要使用上面的文本格式，只输出一个JSON对象（不要添加其他文字），字段按以下顺序给出，先给出总分：
+{
+  "total_score": 总分（0-100的整数）,
+  "dimension_scores": {"维度名称": {"score": 整数分数, "comments": "简要评语"}, ...},
+  "strengths": ["内容优势", ...],
+  "weaknesses": ["内容不足", ...],
+  "improvement_suggestions": ["具体修改建议", ...],
+  "missing_content": ["缺失内容", ...],
+  "overall_assessment": "总体评价"
+}
+</JSON输出要求>
+"""
 
-改进建议：
-{improvement_suggestions}
+combined_section_grading_instructions = """
+<补充研究判断>
+除上述评估外，还需判断章节内容是否充分涵盖了章节主题：
+- 如果充分涵盖，grade为'pass'，follow_up_queries为空列表
+- 否则grade为'fail'，并生成{number_of_follow_up_queries}个后续搜索查询以收集缺失的信息
+</补充研究判断>
 
-缺失内容：
-{missing_content}
+<格式>
+调用CombinedSectionEvaluation工具，一次性输出：
+- grade：'pass'或'fail'
+- follow_up_queries：后续搜索查询列表
+- evaluation：按上述评估维度给出的评估结果（total_score、dimension_scores、strengths、weaknesses、improvement_suggestions、missing_content、overall_assessment）
+</格式>
+"""
 
-总体评价：
-{overall_assessment}
-</评估反馈>
+delta_revision_output_instructions = """
+<段落级修改要求>
+用户提供的当前章节内容已按段落编号（[P编号]）。不要输出完整章节，只针对评估反馈涉及的段落输出修改操作，
+此要求优先于上文关于输出完整章节的要求：
+- replace：用新内容替换编号为paragraph_index的段落
+- insert_after：在编号为paragraph_index的段落后插入新段落（-1表示插入到章节开头）
+- delete：删除编号为paragraph_index的段落
+规则：
+1. 编号一律指原章节中的段落编号，新段落内容中不要包含[P编号]标记
+2. 只修改需要改进的段落，未列出的段落保持不变
+3. 保留章节标题段落（##开头）不变，除非评估明确指出标题有问题
+4. 每个replace或insert_after的内容必须是完整的段落
+调用SectionPatch工具输出修改操作列表。
+</段落级修改要求>
+"""
 
-<参考资料>
-{source_str}
-</参考资料>
+section_revision_instructions = """你是一位专业的学术论文修改专家，现在需要根据用户提供的评估反馈来改进一篇中文学术论文章节。
 
 <修改指南>
 1. 仔细分析评估反馈，特别关注不足、改进建议和缺失内容
@@ -732,29 +724,25 @@ section_revision_instructions = """你是一位专业的学术论文修改专家
 </修改指南>
 """
 
-enhanced_section_revision_instructions = """你是一位资深的学术出版编辑和内容优化专家，你的任务是根据详细的专业评估反馈来优化和提升一篇中文学术论文章节的质量。
-
+# 同一章节各轮修改之间不变的输入在前，评估反馈和当前内容在后
+section_revision_inputs = """
 <论文背景信息>
 论文主题：{topic}
 章节名称：{section_name}
 章节主题：{section_topic}
-修改轮次：第{revision_count}轮修改
 </论文背景信息>
 
-<当前章节内容>
-{section_content}
-</当前章节内容>
+<参考资料>
+{source_str}
+</参考资料>
 
-<专家评估反馈>
+<评估反馈>
 总体评分：{total_score}/100
 
-维度评分：
-{dimension_scores}
-
-内容优势：
+优势：
 {strengths}
 
-内容不足：
+不足：
 {weaknesses}
 
 改进建议：
@@ -765,14 +753,17 @@ enhanced_section_revision_instructions = """你是一位资深的学术出版编
 
 总体评价：
 {overall_assessment}
-</专家评估反馈>
+</评估反馈>
 
-<参考资料>
-{source_str}
-</参考资料>
+<当前章节内容>
+{section_content}
+</当前章节内容>
+"""
+
+enhanced_section_revision_instructions = """你是一位资深的学术出版编辑和内容优化专家，你的任务是根据用户提供的详细专业评估反馈来优化和提升一篇中文学术论文章节的质量。
 
 <修改策略>
-第{revision_count}轮修改重点：
+根据修改轮次确定修改重点：
 1. 如果这是第1轮修改，全面处理所有反馈
 2. 如果这是第2轮修改，重点解决剩余的关键问题
 3. 如果这是第3轮或更多轮修改，只关注最核心的1-2个问题
@@ -805,4 +796,43 @@ enhanced_section_revision_instructions = """你是一位资深的学术出版编
 </学术写作规范>
 
 请直接输出修改后的完整章节内容。不要添加任何修改说明、注释或元数据。输出应该是可以直接用作最终章节内容的完整文本。
+"""
+
+enhanced_section_revision_inputs = """
+<论文背景信息>
+论文主题：{topic}
+章节名称：{section_name}
+章节主题：{section_topic}
+修改轮次：第{revision_count}轮修改
+</论文背景信息>
+
+<参考资料>
+{source_str}
+</参考资料>
+
+<专家评估反馈>
+总体评分：{total_score}/100
+
+维度评分：
+{dimension_scores}
+
+内容优势：
+{strengths}
+
+内容不足：
+{weaknesses}
+
+改进建议：
+{improvement_suggestions}
+
+缺失内容：
+{missing_content}
+
+总体评价：
+{overall_assessment}
+</专家评估反馈>
+
+<当前章节内容>
+{section_content}
+</当前章节内容>
 """
\ No newline at end of file
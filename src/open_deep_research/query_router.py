@@ -0,0 +1,231 @@
+import re
+import math
+import datetime
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from open_deep_research.agentic_rag import SIGNATURE_MAX_AGE, directory_signature, get_cached_vectorstore
+from open_deep_research.utils import text_terms
+
+# 时效性信号：近期年份和表示"最新/当前"的词语，出现时倾向于Web搜索
+_RECENCY_PATTERN = re.compile(
+    r"最新|最近|近期|近年|目前|当前|现状|今年|本年度|趋势|动态|进展|发布|新闻|统计数据|市场规模|"
+    r"\b(?:latest|recent|recently|current|currently|today|this year|trends?|news|state of the art|sota|"
+    r"market size|statistics|forecast|outlook)\b",
+    re.IGNORECASE
+)
+_YEAR_PATTERN = re.compile(r"(?<!\d)(19\d{2}|20\d{2})(?!\d)")
+
+# 概念性信号：定义、原理、历史等稳定知识，出现时倾向于知识库
+_CONCEPT_PATTERN = re.compile(
+    r"定义|概念|原理|基本|基础|理论|历史|起源|发展历程|经典|综述|方法论|区别|对比|推导|公式|"
+    r"\b(?:what is|definition|define|concept|principle|fundamentals?|theory|theoretical|history|"
+    r"origin|classic|overview|survey|derivation|compared? to|difference between)\b",
+    re.IGNORECASE
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[一-鿿]")
+
+# 分类器的初始训练样本
+_SEED_EXAMPLES = {
+    "web": [
+        "2024年大语言模型最新进展",
+        "最新发布的深度学习框架版本",
+        "当前人工智能行业市场规模统计",
+        "近期自动驾驶政策动态",
+        "今年发表的多模态模型研究",
+        "量子计算最新突破新闻",
+        "目前主流开源模型排行榜",
+        "latest benchmark results for large language models",
+        "recent advances in diffusion models 2024",
+        "current market share of cloud providers",
+        "news about AI regulation this year",
+        "state of the art results on ImageNet",
+    ],
+    "kb": [
+        "Transformer注意力机制的基本原理",
+        "卷积神经网络的定义和结构",
+        "反向传播算法的推导",
+        "机器学习的发展历史",
+        "支持向量机的理论基础",
+        "经典强化学习方法综述",
+        "监督学习与无监督学习的区别",
+        "what is the attention mechanism",
+        "definition of gradient descent",
+        "history of neural networks",
+        "theory behind support vector machines",
+        "overview of classic clustering algorithms",
+    ],
+}
+
+def _features(text: str) -> List[str]:
+    """提取分类特征：英文单词/中文单字及其相邻二元组"""
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    return tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+def _logit(p: float) -> float:
+    p = min(max(p, 1e-6), 1 - 1e-6)
+    return math.log(p / (1 - p))
+
+def _sigmoid(x: float) -> float:
+    return 1 / (1 + math.exp(-x))
+
+class NaiveBayesQueryClassifier:
+    """
+    轻量的多项式朴素贝叶斯分类器，判断查询更适合Web搜索还是知识库
+
+    使用少量内置样本初始化，之后可以用LLM路由的决策结果在线学习。
+    """
+
+    LABELS = ("web", "kb")
+
+    def __init__(self, examples: Optional[Dict[str, List[str]]] = None):
+        self._lock = threading.Lock()
+        self._feature_counts = {label: Counter() for label in self.LABELS}
+        self._total_features = {label: 0 for label in self.LABELS}
+        self._doc_counts = {label: 0 for label in self.LABELS}
+        self._vocabulary = set()
+        for label, texts in (examples or _SEED_EXAMPLES).items():
+            for text in texts:
+                self.learn(text, label)
+
+    def learn(self, text: str, label: str):
+        """用一条带标签的查询更新分类器"""
+        if label not in self.LABELS:
+            return
+        features = _features(text)
+        with self._lock:
+            self._feature_counts[label].update(features)
+            self._total_features[label] += len(features)
+            self._doc_counts[label] += 1
+            self._vocabulary.update(features)
+
+    def predict_web_probability(self, text: str) -> float:
+        """返回查询属于Web搜索类的概率"""
+        features = _features(text)
+        with self._lock:
+            vocabulary_size = len(self._vocabulary) or 1
+            total_docs = sum(self._doc_counts.values())
+            log_probs = {}
+            for label in self.LABELS:
+                log_prob = math.log((self._doc_counts[label] + 1) / (total_docs + 2))
+                denominator = self._total_features[label] + vocabulary_size
+                for feature in features:
+                    log_prob += math.log((self._feature_counts[label][feature] + 1) / denominator)
+                log_probs[label] = log_prob
+        return _sigmoid(log_probs["web"] - log_probs["kb"])
+
+@dataclass
+class RouteDecision:
+    """本地路由的结果"""
+    decision: str       # "web" 或 "kb"
+    confidence: float   # 0~1，越大越确定
+    reasoning: str
+
+class QueryRouter:
+    """
+    基于廉价信号的查询源路由器
+
+    综合以下信号给出"web"或"kb"决策及置信度：
+    1. 知识库是否存在文档，以及查询词在已构建向量库文本块中的覆盖率
+    2. 查询中的近期年份和时效性词语 / 概念性词语
+    3. 朴素贝叶斯分类器的预测
+    置信度不足时由调用方升级为LLM判断，并可将LLM的决策回馈给分类器。
+    """
+
+    # 各信号在对数几率上的权重（朴素贝叶斯在小样本上过于自信，权重减半）
+    CLASSIFIER_WEIGHT = 0.5
+    RECENCY_WEIGHT = 1.5
+    CONCEPT_WEIGHT = 1.0
+    KB_SCORE_WEIGHT = 4.0
+    # 查询词覆盖率高于该值视为知识库能够覆盖查询
+    KB_SCORE_PIVOT = 0.5
+
+    def __init__(self, classifier: Optional[NaiveBayesQueryClassifier] = None):
+        self.classifier = classifier or NaiveBayesQueryClassifier()
+        # 向量库 -> 各文本块的词项集合；向量库被替换后自动释放
+        self._chunk_terms = weakref.WeakKeyDictionary()
+        self._chunk_terms_lock = threading.Lock()
+
+    def _get_chunk_terms(self, vectorstore) -> List[set]:
+        """读取向量库中已存储的文本块并提取词项，每个向量库只计算一次"""
+        with self._chunk_terms_lock:
+            chunk_terms = self._chunk_terms.get(vectorstore)
+        if chunk_terms is None:
+            documents = vectorstore.get(include=["documents"]).get("documents") or []
+            chunk_terms = [terms for terms in map(text_terms, documents) if terms]
+            with self._chunk_terms_lock:
+                self._chunk_terms[vectorstore] = chunk_terms
+        return chunk_terms
+
+    def _kb_relevance(self, query_list: List[str], kb_directory: Optional[str]) -> Optional[float]:
+        """
+        计算查询词在知识库文本块中的平均最高覆盖率
+
+        只读取本地已存储的文本块做词项匹配，不调用嵌入接口。
+
+        返回:
+            0~1的覆盖率；向量库尚未构建时返回None（此时不构建，避免开销）
+        """
+        vectorstore = get_cached_vectorstore(kb_directory)
+        if vectorstore is None:
+            return None
+        chunk_terms = self._get_chunk_terms(vectorstore)
+        scores = []
+        for query in query_list:
+            query_terms = text_terms(query)
+            if not query_terms:
+                continue
+            best = max((len(query_terms & terms) for terms in chunk_terms), default=0)
+            scores.append(best / len(query_terms))
+        return sum(scores) / len(scores) if scores else None
+
+    def route(self, query_list: List[str], kb_directory: Optional[str] = None) -> RouteDecision:
+        """
+        为一组查询选择搜索源
+
+        参数:
+            query_list: 查询列表
+            kb_directory: 知识库目录
+
+        返回:
+            路由决策
+        """
+        if not kb_directory or not directory_signature(kb_directory, max_age=SIGNATURE_MAX_AGE):
+            return RouteDecision("web", 1.0, "知识库中没有文档")
+        kb_relevance = self._kb_relevance(query_list, kb_directory)
+
+        text = " ".join(query_list)
+        current_year = datetime.date.today().year
+        recent_years = [int(y) for y in _YEAR_PATTERN.findall(text) if int(y) >= current_year - 2]
+        recency_hits = len(_RECENCY_PATTERN.findall(text)) + len(recent_years)
+        concept_hits = len(_CONCEPT_PATTERN.findall(text))
+
+        web_probability = self.classifier.predict_web_probability(text)
+        score = self.CLASSIFIER_WEIGHT * _logit(web_probability)
+        score += self.RECENCY_WEIGHT * min(recency_hits, 3)
+        score -= self.CONCEPT_WEIGHT * min(concept_hits, 3)
+        if kb_relevance is not None:
+            score -= self.KB_SCORE_WEIGHT * (kb_relevance - self.KB_SCORE_PIVOT)
+
+        probability = _sigmoid(score)
+        decision = "web" if probability >= 0.5 else "kb"
+        reasoning = (
+            f"分类器P(web)={web_probability:.2f}，时效性信号{recency_hits}个，概念性信号{concept_hits}个，"
+            f"知识库覆盖率={'未知' if kb_relevance is None else f'{kb_relevance:.2f}'}"
+        )
+        return RouteDecision(decision, abs(probability - 0.5) * 2, reasoning)
+
+    def learn(self, query_list: List[str], decision: str):
+        """用LLM路由的决策更新分类器"""
+        self.classifier.learn(" ".join(query_list), decision.lower())
+
+# 进程级路由器，LLM升级的结果在整个进程内持续积累
+_query_router = QueryRouter()
+
+def get_query_router() -> QueryRouter:
+    """获取全局查询路由器"""
+    return _query_router
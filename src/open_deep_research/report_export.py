@@ -0,0 +1,249 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import logging
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from open_deep_research.html_renderer import render_report_html
+
+logger = logging.getLogger(__name__)
+
+# 支持的导出格式
+EXPORT_FORMATS = ("html", "markdown", "pdf", "docx")
+
+# 导出任务状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_PARTIAL = "partial"  # 部分格式导出失败
+STATUS_FAILED = "failed"
+
+_FILE_EXTENSIONS = {"html": "html", "markdown": "md", "pdf": "pdf", "docx": "docx"}
+_UNSAFE_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|\s]+')
+
+@dataclass
+class ExportJob:
+    """一次报告导出任务"""
+    job_id: str
+    topic: str
+    formats: List[str]
+    paths: Dict[str, str]                                  # 格式 -> 输出文件路径（任务创建时即确定）
+    status: str = STATUS_PENDING
+    errors: Dict[str, str] = field(default_factory=dict)   # 格式 -> 失败原因
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "topic": self.topic,
+            "formats": list(self.formats),
+            "paths": dict(self.paths),
+            "status": self.status,
+            "errors": dict(self.errors),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+def parse_export_formats(formats: Union[str, List[str], None]) -> List[str]:
+    """
+    解析导出格式配置
+
+    参数:
+        formats: 格式列表，或以逗号分隔的字符串（通过环境变量EXPORT_FORMATS设置时）；"none"表示不导出
+
+    返回:
+        去重后的有效格式列表
+    """
+    if not formats:
+        return []
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    parsed = []
+    for fmt in formats:
+        fmt = fmt.strip().lower()
+        fmt = "markdown" if fmt == "md" else fmt
+        if fmt in ("", "none"):
+            continue
+        if fmt not in EXPORT_FORMATS:
+            logger.warning(f"忽略不支持的导出格式: {fmt}")
+        elif fmt not in parsed:
+            parsed.append(fmt)
+    return parsed
+
+def _write_text(path: str, text: str):
+    # 先写入临时文件再改名，读取方不会看到写了一半的文件
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _convert_with_pandoc(source_path: str, output_path: str):
+    pandoc = shutil.which("pandoc")
+    if not pandoc:
+        raise RuntimeError("未找到本地转换工具pandoc")
+    subprocess.run([pandoc, source_path, "-o", output_path], check=True, capture_output=True, timeout=300)
+
+def _convert_html_to_pdf(html_path: str, markdown_path: str, output_path: str):
+    # 优先用wkhtmltopdf保留网页样式，否则交给pandoc（需要其PDF引擎）
+    wkhtmltopdf = shutil.which("wkhtmltopdf")
+    if wkhtmltopdf:
+        subprocess.run([wkhtmltopdf, "--quiet", "--enable-local-file-access", html_path, output_path],
+                       check=True, capture_output=True, timeout=300)
+    else:
+        _convert_with_pandoc(markdown_path, output_path)
+
+class ReportExporter:
+    """
+    后台报告导出器
+
+    compile_final_report只把导出任务放入队列并立即返回，HTML渲染、磁盘写入和PDF/DOCX转换
+    在后台线程中完成。任务的输出路径在提交时即确定，状态可通过get_status查询。
+    解释器退出前会等待队列中的任务完成。
+    """
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-export")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ExportJob] = {}
+        self._max_jobs = max_jobs
+
+    def submit(self, report: str, topic: str, formats: List[str], output_dir: str,
+               html: Optional[str] = None) -> ExportJob:
+        """
+        提交导出任务
+
+        参数:
+            report: 最终报告的Markdown文本
+            topic: 报告主题（用于文件名和网页标题）
+            formats: 导出格式
+            output_dir: 输出目录
+            html: 已生成的HTML（设计师模式），为None时使用模板渲染
+
+        返回:
+            导出任务
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        basename = f"{_UNSAFE_FILENAME_PATTERN.sub('_', topic or 'report')}_{timestamp}"
+        output_dir = os.path.abspath(output_dir)
+        job = ExportJob(
+            job_id=uuid.uuid4().hex,
+            topic=topic,
+            formats=list(formats),
+            paths={fmt: os.path.join(output_dir, f"{basename}.{_FILE_EXTENSIONS[fmt]}") for fmt in formats}
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # 只保留最近的任务记录
+            for stale_id in list(self._jobs)[:-self._max_jobs]:
+                del self._jobs[stale_id]
+        self._executor.submit(self._run, job, report, output_dir, html)
+        return job
+
+    def _run(self, job: ExportJob, report: str, output_dir: str, html: Optional[str]):
+        self._set_status(job, STATUS_RUNNING)
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            job.errors = {fmt: str(e) for fmt in job.formats}
+            self._set_status(job, STATUS_FAILED)
+            return
+
+        # PDF和DOCX由本地转换工具从HTML/Markdown文件生成，按需写出中间文件
+        need_html = "html" in job.formats or "pdf" in job.formats
+        need_markdown = any(fmt in job.formats for fmt in ("markdown", "pdf", "docx"))
+        html_path = job.paths.get("html") or os.path.join(output_dir, f".{job.job_id}.html")
+        markdown_path = job.paths.get("markdown") or os.path.join(output_dir, f".{job.job_id}.md")
+        temporary = []
+        if need_html and "html" not in job.formats:
+            temporary.append(html_path)
+        if need_markdown and "markdown" not in job.formats:
+            temporary.append(markdown_path)
+
+        steps = []
+        if need_html:
+            steps.append(("html", lambda: _write_text(html_path, html or render_report_html(report, job.topic))))
+        if need_markdown:
+            steps.append(("markdown", lambda: _write_text(markdown_path, report)))
+        if "docx" in job.formats:
+            steps.append(("docx", lambda: _convert_with_pandoc(markdown_path, job.paths["docx"])))
+        if "pdf" in job.formats:
+            steps.append(("pdf", lambda: _convert_html_to_pdf(html_path, markdown_path, job.paths["pdf"])))
+
+        for fmt, step in steps:
+            try:
+                step()
+            except Exception as e:
+                with self._lock:
+                    job.errors[fmt] = str(e)
+                logger.warning(f"报告导出失败（{fmt}）: {str(e)}")
+
+        for path in temporary:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        failed = [fmt for fmt in job.formats if fmt in job.errors]
+        if not failed:
+            status = STATUS_COMPLETED
+        elif len(failed) < len(job.formats):
+            status = STATUS_PARTIAL
+        else:
+            status = STATUS_FAILED
+        self._set_status(job, status)
+
+    def _set_status(self, job: ExportJob, status: str):
+        with self._lock:
+            job.status = status
+            if status not in (STATUS_PENDING, STATUS_RUNNING):
+                job.finished_at = time.time()
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        """获取导出任务的状态，任务不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list_jobs(self) -> List[dict]:
+        """获取所有（最近的）导出任务的状态"""
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        等待导出任务结束
+
+        参数:
+            job_id: 任务id
+            timeout: 最长等待秒数，None表示一直等待
+
+        返回:
+            任务状态，任务不存在时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.get_status(job_id)
+            if status is None or status["status"] not in (STATUS_PENDING, STATUS_RUNNING):
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                return status
+            time.sleep(0.05)
+
+# 进程级导出器
+_exporter = ReportExporter()
+
+def get_report_exporter() -> ReportExporter:
+    """获取全局报告导出器"""
+    return _exporter
+
+def get_export_status(job_id: str) -> Optional[dict]:
+    """获取导出任务的状态"""
+    return _exporter.get_status(job_id)
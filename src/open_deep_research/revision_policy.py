@@ -0,0 +1,162 @@
+import time
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# 决策原因
+REASON_BELOW_THRESHOLD = "below_threshold"  # 分数未达标，继续修订
+REASON_PASSED = "passed"                    # 分数达标
+REASON_MAX_REVISIONS = "max_revisions"      # 达到最大修订次数
+REASON_PLATEAU = "plateau"                  # 修订带来的提升停滞
+REASON_TOKEN_BUDGET = "token_budget"        # 章节token预算用尽
+REASON_TIME_BUDGET = "time_budget"          # 章节时间预算用尽
+REASON_EVALUATION_FAILED = "evaluation_failed"  # 未能得到有效评分
+
+@dataclass
+class PolicyDecision:
+    """策略引擎的一次决策"""
+    proceed: bool   # True表示继续（修订/研究），False表示停止
+    reason: str
+
+class RevisionPolicy:
+    """
+    章节写作-评审-修订循环的提前退出策略
+
+    根据评估分数的历史记录和章节的token/时间消耗决定是否继续修订：
+    分数达标、达到最大修订次数、连续若干轮提升不足（停滞，需设置plateau_patience）或预算用尽时停止。
+    同样的预算也用于限制write_section中评审-补充搜索的轮数。
+    """
+
+    def __init__(self,
+                 threshold: float = 85,
+                 max_revisions: int = 3,
+                 min_improvement: float = 2.0,
+                 plateau_patience: Optional[int] = None,
+                 token_budget: Optional[int] = None,
+                 time_budget_seconds: Optional[float] = None):
+        """
+        初始化策略
+
+        参数:
+            threshold: 分数达到该值即不再修订
+            max_revisions: 最大修订次数
+            min_improvement: 一轮修订的分数提升小于该值视为停滞
+            plateau_patience: 连续停滞多少轮后停止，None表示不做停滞判定
+            token_budget: 每个章节的token预算，None表示不限制
+            time_budget_seconds: 每个章节的时间预算（秒），None表示不限制
+        """
+        self.threshold = threshold
+        self.max_revisions = max_revisions
+        self.min_improvement = min_improvement
+        self.plateau_patience = plateau_patience
+        self.token_budget = token_budget
+        self.time_budget_seconds = time_budget_seconds
+
+    @classmethod
+    def from_configuration(cls, configurable) -> "RevisionPolicy":
+        """根据Configuration创建策略"""
+        return cls(
+            threshold=float(configurable.revision_threshold),
+            max_revisions=int(configurable.max_revisions),
+            min_improvement=float(configurable.revision_min_improvement),
+            plateau_patience=int(configurable.revision_plateau_patience) if configurable.revision_plateau_patience else None,
+            token_budget=int(configurable.section_token_budget) if configurable.section_token_budget else None,
+            time_budget_seconds=float(configurable.section_time_budget_seconds) if configurable.section_time_budget_seconds else None
+        )
+
+    def budget_exhausted(self, tokens_used: int, started_at: Optional[float]) -> Optional[str]:
+        """
+        检查章节预算
+
+        返回:
+            预算用尽时返回原因，否则返回None
+        """
+        if self.token_budget and tokens_used >= self.token_budget:
+            return REASON_TOKEN_BUDGET
+        if self.time_budget_seconds and started_at and time.time() - started_at >= self.time_budget_seconds:
+            return REASON_TIME_BUDGET
+        return None
+
+    def _plateaued(self, scores: List[float]) -> bool:
+        """最近plateau_patience轮修订的分数提升是否都小于min_improvement"""
+        if not self.plateau_patience:
+            return False
+        patience = self.plateau_patience
+        if len(scores) < patience + 1:
+            return False
+        recent = scores[-(patience + 1):]
+        return all(b - a < self.min_improvement for a, b in zip(recent, recent[1:]))
+
+    def decide_revision(self, scores: List[float], revision_count: int,
+                        tokens_used: int = 0, started_at: Optional[float] = None) -> PolicyDecision:
+        """
+        决定章节是否继续修订
+
+        参数:
+            scores: 该章节历次评估的总分（含本次）
+            revision_count: 已完成的修订次数
+            tokens_used: 章节已消耗的token数
+            started_at: 章节开始写作的时间戳
+
+        返回:
+            策略决策
+        """
+        if scores[-1] >= self.threshold:
+            return PolicyDecision(False, REASON_PASSED)
+        if revision_count >= self.max_revisions:
+            return PolicyDecision(False, REASON_MAX_REVISIONS)
+        if self._plateaued(scores):
+            return PolicyDecision(False, REASON_PLATEAU)
+        budget_reason = self.budget_exhausted(tokens_used, started_at)
+        if budget_reason:
+            return PolicyDecision(False, budget_reason)
+        return PolicyDecision(True, REASON_BELOW_THRESHOLD)
+
+    def decide_research(self, tokens_used: int = 0, started_at: Optional[float] = None) -> PolicyDecision:
+        """决定write_section是否还可以进行评审和补充搜索"""
+        budget_reason = self.budget_exhausted(tokens_used, started_at)
+        if budget_reason:
+            return PolicyDecision(False, budget_reason)
+        return PolicyDecision(True, REASON_BELOW_THRESHOLD)
+
+# 进程级的决策统计
+_metrics_lock = threading.Lock()
+_decision_counts: Dict[str, Counter] = {"revision": Counter(), "research": Counter()}
+_decision_log: List[Dict[str, Any]] = []
+_MAX_LOG_ENTRIES = 1000
+
+def record_decision(stage: str, section_name: str, decision: PolicyDecision, **details):
+    """
+    记录一次策略决策
+
+    参数:
+        stage: "revision"（修订循环）或"research"（评审-补充搜索循环）
+        section_name: 章节名称
+        decision: 策略决策
+        **details: 附加信息（如分数、分数变化、token数）
+    """
+    with _metrics_lock:
+        _decision_counts.setdefault(stage, Counter())[decision.reason] += 1
+        _decision_log.append({
+            "stage": stage,
+            "section": section_name,
+            "proceed": decision.proceed,
+            "reason": decision.reason,
+            "time": time.time(),
+            **details
+        })
+        del _decision_log[:-_MAX_LOG_ENTRIES]
+
+def get_revision_metrics() -> Dict[str, Any]:
+    """
+    获取策略决策统计
+
+    返回:
+        {"counts": {阶段: {原因: 次数}}, "decisions": 最近的决策记录}
+    """
+    with _metrics_lock:
+        return {
+            "counts": {stage: dict(counts) for stage, counts in _decision_counts.items()},
+            "decisions": list(_decision_log)
+        }
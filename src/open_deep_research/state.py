@@ -1,5 +1,6 @@
 from typing import Annotated, List, TypedDict, Literal, Optional, Dict, Any, Union
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 import operator
 
 class Section(BaseModel):
@@ -21,6 +22,11 @@ class Section(BaseModel):
         description="章节内容的评估结果",
         default=None
     )
+    # 章节在计划中的位置，由规划节点设置，不出现在模型的输出模式中
+    index: SkipJsonSchema[Optional[int]] = Field(
+        description="章节在报告计划中的编号",
+        default=None
+    )
 
 class Sections(BaseModel):
     sections: List[Section] = Field(
@@ -37,6 +43,19 @@ class Queries(BaseModel):
         description="List of search queries.",
     )
 
+class SectionQueries(BaseModel):
+    """单个章节的搜索查询"""
+    section_index: int = Field(description="章节在章节列表中的编号")
+    queries: List[SearchQuery] = Field(
+        description="List of search queries for this section.",
+    )
+
+class BatchQueries(BaseModel):
+    """多个章节的搜索查询"""
+    sections: List[SectionQueries] = Field(
+        description="Search queries for each section.",
+    )
+
 class Feedback(BaseModel):
     """质量反馈信息"""
     grade: str = Field(
@@ -46,6 +65,33 @@ class Feedback(BaseModel):
         description="List of follow-up search queries.",
     )
 
+class CombinedSectionEvaluation(BaseModel):
+    """章节评审与内容评估的合并结果"""
+    grade: Literal["pass", "fail"] = Field(
+        description="章节是否充分涵盖章节主题（'pass'），或需要补充研究（'fail'）"
+    )
+    follow_up_queries: List[SearchQuery] = Field(
+        description="补充研究的后续搜索查询，grade为'pass'时为空列表",
+    )
+    evaluation: "ContentEvaluation" = Field(description="章节内容的详细质量评估")
+
+class Source(BaseModel):
+    """检索得到的单个来源，按id寻址"""
+    id: str = Field(description="来源的稳定标识，由URL（或内容）哈希得到")
+    title: str = Field(default="", description="来源标题")
+    url: str = Field(default="", description="来源URL")
+    content: str = Field(default="", description="与查询最相关的内容摘要")
+    raw_content: Optional[str] = Field(default=None, description="来源全文（如有）")
+    score: Optional[float] = Field(default=None, description="相关性评分")
+    query: Optional[str] = Field(default=None, description="检索到该来源的查询")
+
+def merge_sources(existing: Optional[List[Source]], new: Optional[List[Source]]) -> List[Source]:
+    """按id合并来源列表（保留先出现的来源），用作来源池的状态归约函数"""
+    merged = {source.id: source for source in existing or []}
+    for source in new or []:
+        merged.setdefault(source.id, source)
+    return list(merged.values())
+
 class DimensionScore(BaseModel):
     """维度评分及评语"""
     score: int = Field(description="该维度的得分")
@@ -69,31 +115,63 @@ class SimpleContentEvaluation(BaseModel):
     improvement_suggestions: List[str] = Field(description="具体修改建议")
     overall_assessment: str = Field(description="总体评价(200字左右)")
 
+class ParagraphEdit(BaseModel):
+    """对章节中一个段落的修改操作"""
+    operation: Literal["replace", "insert_after", "delete"] = Field(
+        description="修改类型：replace替换该段落，insert_after在该段落后插入新段落，delete删除该段落"
+    )
+    paragraph_index: int = Field(
+        description="原章节中段落的编号（[P编号]中的数字）；insert_after使用-1表示插入到章节开头"
+    )
+    content: str = Field(
+        default="",
+        description="replace和insert_after的新段落内容，delete时为空字符串"
+    )
+
+class SectionPatch(BaseModel):
+    """章节的段落级修改"""
+    edits: List[ParagraphEdit] = Field(
+        description="段落修改操作列表，未列出的段落保持不变",
+    )
+
 class ReportStateInput(TypedDict):
     topic: str # Report topic
     
 class ReportStateOutput(TypedDict):
     final_report: str # Final report
+    html_report: Optional[str]  # 导出的HTML文件路径（由后台导出器写入）
+    export_job_id: Optional[str]  # 后台导出任务id，可通过report_export.get_export_status查询
 
 class ReportState(TypedDict, total=False):
     topic: str 
     sections: List[Section]
     completed_sections: Annotated[List[Section], operator.add]  # 修改为与SectionState和SectionOutputState一致
     feedback_on_report_plan: Optional[str]
+    source_pool: Annotated[List[Source], merge_sources]  # 本次运行中所有搜索得到的来源（含规划阶段），按id去重
     report_sections_from_research: Optional[str]
     final_report: Optional[str]
-    html_report: Optional[str]
+    html_report: Optional[str]  # 导出的HTML文件路径（由后台导出器写入）
+    export_job_id: Optional[str]  # 后台导出任务id，可通过report_export.get_export_status查询
 
 class SectionState(TypedDict, total=False):
     topic: str
     section: Section 
     search_queries: List[SearchQuery]
-    source_str: str
+    sources: List[Source]  # 结构化的检索来源，在生成提示时再按需格式化
+    shared_sources: List[Source]  # 启动章节时来源池的快照（仅在启用reuse_source_pool时传入，不回传给主图）
+    source_pool: Annotated[List[Source], merge_sources]  # 本章节新搜索到的来源，完成后合并回共享来源池
+    used_source_ids: List[str]  # 本章节历轮已使用过的来源id，从来源池选取时排除
     search_iterations: int
     search_decision: str
     completed_sections: Annotated[List[Section], operator.add]  # 修改为与SectionOutputState相同的类型
     section_content_evaluation: Optional[Union[ContentEvaluation, SimpleContentEvaluation]]
     revision_count: int  # 修改次数计数器，用于防止死循环
+    score_history: List[float]  # 历次内容评估的总分，用于判断修订是否停滞
+    section_tokens: int  # 本章节已消耗的token数（估计值）
+    section_started_at: float  # 本章节开始写作的时间戳
 
 class SectionOutputState(TypedDict, total=False):
     completed_sections: Annotated[List[Section], operator.add]  # 使用operator.add注解以支持多个值合并
+    source_pool: Annotated[List[Source], merge_sources]  # 将章节搜索到的来源合并回共享来源池
+
+CombinedSectionEvaluation.model_rebuild()
@@ -1,11 +1,15 @@
 import os
+import re
 import asyncio
 import requests
+import math
 import random 
-import concurrent
 import aiohttp
 import time
+import json
+import hashlib
 import logging
+import weakref
 from typing import List, Optional, Dict, Any, Union
 from urllib.parse import unquote
 
@@ -13,13 +17,13 @@ from exa_py import Exa
 from linkup import LinkupClient
 from tavily import AsyncTavilyClient
 from duckduckgo_search import DDGS 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from langchain_community.retrievers import ArxivRetriever
 from langchain_community.utilities.pubmed import PubMedAPIWrapper
 from langsmith import traceable
 
-from open_deep_research.state import Section
+from open_deep_research.state import Section, Source, ParagraphEdit
 
 
 def get_config_value(value):
@@ -57,6 +61,7 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
         "arxiv": ["load_max_docs", "get_full_documents", "load_all_available_meta"],
         "pubmed": ["top_k_results", "email", "api_key", "doc_content_chars_max"],
         "linkup": ["depth"],
+        "replay": ["fixture_dir", "latency_distribution", "latency_mean", "latency_std", "seed"],
     }
 
     # Get the list of accepted parameters for the given search API
@@ -69,50 +74,89 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
     # Filter the config to only include accepted parameters
     return {k: v for k, v in search_api_config.items() if k in accepted_params}
 
-def deduplicate_and_format_sources(search_response, max_tokens_per_source, include_raw_content=True):
+def make_source_id(url: str, content: str = "") -> str:
+    """Returns a stable id for a source, derived from its URL (or its content when there is no URL)."""
+    key = url or content
+    return "src-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+def search_results_to_sources(search_response, include_raw_content=True, query_list=None) -> List[Source]:
     """
-    Takes a list of search responses and formats them into a readable string.
-    Limits the raw_content to approximately max_tokens_per_source tokens.
- 
+    Converts raw search responses into a deduplicated, id-addressed list of sources.
+
     Args:
-        search_responses: List of search response dicts, each containing:
-            - query: str
+        search_response: List of search response dicts, each containing:
+            - query: str (optional, falls back to the matching entry of `query_list`)
             - results: List of dicts with fields:
                 - title: str
                 - url: str
                 - content: str
                 - score: float
                 - raw_content: str|None
+        include_raw_content: bool, whether to keep the full page content
+        query_list: Optional list of the queries, in the same order as `search_response`
+
+    Returns:
+        List[Source]: Sources deduplicated by URL, in first-seen order
+    """
+    sources = {}
+    for i, response in enumerate(search_response):
+        query = response.get('query')
+        if query is None and query_list and i < len(query_list):
+            query = query_list[i]
+        for result in response['results']:
+            url = result.get('url', '')
+            source_id = make_source_id(url, result.get('content', ''))
+            if source_id in sources:
+                continue
+            sources[source_id] = Source(
+                id=source_id,
+                title=result.get('title') or '',
+                url=url,
+                content=result.get('content') or '',
+                raw_content=result.get('raw_content') if include_raw_content else None,
+                score=result.get('score'),
+                query=query
+            )
+    return list(sources.values())
+
+def make_text_source(content: str, title: str, query: Optional[str] = None) -> Source:
+    """Wraps a block of text that did not come from a URL (e.g. a knowledge base answer) as a source."""
+    return Source(id=make_source_id("", content), title=title, content=content, query=query)
+
+def format_sources(sources: List[Source], max_tokens_per_source=4000, include_raw_content=True,
+                   source_ids: Optional[List[str]] = None, max_sources: Optional[int] = None) -> str:
+    """
+    Formats a list of sources into a readable string for a prompt.
+    Limits the raw_content to approximately max_tokens_per_source tokens.
+
+    Args:
+        sources: List of sources to format
         max_tokens_per_source: int
-        include_raw_content: bool
-            
+        include_raw_content: bool, whether to include the full content of sources that have it
+        source_ids: Optional list of ids, to format only that subset of the sources
+        max_sources: Optional maximum number of sources to include
+
     Returns:
-        str: Formatted string with deduplicated sources
+        str: Formatted string with the selected sources
     """
-     # Collect all results
-    sources_list = []
-    for response in search_response:
-        sources_list.extend(response['results'])
-    
-    # Deduplicate by URL
-    unique_sources = {source['url']: source for source in sources_list}
+    if source_ids is not None:
+        wanted = set(source_ids)
+        sources = [source for source in sources if source.id in wanted]
+    if max_sources is not None:
+        sources = sources[:max_sources]
 
     # Format output
     formatted_text = "Content from sources:\n"
-    for i, source in enumerate(unique_sources.values(), 1):
+    for source in sources:
         formatted_text += f"{'='*80}\n"  # Clear section separator
-        formatted_text += f"Source: {source['title']}\n"
+        formatted_text += f"Source: {source.title}\n"
         formatted_text += f"{'-'*80}\n"  # Subsection separator
-        formatted_text += f"URL: {source['url']}\n===\n"
-        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
-        if include_raw_content:
+        formatted_text += f"URL: {source.url}\n===\n"
+        formatted_text += f"Most relevant content from source: {source.content}\n===\n"
+        if include_raw_content and source.raw_content is not None:
             # Using rough estimate of 4 characters per token
             char_limit = max_tokens_per_source * 4
-            # Handle None raw_content
-            raw_content = source.get('raw_content', '')
-            if raw_content is None:
-                raw_content = ''
-                print(f"Warning: No raw_content found for source {source['url']}")
+            raw_content = source.raw_content
             if len(raw_content) > char_limit:
                 raw_content = raw_content[:char_limit] + "... [truncated]"
             formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
@@ -120,6 +164,22 @@ def deduplicate_and_format_sources(search_response, max_tokens_per_source, inclu
                 
     return formatted_text.strip()
 
+def deduplicate_and_format_sources(search_response, max_tokens_per_source, include_raw_content=True):
+    """
+    Takes a list of search responses and formats them into a readable string.
+    Limits the raw_content to approximately max_tokens_per_source tokens.
+ 
+    Args:
+        search_responses: List of search response dicts, see `search_results_to_sources`
+        max_tokens_per_source: int
+        include_raw_content: bool
+            
+    Returns:
+        str: Formatted string with deduplicated sources
+    """
+    sources = search_results_to_sources(search_response, include_raw_content=include_raw_content)
+    return format_sources(sources, max_tokens_per_source, include_raw_content)
+
 def format_sections(sections: list[Section]) -> str:
     """ Format a list of sections into a string """
     formatted_str = ""
@@ -876,11 +936,70 @@ async def duckduckgo_search(search_queries):
     
     return search_docs
 
+# lxml is several times faster than the pure-Python html.parser
+_HTML_PARSER = "lxml"
+
+# Extractor for Google's lightweight (Lynx) results page. The strainer makes
+# BeautifulSoup build a tree only for the result blocks instead of the whole page.
+_GOOGLE_RESULT_STRAINER = SoupStrainer("div", class_="ezO2md")
+
+# One pooled aiohttp session per event loop, together with the async generator that closes it
+_http_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+async def _http_session_lifetime(session: aiohttp.ClientSession):
+    # asyncio.run (and servers built on it) finalize live async generators before closing
+    # the loop, which closes the pooled session cleanly
+    try:
+        yield
+    finally:
+        await session.close()
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the pooled aiohttp session of the running event loop.
+
+    Sessions are bound to the loop they were created on, so each loop gets its own session
+    and connection pool, reused by every search call on that loop.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _http_sessions.get(loop)
+    if entry is None or entry[0].closed:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20))
+        lifetime = _http_session_lifetime(session)
+        await lifetime.__anext__()
+        entry = _http_sessions[loop] = (session, lifetime)
+    return entry[0]
+
+def parse_google_results(html: str) -> List[dict]:
+    """
+    Extracts organic results from a Google results page.
+
+    Args:
+        html (str): The results page HTML
+
+    Returns:
+        List[dict]: Results in page order, each with "title", "url" and "content"
+    """
+    soup = BeautifulSoup(html, _HTML_PARSER, parse_only=_GOOGLE_RESULT_STRAINER)
+    parsed = []
+    for result in soup.find_all("div", class_="ezO2md", recursive=False):
+        link_tag = result.select_one("a[href]")
+        title_tag = link_tag.select_one("span.CVA68e") if link_tag else None
+        description_tag = result.select_one("span.FrIlee")
+        if link_tag and title_tag and description_tag:
+            parsed.append({
+                "title": title_tag.get_text(),
+                "url": unquote(link_tag["href"].split("&")[0].replace("/url?q=", "")),
+                "content": description_tag.get_text()
+            })
+    return parsed
+
 @traceable
 async def google_search_async(search_queries: Union[str, List[str]], max_results: int = 5, include_raw_content: bool = True):
     """
     Performs concurrent web searches using Google.
     Uses Google Custom Search API if environment variables are set, otherwise falls back to web scraping.
+    Requests share the pooled aiohttp session of the running event loop.
 
     Args:
         search_queries (List[str]): List of search queries to process
@@ -910,202 +1029,156 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
         openssl_version = f"OpenSSL/{random.randint(1, 3)}.{random.randint(0, 4)}.{random.randint(0, 9)}"
         return f"{lynx_version} {libwww_version} {ssl_mm_version} {openssl_version}"
     
-    # Create executor for running synchronous operations
-    executor = None if use_api else concurrent.futures.ThreadPoolExecutor(max_workers=5)
-    
     # Use a semaphore to limit concurrent requests
     semaphore = asyncio.Semaphore(5 if use_api else 2)
+
+    async def search_api(session, query):
+        results = []
+        # The API returns up to 10 results per request
+        for start_index in range(1, max_results + 1, 10):
+            # Calculate how many results to request in this batch
+            num = min(10, max_results - (start_index - 1))
+            
+            # Make request to Google Custom Search API
+            params = {
+                'q': query,
+                'key': api_key,
+                'cx': cx,
+                'start': start_index,
+                'num': num
+            }
+            print(f"Requesting {num} results for '{query}' from Google API...")
+
+            async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    print(f"API error: {response.status}, {error_text}")
+                    break
+                    
+                data = await response.json()
+                
+                # Process search results
+                for item in data.get('items', []):
+                    results.append({
+                        "title": item.get('title', ''),
+                        "url": item.get('link', ''),
+                        "content": item.get('snippet', ''),
+                        "score": None,
+                        "raw_content": item.get('snippet', '')
+                    })
+            
+            # Respect API quota with a small delay
+            await asyncio.sleep(0.2)
+            
+            # If we didn't get a full page of results, no need to request more
+            if not data.get('items') or len(data.get('items', [])) < num:
+                break
+        return results
+
+    async def search_scrape(session, query):
+        # Add delay between requests
+        await asyncio.sleep(0.5 + random.random() * 1.5)
+        print(f"Scraping Google for '{query}'...")
+
+        try:
+            start = 0
+            fetched_links = set()
+            search_results = []
+            
+            while len(search_results) < max_results:
+                # Send request to Google
+                async with session.get(
+                    "https://www.google.com/search",
+                    headers={
+                        "User-Agent": get_useragent(),
+                        "Accept": "*/*"
+                    },
+                    params={
+                        "q": query,
+                        "num": max_results + 2,
+                        "hl": "en",
+                        "start": start,
+                        "safe": "active",
+                    },
+                    cookies={
+                        'CONSENT': 'PENDING+987',  # Bypasses the consent page
+                        'SOCS': 'CAESHAgBEhIaAB',
+                    }
+                ) as resp:
+                    resp.raise_for_status()
+                    html = await resp.text(errors='replace')
+                
+                new_results = 0
+                for parsed in parse_google_results(html):
+                    if parsed["url"] in fetched_links:
+                        continue
+                    fetched_links.add(parsed["url"])
+
+                    # Store result in the same format as the API results
+                    search_results.append({**parsed, "score": None, "raw_content": parsed["content"]})
+                    new_results += 1
+                    
+                    if len(search_results) >= max_results:
+                        break
+                
+                if new_results == 0:
+                    break
+                    
+                start += 10
+                await asyncio.sleep(1)  # Delay between pages, without holding a worker thread
+            
+            return search_results
+                
+        except Exception as e:
+            print(f"Error in Google search for '{query}': {str(e)}")
+            return []
+
+    async def fetch_full_content(session, content_semaphore, result):
+        async with content_semaphore:
+            url = result['url']
+            headers = {
+                'User-Agent': get_useragent(),
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+            }
+            
+            try:
+                await asyncio.sleep(0.2 + random.random() * 0.6)
+                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 200:
+                        # Check content type to handle binary files
+                        content_type = response.headers.get('Content-Type', '').lower()
+                        
+                        # Handle PDFs and other binary files
+                        if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
+                            # For PDFs, indicate that content is binary and not parsed
+                            result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
+                        else:
+                            try:
+                                # Try to decode as UTF-8 with replacements for non-UTF8 characters
+                                html = await response.text(errors='replace')
+                                soup = BeautifulSoup(html, _HTML_PARSER)
+                                result['raw_content'] = soup.get_text()
+                            except UnicodeDecodeError as ude:
+                                # Fallback if we still have decoding issues
+                                result['raw_content'] = f"[Could not decode content: {str(ude)}]"
+            except Exception as e:
+                print(f"Warning: Failed to fetch content for {url}: {str(e)}")
+                result['raw_content'] = f"[Error fetching content: {str(e)}]"
+            return result
     
-    async def search_single_query(query):
+    async def search_single_query(session, query):
         async with semaphore:
             try:
-                results = []
-                
-                # API-based search
                 if use_api:
-                    # The API returns up to 10 results per request
-                    for start_index in range(1, max_results + 1, 10):
-                        # Calculate how many results to request in this batch
-                        num = min(10, max_results - (start_index - 1))
-                        
-                        # Make request to Google Custom Search API
-                        params = {
-                            'q': query,
-                            'key': api_key,
-                            'cx': cx,
-                            'start': start_index,
-                            'num': num
-                        }
-                        print(f"Requesting {num} results for '{query}' from Google API...")
-
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
-                                if response.status != 200:
-                                    error_text = await response.text()
-                                    print(f"API error: {response.status}, {error_text}")
-                                    break
-                                    
-                                data = await response.json()
-                                
-                                # Process search results
-                                for item in data.get('items', []):
-                                    result = {
-                                        "title": item.get('title', ''),
-                                        "url": item.get('link', ''),
-                                        "content": item.get('snippet', ''),
-                                        "score": None,
-                                        "raw_content": item.get('snippet', '')
-                                    }
-                                    results.append(result)
-                        
-                        # Respect API quota with a small delay
-                        await asyncio.sleep(0.2)
-                        
-                        # If we didn't get a full page of results, no need to request more
-                        if not data.get('items') or len(data.get('items', [])) < num:
-                            break
-                
-                # Web scraping based search
+                    results = await search_api(session, query)
                 else:
-                    # Add delay between requests
-                    await asyncio.sleep(0.5 + random.random() * 1.5)
-                    print(f"Scraping Google for '{query}'...")
-
-                    # Define scraping function
-                    def google_search(query, max_results):
-                        try:
-                            lang = "en"
-                            safe = "active"
-                            start = 0
-                            fetched_results = 0
-                            fetched_links = set()
-                            search_results = []
-                            
-                            while fetched_results < max_results:
-                                # Send request to Google
-                                resp = requests.get(
-                                    url="https://www.google.com/search",
-                                    headers={
-                                        "User-Agent": get_useragent(),
-                                        "Accept": "*/*"
-                                    },
-                                    params={
-                                        "q": query,
-                                        "num": max_results + 2,
-                                        "hl": lang,
-                                        "start": start,
-                                        "safe": safe,
-                                    },
-                                    cookies = {
-                                        'CONSENT': 'PENDING+987',  # Bypasses the consent page
-                                        'SOCS': 'CAESHAgBEhIaAB',
-                                    }
-                                )
-                                resp.raise_for_status()
-                                
-                                # Parse results
-                                soup = BeautifulSoup(resp.text, "html.parser")
-                                result_block = soup.find_all("div", class_="ezO2md")
-                                new_results = 0
-                                
-                                for result in result_block:
-                                    link_tag = result.find("a", href=True)
-                                    title_tag = link_tag.find("span", class_="CVA68e") if link_tag else None
-                                    description_tag = result.find("span", class_="FrIlee")
-                                    
-                                    if link_tag and title_tag and description_tag:
-                                        link = unquote(link_tag["href"].split("&")[0].replace("/url?q=", ""))
-                                        
-                                        if link in fetched_links:
-                                            continue
-                                        
-                                        fetched_links.add(link)
-                                        title = title_tag.text
-                                        description = description_tag.text
-                                        
-                                        # Store result in the same format as the API results
-                                        search_results.append({
-                                            "title": title,
-                                            "url": link,
-                                            "content": description,
-                                            "score": None,
-                                            "raw_content": description
-                                        })
-                                        
-                                        fetched_results += 1
-                                        new_results += 1
-                                        
-                                        if fetched_results >= max_results:
-                                            break
-                                
-                                if new_results == 0:
-                                    break
-                                    
-                                start += 10
-                                time.sleep(1)  # Delay between pages
-                            
-                            return search_results
-                                
-                        except Exception as e:
-                            print(f"Error in Google search for '{query}': {str(e)}")
-                            return []
-                    
-                    # Execute search in thread pool
-                    loop = asyncio.get_running_loop()
-                    search_results = await loop.run_in_executor(
-                        executor, 
-                        lambda: google_search(query, max_results)
-                    )
-                    
-                    # Process the results
-                    results = search_results
+                    results = await search_scrape(session, query)
                 
                 # If requested, fetch full page content asynchronously (for both API and web scraping)
                 if include_raw_content and results:
                     content_semaphore = asyncio.Semaphore(3)
-                    
-                    async with aiohttp.ClientSession() as session:
-                        fetch_tasks = []
-                        
-                        async def fetch_full_content(result):
-                            async with content_semaphore:
-                                url = result['url']
-                                headers = {
-                                    'User-Agent': get_useragent(),
-                                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-                                }
-                                
-                                try:
-                                    await asyncio.sleep(0.2 + random.random() * 0.6)
-                                    async with session.get(url, headers=headers, timeout=10) as response:
-                                        if response.status == 200:
-                                            # Check content type to handle binary files
-                                            content_type = response.headers.get('Content-Type', '').lower()
-                                            
-                                            # Handle PDFs and other binary files
-                                            if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
-                                                # For PDFs, indicate that content is binary and not parsed
-                                                result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
-                                            else:
-                                                try:
-                                                    # Try to decode as UTF-8 with replacements for non-UTF8 characters
-                                                    html = await response.text(errors='replace')
-                                                    soup = BeautifulSoup(html, 'html.parser')
-                                                    result['raw_content'] = soup.get_text()
-                                                except UnicodeDecodeError as ude:
-                                                    # Fallback if we still have decoding issues
-                                                    result['raw_content'] = f"[Could not decode content: {str(ude)}]"
-                                except Exception as e:
-                                    print(f"Warning: Failed to fetch content for {url}: {str(e)}")
-                                    result['raw_content'] = f"[Error fetching content: {str(e)}]"
-                                return result
-                        
-                        for result in results:
-                            fetch_tasks.append(fetch_full_content(result))
-                        
-                        updated_results = await asyncio.gather(*fetch_tasks)
-                        results = updated_results
-                        print(f"Fetched full content for {len(results)} results")
+                    results = await asyncio.gather(*[fetch_full_content(session, content_semaphore, result) for result in results])
+                    print(f"Fetched full content for {len(results)} results")
                 
                 return {
                     "query": query,
@@ -1124,21 +1197,229 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                     "results": []
                 }
     
-    try:
-        # Create tasks for all search queries
-        search_tasks = [search_single_query(query) for query in search_queries]
-        
-        # Execute all searches concurrently
-        search_results = await asyncio.gather(*search_tasks)
-        
-        return search_results
-    finally:
-        # Only shut down executor if it was created
-        if executor:
-            executor.shutdown(wait=False)
+    # Reuse the loop's pooled session (and its open connections) across calls
+    session = await get_http_session()
+    # Execute all searches concurrently
+    return await asyncio.gather(*[search_single_query(session, query) for query in search_queries])
 
-async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict) -> str:
-    """Select and execute the appropriate search API.
+def search_fixture_key(query: str) -> str:
+    """Returns the stable file name stem under which responses for a query are recorded."""
+    return hashlib.sha256(query.strip().encode("utf-8")).hexdigest()[:32]
+
+def record_search_responses(record_dir: str, search_api: str, query_list: List[str], search_results: List[dict]):
+    """
+    Writes the raw responses of a real provider to a fixture directory, one JSON file per query.
+
+    The recorded files are what `replay_search_async` serves back, so a run recorded once against
+    any provider can be replayed offline.
+
+    Args:
+        record_dir (str): Directory to write fixtures into (created if missing)
+        search_api (str): The provider the responses came from
+        query_list (List[str]): The queries, in the same order as `search_results`
+        search_results (List[dict]): Raw responses, one per query
+    """
+    os.makedirs(record_dir, exist_ok=True)
+    for query, response in zip(query_list, search_results):
+        # Linkup responses do not echo the query back
+        response = {"query": query, **response}
+        fixture = {"query": query, "search_api": search_api, "response": response}
+        path = os.path.join(record_dir, f"{search_fixture_key(query)}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2, default=str)
+
+def provider_includes_raw_content(search_api: str) -> bool:
+    """Returns whether sources from a provider keep their full page content (Tavily's is too large)."""
+    return search_api != "tavily"
+
+def replay_latency_rng(seed: Optional[int], query: str) -> random.Random:
+    """
+    Returns the generator for the injected latency of one replayed query.
+
+    The generator is derived from the seed and the query, so a query gets the same latency in
+    every run regardless of call order, concurrency, or earlier runs in the same process.
+    Without a seed, latencies are not reproducible.
+    """
+    return random.Random(f"{seed}:{query}") if seed is not None else random.Random()
+
+def sample_replay_latency(latency_distribution: str = "none", latency_mean: float = 0.0,
+                          latency_std: float = 0.0, seed: Optional[int] = None,
+                          rng: Optional[random.Random] = None) -> float:
+    """
+    Samples an injected latency in seconds for a replayed search request.
+
+    Args:
+        latency_distribution (str): One of "none", "fixed", "uniform", "normal" or "lognormal".
+            "uniform" draws from [mean - std, mean + std]; "lognormal" uses the given mean and
+            std of the latency itself (not of its logarithm).
+        latency_mean (float): Mean latency in seconds
+        latency_std (float): Standard deviation (or half-width for "uniform") in seconds
+        seed (int, optional): Seed for reproducible sampling, used when `rng` is not given
+        rng (random.Random, optional): Generator to sample from
+
+    Returns:
+        float: A non-negative latency in seconds
+    """
+    if rng is None:
+        rng = random.Random(seed)
+
+    mean, std = float(latency_mean), float(latency_std)
+    if latency_distribution == "none":
+        return 0.0
+    elif latency_distribution == "fixed":
+        latency = mean
+    elif latency_distribution == "uniform":
+        latency = rng.uniform(mean - std, mean + std)
+    elif latency_distribution == "normal":
+        latency = rng.gauss(mean, std)
+    elif latency_distribution == "lognormal":
+        if mean <= 0:
+            return 0.0
+        # Convert the desired mean/std of the latency into the parameters of the underlying normal
+        sigma2 = math.log(1 + (std / mean) ** 2)
+        latency = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+    else:
+        raise ValueError(f"Unsupported latency distribution: {latency_distribution}")
+    return max(0.0, latency)
+
+@traceable
+async def replay_search_async(search_queries, fixture_dir: str = "search_fixtures",
+                              latency_distribution: str = "none", latency_mean: float = 0.0,
+                              latency_std: float = 0.0, seed: Optional[int] = None):
+    """
+    Serves recorded search responses from a fixture directory, without any network access.
+
+    Fixtures are written by `record_search_responses` (see the `search_record_dir` configuration).
+    Each query is served concurrently after an injected latency, so graph throughput and latency
+    can be benchmarked reproducibly offline. Responses are shaped like the recorded provider's
+    live results (Tavily's raw page content is dropped), so prompts and token counts match live runs.
+
+    Args:
+        search_queries (List[str]): List of search queries to process
+        fixture_dir (str): Directory containing the recorded fixtures
+        latency_distribution (str): Injected latency distribution, see `sample_replay_latency`
+        latency_mean (float): Mean injected latency in seconds
+        latency_std (float): Standard deviation of the injected latency in seconds
+        seed (int, optional): Seed for reproducible latency sampling
+
+    Returns:
+        List[dict]: The recorded responses, one per query. Queries without a fixture get an
+            empty result list and an `error` entry.
+    """
+    async def replay_single_query(query):
+        rng = replay_latency_rng(seed, query)
+        await asyncio.sleep(sample_replay_latency(latency_distribution, latency_mean, latency_std, rng=rng))
+        path = os.path.join(fixture_dir, f"{search_fixture_key(query)}.json")
+        if not os.path.exists(path):
+            print(f"No recorded search response for query '{query}' in {fixture_dir}")
+            return {
+                "query": query,
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": [],
+                "error": f"No recorded response for query: {query}"
+            }
+        with open(path, encoding="utf-8") as f:
+            fixture = json.load(f)
+        response = fixture["response"]
+        if provider_includes_raw_content(fixture.get("search_api", "")):
+            return response
+        return {**response, "results": [{**result, "raw_content": None} for result in response.get("results", [])]}
+
+    return await asyncio.gather(*[replay_single_query(query) for query in search_queries])
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker with half-open probing.
+
+    The breaker starts closed. After `failure_threshold` consecutive failed calls it opens and
+    rejects requests immediately instead of letting every query pay the provider's timeouts.
+    Once `recovery_timeout` seconds have passed it moves to half-open and lets exactly one probe
+    request through: a successful probe closes the breaker, a failed probe re-opens it.
+
+    Args:
+        name (str): The search API identifier the breaker protects
+        failure_threshold (int): Consecutive failures before the breaker opens
+        recovery_timeout (float): Seconds to stay open before allowing a probe request
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, recovery_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent to the provider right now."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        # Half-open: only a single probe request at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        """Close the breaker after a successful call."""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        """Count a failed call and open the breaker if needed."""
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"Circuit breaker for '{self.name}' opened after {self.consecutive_failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Release a half-open probe slot without recording an outcome (e.g. on cancellation)."""
+        self._probe_in_flight = False
+
+# Process-wide breakers, one per search API
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_circuit_breaker(search_api: str, failure_threshold: int = 3, recovery_timeout: float = 60.0) -> CircuitBreaker:
+    """
+    Returns the process-wide circuit breaker for a search API, creating it on first use.
+
+    Args:
+        search_api (str): The search API identifier (e.g., "exa", "tavily").
+        failure_threshold (int): Consecutive failures before the breaker opens.
+        recovery_timeout (float): Seconds to stay open before allowing a probe request.
+
+    Returns:
+        CircuitBreaker: The breaker for the given search API.
+    """
+    breaker = _circuit_breakers.get(search_api)
+    if breaker is None:
+        breaker = CircuitBreaker(search_api, failure_threshold, recovery_timeout)
+        _circuit_breakers[search_api] = breaker
+    else:
+        # Pick up the latest configured thresholds
+        breaker.failure_threshold = failure_threshold
+        breaker.recovery_timeout = recovery_timeout
+    return breaker
+
+SUPPORTED_SEARCH_APIS = ("tavily", "perplexity", "exa", "arxiv", "pubmed", "linkup", "duckduckgo", "googlesearch", "replay")
+
+async def execute_search_api(search_api: str, query_list: list[str], params_to_pass: dict) -> List[dict]:
+    """Run the queries against a single search API and return its raw responses.
     
     Args:
         search_api: Name of the search API to use
@@ -1146,34 +1427,350 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
         params_to_pass: Parameters to pass to the search API
         
     Returns:
-        Formatted string containing search results
+        List of search responses, one per query
         
     Raises:
         ValueError: If an unsupported search API is specified
     """
     if search_api == "tavily":
-        search_results = await tavily_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000, include_raw_content=False)
+        return await tavily_search_async(query_list, **params_to_pass)
     elif search_api == "perplexity":
-        search_results = perplexity_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return perplexity_search(query_list, **params_to_pass)
     elif search_api == "exa":
-        search_results = await exa_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return await exa_search(query_list, **params_to_pass)
     elif search_api == "arxiv":
-        search_results = await arxiv_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return await arxiv_search_async(query_list, **params_to_pass)
     elif search_api == "pubmed":
-        search_results = await pubmed_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return await pubmed_search_async(query_list, **params_to_pass)
     elif search_api == "linkup":
-        search_results = await linkup_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return await linkup_search(query_list, **params_to_pass)
     elif search_api == "duckduckgo":
-        search_results = await duckduckgo_search(query_list)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return await duckduckgo_search(query_list)
     elif search_api == "googlesearch":
-        search_results = await google_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
+        return await google_search_async(query_list, **params_to_pass)
+    elif search_api == "replay":
+        return await replay_search_async(query_list, **params_to_pass)
     else:
         raise ValueError(f"Unsupported search API: {search_api}")
+
+def is_failed_search_response(search_results: List[dict]) -> bool:
+    """
+    Returns True if every per-query response carries an error.
+
+    Several providers (Exa, arXiv, PubMed) swallow exceptions such as 429s into an `error`
+    field instead of raising, so a batch where all queries errored counts as a provider failure.
+    """
+    return bool(search_results) and all(isinstance(r, dict) and r.get("error") for r in search_results)
+
+def get_search_fallbacks(search_api_fallbacks: Optional[Union[str, List[str]]]) -> List[str]:
+    """
+    Normalizes the configured fallback chain into a list of search API identifiers.
+
+    Accepts a list, or a comma separated string as provided through environment variables.
+    """
+    if not search_api_fallbacks:
+        return []
+    if isinstance(search_api_fallbacks, str):
+        search_api_fallbacks = search_api_fallbacks.split(",")
+    return [get_config_value(api).strip() for api in search_api_fallbacks if get_config_value(api).strip()]
+
+async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                                    fallback_apis: Optional[List[str]] = None,
+                                    search_api_config: Optional[Dict[str, Any]] = None,
+                                    failure_threshold: int = 3,
+                                    recovery_timeout: float = 60.0,
+                                    record_dir: Optional[str] = None) -> List[Source]:
+    """Select and execute the appropriate search API.
+
+    Each provider is guarded by a circuit breaker. While the primary API is tripped (or when it
+    fails), the queries are routed to the next healthy API in `fallback_apis`, in order.
+    
+    Args:
+        search_api: Name of the search API to use
+        query_list: List of search queries to execute
+        params_to_pass: Parameters to pass to the search API
+        fallback_apis: Ordered list of search APIs to try when the primary is unavailable
+        search_api_config: Unfiltered search API config, used to build parameters for fallbacks
+        failure_threshold: Consecutive failures before a provider's breaker opens
+        recovery_timeout: Seconds before an open breaker lets a probe request through
+        record_dir: If set, raw responses from real providers are recorded here for replay
+        
+    Returns:
+        Deduplicated list of sources; format them with `format_sources` at prompt time
+        
+    Raises:
+        ValueError: If an unsupported search API is specified
+        Exception: The last provider exception, if a provider raised and none succeeded
+    """
+    chain = [search_api] + [api for api in get_search_fallbacks(fallback_apis) if api != search_api]
+    for api in chain:
+        if api not in SUPPORTED_SEARCH_APIS:
+            raise ValueError(f"Unsupported search API: {api}")
+
+    last_error = None
+    last_failed_results = None
+    for api in chain:
+        breaker = get_circuit_breaker(api, int(failure_threshold), float(recovery_timeout))
+        if not breaker.allow_request():
+            print(f"Circuit breaker for '{api}' is {breaker.state}, skipping provider")
+            continue
+
+        params = params_to_pass if api == search_api else get_search_params(api, search_api_config)
+        try:
+            search_results = await execute_search_api(api, query_list, params)
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            print(f"Search API '{api}' failed: {str(e)}")
+            breaker.record_failure()
+            last_error = e
+            continue
+
+        if is_failed_search_response(search_results):
+            print(f"Search API '{api}' returned errors for all queries")
+            breaker.record_failure()
+            last_failed_results = search_results
+            continue
+
+        breaker.record_success()
+        if record_dir and api != "replay":
+            record_search_responses(record_dir, api, query_list, search_results)
+        if api != search_api:
+            print(f"Served search from fallback provider '{api}'")
+        # Tavily raw content is too large to pass along in full (replay applies the recorded provider's rule)
+        return search_results_to_sources(search_results, include_raw_content=provider_includes_raw_content(api),
+                                         query_list=query_list)
+
+    if last_failed_results is not None:
+        return search_results_to_sources(last_failed_results, query_list=query_list)
+    if last_error is not None:
+        raise last_error
+    # Every breaker in the chain is open: skip the network and continue without sources,
+    # like providers that report errors instead of raising
+    print(f"No healthy search provider available (tried: {', '.join(chain)}), returning no sources")
+    return []
+
+async def execute_configured_search(configurable, query_list: list[str]) -> List[Source]:
+    """Run a search using the search settings of a `Configuration`.
+
+    Args:
+        configurable: The `Configuration` of the current run
+        query_list: List of search queries to execute
+
+    Returns:
+        Deduplicated list of sources
+    """
+    search_api = get_config_value(configurable.search_api)
+    search_api_config = configurable.search_api_config or {}  # Get the config dict, default to empty
+    params_to_pass = get_search_params(search_api, search_api_config)  # Filter parameters
+    return await select_and_execute_search(search_api, query_list, params_to_pass,
+                                           fallback_apis=configurable.search_api_fallbacks,
+                                           search_api_config=search_api_config,
+                                           failure_threshold=configurable.circuit_breaker_failure_threshold,
+                                           recovery_timeout=configurable.circuit_breaker_recovery_timeout,
+                                           record_dir=configurable.search_record_dir)
+
+_QUERY_NORMALIZE_PATTERN = re.compile(r"[\W_]+")
+
+def query_bigrams(query: str) -> set:
+    """Returns the character bigrams of a query after lowercasing and stripping whitespace/punctuation."""
+    text = _QUERY_NORMALIZE_PATTERN.sub("", query.lower())
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def cluster_similar_queries(queries: List[str], threshold: float = 0.8) -> List[int]:
+    """Greedily clusters near-duplicate queries by character-bigram Jaccard similarity.
+
+    Args:
+        queries: Queries to cluster
+        threshold: Minimum Jaccard similarity for a query to join an existing cluster
+
+    Returns:
+        List[int]: For each query, the index of its cluster representative
+            (the first query of the cluster)
+    """
+    representatives = []  # (index, bigrams)
+    assignment = []
+    for i, query in enumerate(queries):
+        bigrams = query_bigrams(query)
+        for rep_index, rep_bigrams in representatives:
+            union = bigrams | rep_bigrams
+            if union and len(bigrams & rep_bigrams) / len(union) >= threshold:
+                assignment.append(rep_index)
+                break
+        else:
+            representatives.append((i, bigrams))
+            assignment.append(i)
+    return assignment
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u9fff]+")
+# 中文虚词，作为词语之间的分隔处理
+_CJK_FUNCTION_CHARS = re.compile(r"[的了和与及或在是对等中为并其而之也把被从]")
+_STOP_WORDS = frozenset("""
+a an and are as at be but by can do does for from has have how in into is it its latest
+new of on or over recent that the their these this to top under using vs was what when
+where which who why will with
+""".split())
+
+def _normalize_term(term: str) -> str:
+    # 简单的英文复数归一
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+def text_terms(text: str) -> set:
+    """Returns the content terms of a text for relevance scoring.
+
+    English text is split into lowercase word tokens with stop words removed and plurals
+    folded; Chinese text (which has no word boundaries) is split at function characters
+    and each run contributes its character bigrams (or the single character).
+    """
+    terms = set()
+    for token in _TERM_PATTERN.findall(text.lower()):
+        if token.isascii():
+            if token not in _STOP_WORDS:
+                terms.add(_normalize_term(token))
+            continue
+        for run in _CJK_FUNCTION_CHARS.split(token):
+            if len(run) == 1:
+                terms.add(run)
+            else:
+                terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+def select_relevant_sources(sources: List[Source], query_list: List[str], min_relevance: float = 0.5,
+                            max_sources: Optional[int] = None) -> List[Source]:
+    """Selects the sources that cover at least one of the given queries.
+
+    The relevance of a source is, over all queries, the best fraction of a query's
+    content terms (see text_terms) that also occur in the source's title and content snippet.
+    Scoring works on words rather than characters, so a source only counts as relevant
+    when it mentions the query's actual subject.
+
+    Args:
+        sources: Candidate sources (with their text loaded)
+        query_list: Queries the sources should answer
+        min_relevance: Minimum relevance for a source to be selected
+        max_sources: Optional cap on the number of selected sources
+
+    Returns:
+        List[Source]: Selected sources, most relevant first
+    """
+    query_sets = [terms for terms in (text_terms(q) for q in query_list) if terms]
+    if not query_sets:
+        return []
+    scored = []
+    for source in sources:
+        source_terms = text_terms(f"{source.title} {source.content[:2000]}")
+        relevance = max(len(q & source_terms) / len(q) for q in query_sets)
+        if relevance >= min_relevance:
+            scored.append((relevance, source))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    selected = [source for _, source in scored]
+    return selected[:max_sources] if max_sources else selected
+
+_PARAGRAPH_SPLIT_PATTERN = re.compile(r"\n\s*\n")
+
+def split_paragraphs(text: str) -> List[str]:
+    """Splits section text into paragraphs separated by blank lines."""
+    return [p.strip() for p in _PARAGRAPH_SPLIT_PATTERN.split(text) if p.strip()]
+
+def number_paragraphs(paragraphs: List[str]) -> str:
+    """Formats paragraphs with [P<index>] markers so a model can reference them in edits."""
+    return "\n\n".join(f"[P{i}] {paragraph}" for i, paragraph in enumerate(paragraphs))
+
+def apply_paragraph_edits(paragraphs: List[str], edits: List[ParagraphEdit]) -> tuple[str, int]:
+    """Applies paragraph-level edits to a section.
+
+    All indices refer to the original paragraphs, so edits do not shift each other.
+    Edits with an out-of-range index, or a replace/insert without content, are skipped.
+    When several replace/delete edits target the same paragraph, only the last one
+    takes effect and only it is counted.
+
+    Args:
+        paragraphs: Original paragraphs of the section
+        edits: Edits to apply
+
+    Returns:
+        tuple[str, int]: The revised section text and the number of edits applied
+    """
+    replacements = {}
+    deletions = set()
+    insertions = {}
+    for edit in edits:
+        index = edit.paragraph_index
+        content = edit.content.strip()
+        if edit.operation == "insert_after" and -1 <= index < len(paragraphs) and content:
+            insertions.setdefault(index, []).append(content)
+        elif edit.operation == "replace" and 0 <= index < len(paragraphs) and content:
+            replacements[index] = content
+            deletions.discard(index)
+        elif edit.operation == "delete" and 0 <= index < len(paragraphs):
+            deletions.add(index)
+            replacements.pop(index, None)
+
+    applied = len(replacements) + len(deletions) + sum(len(contents) for contents in insertions.values())
+    revised = list(insertions.get(-1, []))
+    for i, paragraph in enumerate(paragraphs):
+        if i not in deletions:
+            revised.append(replacements.get(i, paragraph))
+        revised.extend(insertions.get(i, []))
+    return "\n\n".join(revised), applied
+
+_REFERENCES_HEADING = "### 参考文献"
+_REFERENCE_LINE_PATTERN = re.compile(r"^\[(\d+)\](.*)$")
+_REFERENCE_URL_PATTERN = re.compile(r"https?://\S+")
+_CITATION_PATTERN = re.compile(r"\[(\d+(?:\s*[,，、]\s*\d+)*)\]")
+_CITATION_SEPARATOR_PATTERN = re.compile(r"(\s*[,，、]\s*)")
+
+def renumber_citations(contents: List[str]) -> tuple[List[str], List[str]]:
+    """Merges the per-section reference lists of a report into one numbered list.
+
+    Each section numbers its citations independently and ends with a "### 参考文献"
+    list. References are deduplicated across sections by URL (or by their text when
+    they have no URL) and numbered in order of first appearance. In-text citations
+    such as [3] or [1, 2] are then rewritten in a single regex pass per section,
+    using that section's own old-to-new mapping, so chained renumberings
+    (1→2, 2→3) cannot corrupt each other. Citations without a matching reference
+    are left as they are.
+
+    Args:
+        contents: Section texts in report order
+
+    Returns:
+        tuple[List[str], List[str]]: The section texts without their reference lists,
+            and the merged reference lines
+    """
+    references = []
+    number_by_key = {}
+    section_texts = []
+    for content in contents:
+        if _REFERENCES_HEADING not in content:
+            section_texts.append(content)
+            continue
+        main_content, refs_text = content.split(_REFERENCES_HEADING, 1)
+        section_map = {}
+        for line in refs_text.splitlines():
+            match = _REFERENCE_LINE_PATTERN.match(line.strip())
+            if not match:
+                continue
+            old_number, rest = match.groups()
+            url = _REFERENCE_URL_PATTERN.search(rest)
+            key = url.group(0).rstrip(".,;，。；)）") if url else rest.strip(" :：")
+            if not key:
+                continue
+            if key not in number_by_key:
+                number_by_key[key] = str(len(references) + 1)
+                references.append(f"[{number_by_key[key]}]{rest}")
+            section_map.setdefault(old_number, number_by_key[key])
+
+        def rewrite(match, section_map=section_map):
+            parts = _CITATION_SEPARATOR_PATTERN.split(match.group(1))
+            return "[" + "".join(section_map.get(part, part) for part in parts) + "]"
+
+        section_texts.append(_CITATION_PATTERN.sub(rewrite, main_content).rstrip())
+    return section_texts, references
@@ -0,0 +1,68 @@
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+import open_deep_research.graph as graph_module
+from open_deep_research.configuration import Configuration
+from open_deep_research.state import BatchQueries, SearchQuery, Section, SectionQueries
+
+SECTIONS = [Section(name=name, description=name, research=True) for name in ("方法", "结果", "讨论")]
+
+
+def _queries(*texts):
+    return [SearchQuery(search_query=text) for text in texts]
+
+
+def _patch(monkeypatch, batch):
+    prompts, fallback_sections = [], []
+
+    def fake_structured_model(model, provider, schema, **kwargs):
+        assert schema is BatchQueries
+        return RunnableLambda(lambda messages: prompts.append(messages) or batch)
+
+    async def fake_section_queries(topic, section, configurable):
+        fallback_sections.append(section.name)
+        return _queries(f"{section.name} fallback")
+
+    monkeypatch.setattr(graph_module, "get_structured_model", fake_structured_model)
+    monkeypatch.setattr(graph_module, "_generate_section_queries", fake_section_queries)
+    return prompts, fallback_sections
+
+
+def _generate(sections, **configurable):
+    return asyncio.run(graph_module._generate_batch_queries("测试主题", sections, Configuration(**configurable)))
+
+
+def test_batch_results_are_mapped_by_section_index(monkeypatch):
+    batch = BatchQueries(sections=[
+        SectionQueries(section_index=2, queries=_queries("讨论 q")),
+        SectionQueries(section_index=0, queries=_queries("方法 q1", "方法 q2")),
+        SectionQueries(section_index=1, queries=_queries("结果 q")),
+    ])
+    prompts, fallback_sections = _patch(monkeypatch, batch)
+    result = _generate(SECTIONS)
+    assert [[q.search_query for q in queries] for queries in result] == [["方法 q1", "方法 q2"], ["结果 q"], ["讨论 q"]]
+    assert len(prompts) == 1
+    assert fallback_sections == []
+
+
+def test_missing_or_out_of_range_sections_fall_back_to_per_section_generation(monkeypatch):
+    batch = BatchQueries(sections=[
+        SectionQueries(section_index=0, queries=_queries("方法 q")),
+        SectionQueries(section_index=1, queries=[]),
+        SectionQueries(section_index=7, queries=_queries("越界")),
+        SectionQueries(section_index=-1, queries=_queries("越界")),
+    ])
+    _, fallback_sections = _patch(monkeypatch, batch)
+    result = _generate(SECTIONS)
+    assert [[q.search_query for q in queries] for queries in result] == [["方法 q"], ["结果 fallback"], ["讨论 fallback"]]
+    assert fallback_sections == ["结果", "讨论"]
+
+
+def test_sections_are_split_into_batches(monkeypatch):
+    batch = BatchQueries(sections=[SectionQueries(section_index=0, queries=_queries("q"))])
+    prompts, fallback_sections = _patch(monkeypatch, batch)
+    result = _generate(SECTIONS, query_batch_size=1)
+    assert len(prompts) == 3
+    assert [[q.search_query for q in queries] for queries in result] == [["q"], ["q"], ["q"]]
+    assert fallback_sections == []
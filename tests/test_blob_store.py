@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from open_deep_research.blob_store import (
+    BlobStore,
+    is_blob_ref,
+    load_section,
+    load_sources,
+    load_text,
+    store_section,
+    store_sources,
+    store_text,
+)
+from open_deep_research.configuration import Configuration
+from open_deep_research.state import Section, Source
+
+LARGE = "检查点中的大段网页内容。" * 400
+
+
+def test_identical_text_is_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    ref = store.put(LARGE)
+    assert store.put(LARGE) == ref
+    assert is_blob_ref(ref)
+    assert store.get(ref) == LARGE
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 1
+
+
+def test_missing_blob_raises_key_error(tmp_path):
+    with pytest.raises(KeyError):
+        BlobStore(str(tmp_path)).get("blob:sha256:" + "0" * 64)
+
+
+def test_only_large_text_is_replaced_by_a_reference(tmp_path):
+    configurable = Configuration(blob_store_path=str(tmp_path), blob_min_size=1024)
+    assert store_text("短文本", configurable) == "短文本"
+    ref = store_text(LARGE, configurable)
+    assert is_blob_ref(ref)
+    assert store_text(ref, configurable) == ref
+    assert load_text(ref, configurable) == LARGE
+    assert store_text(LARGE, Configuration()) == LARGE
+
+
+def test_reference_without_blob_store_path_is_an_error(tmp_path):
+    ref = store_text(LARGE, Configuration(blob_store_path=str(tmp_path)))
+    with pytest.raises(ValueError):
+        load_text(ref, Configuration())
+
+
+def test_sources_and_sections_round_trip(tmp_path):
+    configurable = Configuration(blob_store_path=str(tmp_path))
+    source = Source(id="a", title="A", content=LARGE, raw_content=LARGE + "全文")
+    section = Section(name="方法", description="d", research=True, content=LARGE)
+
+    stored_source, = store_sources([source], configurable)
+    stored_section = store_section(section, configurable)
+    assert is_blob_ref(stored_source.content) and is_blob_ref(stored_source.raw_content)
+    assert is_blob_ref(stored_section.content)
+    assert load_sources([stored_source], configurable) == [source]
+    assert load_section(stored_section, configurable) == section
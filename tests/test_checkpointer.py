@@ -0,0 +1,103 @@
+import asyncio
+import operator
+from typing import Annotated, List
+
+import pytest
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
+from typing_extensions import TypedDict
+
+from open_deep_research.checkpointer import SQLiteCheckpointSaver
+
+THREAD = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+
+
+def _version(step):
+    return f"{step:032}.0"
+
+
+def _checkpoint(values, step):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = {channel: _version(step) for channel in values}
+    return create_checkpoint(checkpoint, None, step)
+
+
+def test_put_get_list_and_put_writes_round_trip(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "ck.db"))
+    big_text = "章节内容" * 500
+
+    first = _checkpoint({"topic": "测试主题", "report": big_text}, 1)
+    first_config = saver.put(THREAD, first, {"source": "loop", "step": 1}, first["channel_versions"])
+    second = _checkpoint({"topic": "测试主题", "report": big_text, "final": "done"}, 2)
+    second["channel_versions"] = {**first["channel_versions"], "final": _version(2)}
+    second_config = saver.put(first_config, second, {"source": "loop", "step": 2}, {"final": _version(2)})
+    saver.put_writes(second_config, [("sections", ["引言"]), ("sections", ["方法"])], task_id="task-1")
+
+    # 重新打开数据库，模拟进程重启后读取
+    reopened = SQLiteCheckpointSaver(str(tmp_path / "ck.db"))
+    latest = reopened.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert latest.checkpoint["id"] == second["id"]
+    assert latest.checkpoint["channel_values"] == {"topic": "测试主题", "report": big_text, "final": "done"}
+    assert latest.metadata["step"] == 2
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["id"]
+    assert [(task, channel, value) for task, channel, value in latest.pending_writes] == [
+        ("task-1", "sections", ["引言"]), ("task-1", "sections", ["方法"])
+    ]
+
+    older = reopened.get_tuple(first_config)
+    assert older.checkpoint["channel_values"] == {"topic": "测试主题", "report": big_text}
+    assert [t.checkpoint["id"] for t in reopened.list({"configurable": {"thread_id": "t1"}})] == [second["id"], first["id"]]
+    assert [t.checkpoint["id"] for t in reopened.list(None, filter={"step": 1})] == [first["id"]]
+
+    reopened.delete_thread("t1")
+    assert reopened.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+
+
+def test_large_values_are_compressed(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "ck.db"))
+    type_, data = saver._dumps("章节内容" * 500)
+    assert type_.endswith("+zlib")
+    assert len(data) < len("章节内容" * 500)
+    assert saver._loads(type_, data) == "章节内容" * 500
+
+
+class RunState(TypedDict):
+    sections: List[str]
+    completed: Annotated[list, operator.add]
+
+
+def _build_graph(runs, fail):
+    def write_section(state):
+        runs.append(state["name"])
+        if state["name"] == "结果" and fail["on"]:
+            raise RuntimeError("simulated crash")
+        return {"completed": [state["name"]]}
+
+    builder = StateGraph(RunState)
+    builder.add_node("write_section", write_section)
+    builder.add_conditional_edges(
+        START, lambda state: [Send("write_section", {"name": name}) for name in state["sections"]], ["write_section"]
+    )
+    builder.add_edge("write_section", END)
+    return builder
+
+
+def test_run_resumes_from_checkpoint_without_rerunning_completed_sections(tmp_path):
+    db = str(tmp_path / "ck.db")
+    runs, fail = [], {"on": True}
+    config = {"configurable": {"thread_id": "run-1"}}
+
+    graph = _build_graph(runs, fail).compile(checkpointer=SQLiteCheckpointSaver(db))
+    with pytest.raises(RuntimeError):
+        asyncio.run(graph.ainvoke({"sections": ["引言", "方法", "结果"], "completed": []}, config))
+    assert sorted(runs) == ["引言", "方法", "结果"]
+
+    # 新的进程：重新打开检查点数据库，用None作为输入继续运行
+    fail["on"] = False
+    runs.clear()
+    resumed = _build_graph(runs, fail).compile(checkpointer=SQLiteCheckpointSaver(db))
+    result = asyncio.run(resumed.ainvoke(None, config))
+    assert runs == ["结果"]
+    assert sorted(result["completed"]) == ["引言", "方法", "结果"]
@@ -0,0 +1,28 @@
+from open_deep_research.utils import renumber_citations
+
+
+def test_references_are_merged_by_url_in_order_of_first_appearance():
+    sections = [
+        "方法见[1]和[2]。\n\n### 参考文献\n[1]: A https://a.com\n[2]: B https://b.com",
+        "结果见[1]，对比[2, 1]。\n\n### 参考文献\n[1]: C https://c.com\n[2]: A again https://a.com.",
+    ]
+    texts, references = renumber_citations(sections)
+    assert texts == ["方法见[1]和[2]。", "结果见[3]，对比[1, 3]。"]
+    assert references == ["[1]: A https://a.com", "[2]: B https://b.com", "[3]: C https://c.com"]
+
+
+def test_chained_renumbering_does_not_cascade():
+    sections = [
+        "[1]\n### 参考文献\n[1]: X https://x.com",
+        "先[1]后[2]。\n### 参考文献\n[1]: Y https://y.com\n[2]: Z https://z.com",
+    ]
+    texts, _ = renumber_citations(sections)
+    # 1→2、2→3必须在一次替换中完成，不能把[1]先变成[2]再变成[3]
+    assert texts[1] == "先[2]后[3]。"
+
+
+def test_sections_without_references_and_unknown_citations_are_kept():
+    sections = ["引言没有引用。", "见[4]和[1]。\n### 参考文献\n[1]: 无链接的文献"]
+    texts, references = renumber_citations(sections)
+    assert texts == ["引言没有引用。", "见[4]和[1]。"]
+    assert references == ["[1]: 无链接的文献"]
@@ -0,0 +1,91 @@
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END
+
+import open_deep_research.graph as graph_module
+from open_deep_research.configuration import Configuration
+from open_deep_research.state import (
+    CombinedSectionEvaluation,
+    ContentEvaluation,
+    SearchQuery,
+    Section,
+)
+
+
+def _result(grade, score, follow_up=()):
+    return CombinedSectionEvaluation(
+        grade=grade,
+        follow_up_queries=[SearchQuery(search_query=text) for text in follow_up],
+        evaluation=ContentEvaluation(
+            total_score=score, dimension_scores={}, strengths=["清晰"], weaknesses=[],
+            improvement_suggestions=[], missing_content=[], overall_assessment="良好"
+        )
+    )
+
+
+def _patch(monkeypatch, result):
+    concluded = []
+    conclude = graph_module._conclude_section_evaluation
+
+    def fake_structured_model(model, provider, schema, **kwargs):
+        assert schema is CombinedSectionEvaluation
+        return RunnableLambda(lambda messages: result)
+
+    def spy_conclude(state, section, configurable, section_tokens, forced_decision=None):
+        concluded.append(section.name)
+        return conclude(state, section, configurable, section_tokens, forced_decision)
+
+    monkeypatch.setattr(graph_module, "get_structured_model", fake_structured_model)
+    monkeypatch.setattr(graph_module, "_conclude_section_evaluation", spy_conclude)
+    return concluded
+
+
+def _grade(search_iterations, **configurable):
+    section = Section(name="方法", description="研究方法", content="章节正文")
+    state = {"topic": "测试主题", "section": section, "search_iterations": search_iterations}
+    config = {"configurable": {"combined_section_evaluation": True, **configurable}}
+    budget_update = {"section_tokens": 0, "section_started_at": None}
+    return asyncio.run(graph_module._grade_and_evaluate_section(
+        state, config, section, Configuration.from_runnable_config(config), budget_update
+    ))
+
+
+def test_fail_below_max_search_depth_routes_to_follow_up_search(monkeypatch):
+    concluded = _patch(monkeypatch, _result("fail", 60, follow_up=["补充查询"]))
+    command = _grade(0, max_search_depth=2)
+    assert command.goto == "evaluate_query_source"
+    assert [q.search_query for q in command.update["search_queries"]] == ["补充查询"]
+    assert command.update["section"].evaluation.total_score == 60
+    # 还需补充搜索时不做修改决策
+    assert concluded == []
+
+
+def test_fail_follow_up_search_respects_speculative_search(monkeypatch):
+    _patch(monkeypatch, _result("fail", 60, follow_up=["补充查询"]))
+    command = _grade(0, max_search_depth=2, speculative_search=True)
+    assert command.goto == "speculative_search"
+
+
+def test_pass_concludes_with_the_combined_evaluation(monkeypatch):
+    concluded = _patch(monkeypatch, _result("pass", 90))
+    command = _grade(0, max_search_depth=2)
+    assert concluded == ["方法"]
+    # 总分达到revision_threshold，直接完成章节
+    assert command.goto == END
+    assert command.update["completed_sections"][0].evaluation.total_score == 90
+
+
+def test_pass_below_threshold_goes_to_revision(monkeypatch):
+    concluded = _patch(monkeypatch, _result("pass", 60))
+    command = _grade(0, max_search_depth=2)
+    assert concluded == ["方法"]
+    assert command.goto == "revise_section_content"
+    assert command.update["score_history"] == [60]
+
+
+def test_fail_at_max_search_depth_concludes_instead_of_searching(monkeypatch):
+    concluded = _patch(monkeypatch, _result("fail", 60, follow_up=["补充查询"]))
+    command = _grade(2, max_search_depth=2)
+    assert concluded == ["方法"]
+    assert command.goto == "revise_section_content"
@@ -0,0 +1,42 @@
+import asyncio
+
+from open_deep_research.utils import get_http_session, parse_google_results
+
+RESULTS_PAGE = """
+<html><body>
+<div class="ezO2md">
+  <a href="/url?q=https://example.com/a%20page&amp;sa=U"><span class="CVA68e">First title</span></a>
+  <span class="FrIlee">First description</span>
+</div>
+<div class="ezO2md"><a href="/url?q=https://example.com/no-description"><span class="CVA68e">No description</span></a></div>
+<div class="unrelated"><span class="FrIlee">Not a result</span></div>
+<div class="ezO2md">
+  <a href="https://example.com/second"><span class="CVA68e">Second title</span></a>
+  <span class="FrIlee">Second description</span>
+</div>
+</body></html>
+"""
+
+
+def test_parse_google_results_extracts_complete_results_in_order():
+    assert parse_google_results(RESULTS_PAGE) == [
+        {"title": "First title", "url": "https://example.com/a page", "content": "First description"},
+        {"title": "Second title", "url": "https://example.com/second", "content": "Second description"},
+    ]
+
+
+def test_parse_google_results_handles_pages_without_results():
+    assert parse_google_results("<html><body><p>captcha</p></body></html>") == []
+
+
+def test_http_session_is_pooled_per_event_loop_and_closed_with_it():
+    async def get_twice():
+        first = await get_http_session()
+        second = await get_http_session()
+        assert first is second
+        return first
+
+    session = asyncio.run(get_twice())
+    assert session.closed
+    other = asyncio.run(get_twice())
+    assert other is not session
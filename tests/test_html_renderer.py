@@ -0,0 +1,54 @@
+from open_deep_research.html_renderer import render_markdown, render_report_html
+
+REPORT = """# 深度学习综述
+
+## 引言
+
+深度学习**显著**提升了*图像识别*的效果[1, 2]，见`torch.nn`。
+
+- 卷积网络
+- 循环网络
+
+| 模型 | 年份 |
+| --- | --- |
+| ResNet | 2015 |
+
+```python
+print("<b>")
+```
+
+## 参考文献
+
+[1]: ResNet https://arxiv.org/abs/1512.03385
+[2]: [Transformer](https://arxiv.org/abs/1706.03762)
+"""
+
+
+def test_render_markdown_builds_body_toc_and_title():
+    body, toc, title = render_markdown(REPORT)
+    assert title == "深度学习综述"
+    assert [text for _, text in toc] == ["引言", "参考文献"]
+    assert '<h2 id="section-2">引言</h2>' in body
+    assert "<strong>显著</strong>" in body and "<em>图像识别</em>" in body
+    assert "<code>torch.nn</code>" in body
+    assert "<ul><li>卷积网络</li><li>循环网络</li></ul>" in body
+    assert "<thead><tr><th>模型</th><th>年份</th></tr></thead>" in body
+    assert '<pre><code class="language-python">print(&quot;&lt;b&gt;&quot;)</code></pre>' in body
+
+
+def test_citations_link_to_numbered_references():
+    body, _, _ = render_markdown(REPORT)
+    assert '<sup class="cite">[<a href="#ref-1">1</a>, <a href="#ref-2">2</a>]</sup>' in body
+    assert '<li id="ref-1" value="1">ResNet <a href="https://arxiv.org/abs/1512.03385"' in body
+    assert '<li id="ref-2" value="2"><a href="https://arxiv.org/abs/1706.03762" target="_blank" rel="noopener">Transformer</a></li>' in body
+
+
+def test_raw_html_is_escaped():
+    body, _, _ = render_markdown("正文<script>alert(1)</script>")
+    assert body == "<p>正文&lt;script&gt;alert(1)&lt;/script&gt;</p>"
+
+
+def test_render_report_html_is_deterministic_apart_from_timestamp():
+    page = render_report_html("## 章节\n\n正文", topic="测试主题")
+    assert "<title>测试主题</title>" in page
+    assert page.split("<footer>")[0] == render_report_html("## 章节\n\n正文", topic="测试主题").split("<footer>")[0]
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import Generation
+
+from open_deep_research import llm_cache as llm_cache_module
+from open_deep_research.llm_cache import SQLiteLLMCache
+
+LLM = "model=test"
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds text as keyword counts, so prompts sharing their keywords are near-identical."""
+
+    vocabulary = ["transformer", "attention", "protein", "folding", "kubernetes"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        text = text.lower()
+        return [float(text.count(word)) for word in self.vocabulary] + [0.01]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def _value(text):
+    return [Generation(text=text)]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteLLMCache(str(tmp_path / "cache.db"), embeddings=KeywordEmbeddings(), semantic_threshold=0.95)
+
+
+def test_exact_hit_and_miss(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.db"))
+    assert cache.lookup("prompt", LLM) is None
+    cache.update("prompt", LLM, _value("answer"))
+    assert cache.lookup("prompt", LLM)[0].text == "answer"
+    assert cache.lookup("prompt", "model=other") is None
+
+
+def test_semantic_hit_for_similar_prompt_only(cache):
+    cache.update("explain transformer attention", LLM, _value("attention answer"))
+    assert cache.lookup("please explain the transformer attention", LLM)[0].text == "attention answer"
+    assert cache.lookup("explain protein folding", LLM) is None
+    # 语义匹配只在相同的llm_string下进行
+    assert cache.lookup("please explain the transformer attention", "model=other") is None
+
+
+def test_pending_embeddings_are_reused_and_do_not_leak(cache, monkeypatch):
+    assert cache.lookup("explain protein folding", LLM) is None
+    calls = cache.embeddings.calls
+    cache.update("explain protein folding", LLM, _value("folding answer"))
+    # update复用了lookup时计算的嵌入
+    assert cache.embeddings.calls == calls
+    assert cache.lookup("protein folding explained", LLM)[0].text == "folding answer"
+    assert not cache._pending_embeddings
+
+    # 调用失败时没有update，保留的嵌入数量有上限
+    monkeypatch.setattr(llm_cache_module, "_MAX_PENDING_EMBEDDINGS", 3)
+    for i in range(10):
+        cache.lookup(f"kubernetes question {i}", "model=failing")
+    assert len(cache._pending_embeddings) == 3
+
+
+def test_evicted_entries_are_dropped_from_the_index(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.db"), max_entries=1,
+                           embeddings=KeywordEmbeddings(), semantic_threshold=0.95)
+    cache.update("transformer attention", LLM, _value("old"))
+    assert cache.lookup("transformer attention!", LLM)[0].text == "old"
+    cache.update("kubernetes", LLM, _value("new"))
+    assert cache.lookup("transformer attention!", LLM) is None
+    assert cache._indexes[cache._hash(LLM)].keys == [cache._key("kubernetes", LLM)]
+
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.db"), ttl_seconds=10)
+    now = 1000.0
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now)
+    cache.update("prompt", LLM, _value("answer"))
+    now += 11
+    assert cache.lookup("prompt", LLM) is None
+
+
+def test_async_lookup_and_update(cache):
+    async def run():
+        assert await cache.alookup("explain transformer attention", LLM) is None
+        await cache.aupdate("explain transformer attention", LLM, _value("async answer"))
+        exact = await cache.alookup("explain transformer attention", LLM)
+        similar = await cache.alookup("transformer attention, explained", LLM)
+        return exact, similar
+
+    exact, similar = asyncio.run(run())
+    assert exact[0].text == similar[0].text == "async answer"
+    metrics = cache.get_metrics()["unknown"]
+    assert (metrics["hits"], metrics["semantic_hits"], metrics["misses"]) == (1, 1, 1)
+
+
+def test_index_is_loaded_from_an_existing_database(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteLLMCache(path, embeddings=KeywordEmbeddings(), semantic_threshold=0.95).update(
+        "transformer attention", LLM, _value("persisted"))
+    reopened = SQLiteLLMCache(path, embeddings=KeywordEmbeddings(), semantic_threshold=0.95)
+    assert reopened.lookup("attention in the transformer", LLM)[0].text == "persisted"
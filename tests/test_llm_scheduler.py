@@ -0,0 +1,107 @@
+import asyncio
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from open_deep_research import llm_scheduler
+from open_deep_research.llm_cache import SQLiteLLMCache
+from open_deep_research.llm_scheduler import (
+    PRIORITY_CRITICAL,
+    PRIORITY_LOW,
+    LLMScheduler,
+    get_llm_scheduler,
+    is_llm_cache_hit,
+    scheduled_ainvoke,
+    scheduled_astream,
+)
+from open_deep_research.prompt_cache import get_prompt_cache_metrics
+
+PROVIDER = "test-cached-provider"
+
+
+class EchoModel(BaseChatModel):
+    """Answers with the last message and counts provider calls."""
+
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "echo"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        message = AIMessage(
+            content=f"echo: {messages[-1].content}",
+            usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12,
+                            "input_token_details": {"cache_read": 4}},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def test_cache_hit_skips_the_rate_limited_slot(tmp_path):
+    model = EchoModel(cache=SQLiteLLMCache(str(tmp_path / "cache.db"))).bind(stop=["\n\n"])
+    messages = [HumanMessage(content="hello")]
+    scheduler = get_llm_scheduler()
+    scheduler.configure({PROVIDER: {"max_in_flight": 1}})
+
+    async def main():
+        assert not is_llm_cache_hit(model, messages)
+        first = await scheduled_ainvoke(model, messages, PROVIDER)
+        assert is_llm_cache_hit(model, messages)
+        # 占用唯一的执行许可，命中缓存的调用仍然可以立即完成
+        ticket = await scheduler.acquire(PROVIDER)
+        try:
+            second = await asyncio.wait_for(scheduled_ainvoke(model, messages, PROVIDER), timeout=2)
+        finally:
+            scheduler.release(ticket)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first.content == second.content == "echo: hello"
+    assert model.bound.calls == 1
+    assert not is_llm_cache_hit(model, [HumanMessage(content="other")])
+
+
+def test_queued_calls_are_released_by_priority():
+    scheduler = LLMScheduler()
+    scheduler.configure({"p": {"max_in_flight": 1}})
+    order = []
+
+    async def call(name, priority):
+        async with scheduler.slot("p", priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def main():
+        ticket = await scheduler.acquire("p")
+        tasks = [asyncio.create_task(call("revision", PRIORITY_LOW)),
+                 asyncio.create_task(call("final", PRIORITY_CRITICAL))]
+        await asyncio.sleep(0.01)
+        assert scheduler.get_stats()["p"]["queued"] == 2
+        scheduler.release(ticket)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["final", "revision"]
+
+
+def test_llm_cache_responses_are_not_recorded_as_provider_calls(tmp_path, monkeypatch):
+    model = EchoModel(cache=SQLiteLLMCache(str(tmp_path / "cache.db")))
+    messages = [HumanMessage(content="stream me")]
+    # 模拟调用前的探测未命中、模型查找时才命中（如语义命中）的情况
+    monkeypatch.setattr(llm_scheduler, "is_llm_cache_hit", lambda runnable, input: False)
+
+    def recorded_calls():
+        return get_prompt_cache_metrics().get("unknown", {}).get("calls", 0)
+
+    async def stream():
+        return [chunk async for chunk in scheduled_astream(model, messages, PROVIDER)]
+
+    before = recorded_calls()
+    first = asyncio.run(stream())
+    assert recorded_calls() == before + 1
+    second = asyncio.run(stream())
+    assert recorded_calls() == before + 1
+    assert model.calls == 1
+    assert second[0].content == first[0].content
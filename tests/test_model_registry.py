@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from open_deep_research import model_registry
+from open_deep_research.model_registry import clear_model_registry, get_chat_model
+
+
+class FakeModel:
+    def with_structured_output(self, schema):
+        return ("structured", self, schema)
+
+
+@pytest.fixture
+def created(monkeypatch):
+    models = []
+
+    def fake_init_chat_model(**kwargs):
+        models.append(FakeModel())
+        return models[-1]
+
+    monkeypatch.setattr(model_registry, "init_chat_model", fake_init_chat_model)
+    clear_model_registry()
+    yield models
+    clear_model_registry()
+
+
+def test_models_are_shared_within_an_event_loop(created):
+    async def main():
+        first = get_chat_model("gpt-4o", "openai", temperature=0)
+        assert get_chat_model("gpt-4o", "openai", temperature=0) is first
+        assert get_chat_model("gpt-4o", "openai") is not first
+        # 线程池中的同步调用没有运行中的事件循环，使用同步调用共用的缓存
+        return await asyncio.to_thread(get_chat_model, "gpt-4o", "openai", temperature=0)
+
+    from_thread = asyncio.run(main())
+    assert get_chat_model("gpt-4o", "openai", temperature=0) is from_thread
+    assert len(created) == 3
+
+
+def test_each_event_loop_gets_its_own_clients(created):
+    async def main():
+        chat = get_chat_model("gpt-4o", "openai")
+        structured = model_registry.get_structured_model("gpt-4o", "openai", dict)
+        assert structured[1] is chat
+        assert model_registry.get_structured_model("gpt-4o", "openai", dict) is structured
+        return chat
+
+    assert asyncio.run(main()) is not asyncio.run(main())
+    assert len(created) == 2
@@ -0,0 +1,40 @@
+from open_deep_research.state import ParagraphEdit
+from open_deep_research.utils import apply_paragraph_edits
+
+PARAGRAPHS = ["第一段", "第二段", "第三段"]
+
+
+def _edit(operation, index, content=""):
+    return ParagraphEdit(operation=operation, paragraph_index=index, content=content)
+
+
+def test_edits_use_original_indices():
+    revised, applied = apply_paragraph_edits(PARAGRAPHS, [
+        _edit("insert_after", -1, "开头"),
+        _edit("delete", 0),
+        _edit("replace", 2, "新的第三段"),
+        _edit("insert_after", 1, "插入段"),
+    ])
+    assert revised.split("\n\n") == ["开头", "第二段", "插入段", "新的第三段"]
+    assert applied == 4
+
+
+def test_duplicate_edits_for_a_paragraph_count_once():
+    revised, applied = apply_paragraph_edits(PARAGRAPHS, [
+        _edit("replace", 1, "草稿"),
+        _edit("replace", 1, "定稿"),
+        _edit("delete", 2),
+        _edit("replace", 2, "保留第三段"),
+    ])
+    assert revised.split("\n\n") == ["第一段", "定稿", "保留第三段"]
+    assert applied == 2
+
+
+def test_invalid_edits_are_skipped():
+    revised, applied = apply_paragraph_edits(PARAGRAPHS, [
+        _edit("replace", 5, "越界"),
+        _edit("replace", 0, "   "),
+        _edit("insert_after", -2, "越界"),
+    ])
+    assert revised.split("\n\n") == PARAGRAPHS
+    assert applied == 0
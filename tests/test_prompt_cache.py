@@ -0,0 +1,34 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from open_deep_research.prompt_cache import build_prompt_messages, cached_input_tokens
+
+
+def test_static_instructions_come_first_and_shared_inputs_before_section_inputs():
+    messages = build_prompt_messages("指令", "章节输入", "请撰写。", "deepseek", shared_inputs="报告内容")
+    assert messages == [SystemMessage(content="指令"), HumanMessage(content="报告内容\n章节输入\n请撰写。")]
+
+
+def test_prefixes_are_identical_across_sections():
+    first = build_prompt_messages("指令", "方法章节", "请撰写。", "openai", shared_inputs="报告内容")
+    second = build_prompt_messages("指令", "结果章节", "请撰写。", "openai", shared_inputs="报告内容")
+    assert first[0] == second[0]
+    assert first[1].content.startswith("报告内容\n") and second[1].content.startswith("报告内容\n")
+
+
+def test_anthropic_prompts_mark_cache_breakpoints():
+    system, human = build_prompt_messages("指令", "章节输入", "请撰写。", "anthropic", shared_inputs="报告内容")
+    assert system.content == [{"type": "text", "text": "指令", "cache_control": {"type": "ephemeral"}}]
+    assert human.content == [
+        {"type": "text", "text": "报告内容", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "章节输入\n请撰写。"},
+    ]
+
+
+def test_cached_input_tokens_reads_standard_and_deepseek_usage():
+    usage = {"input_tokens": 100, "output_tokens": 10, "total_tokens": 110}
+    standard = AIMessage(content="", usage_metadata={**usage, "input_token_details": {"cache_read": 60}})
+    deepseek = AIMessage(content="", usage_metadata=usage,
+                         response_metadata={"token_usage": {"prompt_cache_hit_tokens": 40}})
+    assert cached_input_tokens(standard) == (100, 60)
+    assert cached_input_tokens(deepseek) == (100, 40)
+    assert cached_input_tokens(AIMessage(content="")) is None
@@ -0,0 +1,25 @@
+from open_deep_research.utils import cluster_similar_queries, query_bigrams
+
+
+def test_query_bigrams_ignore_case_whitespace_and_punctuation():
+    assert query_bigrams("Deep  Learning!") == query_bigrams("deeplearning")
+    assert query_bigrams("a") == {"a"}
+    assert query_bigrams("  ") == set()
+
+
+def test_near_duplicates_join_the_first_query_of_their_cluster():
+    queries = [
+        "transformer attention mechanism",
+        "Transformer attention mechanisms",
+        "kubernetes pod scheduling",
+        "transformer  attention mechanism?",
+        "Kubernetes pod scheduling",
+    ]
+    assert cluster_similar_queries(queries) == [0, 0, 2, 0, 2]
+
+
+def test_threshold_controls_merging():
+    queries = ["深度学习医疗影像诊断", "深度学习医疗影像应用"]
+    assert cluster_similar_queries(queries, threshold=0.95) == [0, 1]
+    assert cluster_similar_queries(queries, threshold=0.5) == [0, 0]
+    assert cluster_similar_queries([]) == []
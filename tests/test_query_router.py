@@ -0,0 +1,75 @@
+import os
+
+from open_deep_research import agentic_rag, query_router
+from open_deep_research.configuration import Configuration
+from open_deep_research.query_router import QueryRouter
+
+
+class FakeVectorstore:
+    """只支持读取已存储文本块的向量库，调用嵌入接口时直接失败"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.get_calls = 0
+
+    def get(self, include=None):
+        self.get_calls += 1
+        return {"documents": self.documents}
+
+    def similarity_search_with_relevance_scores(self, *args, **kwargs):
+        raise AssertionError("本地路由不应调用嵌入接口")
+
+
+def _write_pdf(directory, name="paper.pdf"):
+    path = directory / name
+    path.write_bytes(b"%PDF-1.4")
+    return path
+
+
+def test_default_router_mode_is_llm():
+    assert Configuration().query_router_mode == "llm"
+
+
+def test_directory_signature_reuses_recent_walk(tmp_path, monkeypatch):
+    _write_pdf(tmp_path)
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(agentic_rag.os, "walk", lambda path: walks.append(path) or real_walk(path))
+
+    first = agentic_rag.directory_signature(str(tmp_path), max_age=60)
+    second = agentic_rag.directory_signature(str(tmp_path), max_age=60)
+    assert first == second and len(first) == 1
+    assert len(walks) == 1
+
+    _write_pdf(tmp_path, "other.pdf")
+    assert len(agentic_rag.directory_signature(str(tmp_path))) == 2
+    assert len(walks) == 2
+
+
+def test_kb_relevance_uses_stored_chunks_without_embeddings(tmp_path, monkeypatch):
+    _write_pdf(tmp_path)
+    vectorstore = FakeVectorstore([
+        "The attention mechanism lets a transformer weigh every token.",
+        "Gradient descent updates parameters along the negative gradient.",
+    ])
+    monkeypatch.setattr(query_router, "get_cached_vectorstore", lambda directory: vectorstore)
+    router = QueryRouter()
+
+    assert router._kb_relevance(["transformer attention mechanism"], str(tmp_path)) == 1.0
+    assert router._kb_relevance(["kubernetes pod scheduling"], str(tmp_path)) == 0.0
+    assert vectorstore.get_calls == 1
+
+
+def test_route_prefers_kb_when_chunks_cover_the_query(tmp_path, monkeypatch):
+    _write_pdf(tmp_path)
+    vectorstore = FakeVectorstore(["Support vector machines maximise the margin between classes."])
+    monkeypatch.setattr(query_router, "get_cached_vectorstore", lambda directory: vectorstore)
+
+    route = QueryRouter().route(["support vector machines margin"], str(tmp_path))
+    assert route.decision == "kb"
+    assert "覆盖率=1.00" in route.reasoning
+
+
+def test_route_goes_to_web_without_documents(tmp_path):
+    route = QueryRouter().route(["support vector machines"], str(tmp_path))
+    assert (route.decision, route.confidence) == ("web", 1.0)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+import open_deep_research.utils as utils
+from open_deep_research.utils import (
+    record_search_responses,
+    replay_search_async,
+    sample_replay_latency,
+    select_and_execute_search,
+)
+
+RESULT = {"url": "http://a.com", "title": "A", "content": "snippet", "raw_content": "full page"}
+
+
+@pytest.fixture
+def recorded_delays(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(utils.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def _replay(fixture_dir, queries, **params):
+    return asyncio.run(replay_search_async(queries, fixture_dir=fixture_dir, **params))
+
+
+def test_seeded_latencies_are_identical_across_runs(tmp_path, recorded_delays):
+    params = {"latency_distribution": "lognormal", "latency_mean": 0.5, "latency_std": 0.2, "seed": 7}
+    _replay(str(tmp_path), ["q1", "q2", "q3"], **params)
+    first_run = list(recorded_delays)
+    recorded_delays.clear()
+    _replay(str(tmp_path), ["q1", "q2", "q3"], **params)
+    assert recorded_delays == first_run
+    assert len(set(first_run)) == 3
+
+
+def test_seeded_latency_does_not_depend_on_query_order(tmp_path, recorded_delays):
+    params = {"latency_distribution": "uniform", "latency_mean": 1.0, "latency_std": 0.5, "seed": 1}
+    _replay(str(tmp_path), ["q1", "q2"], **params)
+    _replay(str(tmp_path), ["q2", "q1"], **params)
+    assert recorded_delays[:2] == recorded_delays[2:][::-1]
+
+
+def test_sample_replay_latency_is_non_negative():
+    assert sample_replay_latency("fixed", 0.3) == 0.3
+    assert sample_replay_latency("none", 5.0) == 0.0
+    assert all(sample_replay_latency("normal", 0.0, 1.0, seed=i) >= 0.0 for i in range(20))
+    with pytest.raises(ValueError):
+        sample_replay_latency("pareto", 1.0)
+
+
+@pytest.mark.parametrize("search_api, raw_content", [("tavily", None), ("exa", "full page")])
+def test_replay_formats_results_like_the_recorded_provider(tmp_path, search_api, raw_content):
+    record_search_responses(str(tmp_path), search_api, ["q"], [{"results": [RESULT]}])
+    sources = asyncio.run(select_and_execute_search("replay", ["q"], {"fixture_dir": str(tmp_path)}))
+    assert [source.raw_content for source in sources] == [raw_content]
+
+
+def test_missing_fixture_returns_error_entry(tmp_path):
+    [response] = _replay(str(tmp_path), ["unknown"])
+    assert response["results"] == []
+    assert "unknown" in response["error"]
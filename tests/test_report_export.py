@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+from open_deep_research.configuration import Configuration
+from open_deep_research.graph import builder, compile_final_report
+from open_deep_research.report_export import (
+    STATUS_COMPLETED,
+    STATUS_PARTIAL,
+    ReportExporter,
+    parse_export_formats,
+)
+from open_deep_research.state import Section
+
+REPORT = "# 标题\n\n## 引言\n\n正文[1]\n\n### 参考文献\n[1] 来源: http://a.com"
+
+
+def test_parse_export_formats():
+    assert parse_export_formats("HTML, md,html,none") == ["html", "markdown"]
+    assert parse_export_formats(["pdf", "odt"]) == ["pdf"]
+    assert parse_export_formats(None) == []
+
+
+def test_default_export_formats_are_a_fresh_list():
+    first, second = Configuration(), Configuration()
+    assert first.export_formats == ["html"]
+    # 默认值不在实例之间共享
+    first.export_formats.append("pdf")
+    assert second.export_formats == ["html"]
+    assert parse_export_formats(Configuration.from_runnable_config({}).export_formats) == ["html"]
+
+
+def test_exporter_writes_files_in_background(tmp_path):
+    exporter = ReportExporter(max_workers=1)
+    job = exporter.submit(REPORT, "测试 主题", ["html", "markdown"], str(tmp_path))
+    status = exporter.wait(job.job_id, timeout=10)
+    assert status["status"] == STATUS_COMPLETED
+    assert status["errors"] == {}
+    with open(status["paths"]["markdown"], encoding="utf-8") as f:
+        assert f.read() == REPORT
+    with open(status["paths"]["html"], encoding="utf-8") as f:
+        assert "<html" in f.read()
+    # 中间文件不会残留
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in status["paths"].values())
+
+
+def test_exporter_records_conversion_errors_on_the_job(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("shutil.which", lambda name: None)
+    exporter = ReportExporter(max_workers=1)
+    job = exporter.submit(REPORT, "主题", ["markdown", "docx"], str(tmp_path))
+    status = exporter.wait(job.job_id, timeout=10)
+    assert status["status"] == STATUS_PARTIAL
+    assert "pandoc" in status["errors"]["docx"]
+    assert capsys.readouterr().out == ""
+
+
+def test_graph_output_exposes_export_job(tmp_path):
+    assert {"final_report", "html_report", "export_job_id"} <= set(builder.compile().output_channels)
+
+    section = Section(name="引言", description="", research=False, content="## 引言\n\n正文", index=0)
+    state = {"topic": "主题", "sections": [section], "completed_sections": [section]}
+    config = {"configurable": {"export_formats": ["markdown"], "export_dir": str(tmp_path)}}
+    output = asyncio.run(compile_final_report(state, config))
+    assert output["export_job_id"]
+    assert output["html_report"] is None
@@ -0,0 +1,32 @@
+from open_deep_research.configuration import Configuration
+from open_deep_research.revision_policy import (
+    REASON_BELOW_THRESHOLD,
+    REASON_MAX_REVISIONS,
+    REASON_PASSED,
+    REASON_PLATEAU,
+    REASON_TOKEN_BUDGET,
+    RevisionPolicy,
+)
+
+
+def test_default_configuration_does_not_stop_on_plateau():
+    policy = RevisionPolicy.from_configuration(Configuration())
+    assert policy.plateau_patience is None
+    decision = policy.decide_revision([60, 60.5, 61], revision_count=2)
+    assert (decision.proceed, decision.reason) == (True, REASON_BELOW_THRESHOLD)
+
+
+def test_plateau_patience_stops_after_consecutive_small_improvements():
+    policy = RevisionPolicy(min_improvement=2.0, plateau_patience=2)
+    assert policy.decide_revision([60, 61], revision_count=1).proceed
+    assert policy.decide_revision([60, 65, 66], revision_count=2).proceed
+    decision = policy.decide_revision([60, 61, 62], revision_count=2)
+    assert (decision.proceed, decision.reason) == (False, REASON_PLATEAU)
+
+
+def test_threshold_and_limits_take_precedence():
+    policy = RevisionPolicy(threshold=85, max_revisions=2, token_budget=100)
+    assert policy.decide_revision([90], revision_count=0).reason == REASON_PASSED
+    assert policy.decide_revision([60, 70], revision_count=2).reason == REASON_MAX_REVISIONS
+    assert policy.decide_revision([60], revision_count=0, tokens_used=100).reason == REASON_TOKEN_BUDGET
+    assert policy.decide_research(tokens_used=100).reason == REASON_TOKEN_BUDGET
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+import open_deep_research.utils as utils
+from open_deep_research.utils import CircuitBreaker, select_and_execute_search
+
+OK = {"query": "q", "results": [{"url": "http://a.com", "title": "A", "content": "alpha", "raw_content": None}]}
+ERROR = {"query": "q", "results": [], "error": "429 Too Many Requests"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(utils.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """按提供商配置返回值或异常，并记录调用顺序"""
+    behaviour, calls = {}, []
+
+    async def fake_execute_search_api(search_api, query_list, params_to_pass):
+        calls.append(search_api)
+        outcome = behaviour[search_api]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return [outcome for _ in query_list]
+
+    monkeypatch.setattr(utils, "_circuit_breakers", {})
+    monkeypatch.setattr(utils, "execute_search_api", fake_execute_search_api)
+    return behaviour, calls
+
+
+def _search(search_api, fallbacks=None, **kwargs):
+    return asyncio.run(select_and_execute_search(search_api, ["q"], {}, fallback_apis=fallbacks, **kwargs))
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("exa", failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker("exa", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker("exa", failure_threshold=3, recovery_timeout=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    clock.now += 31
+    assert breaker.allow_request()
+
+
+def test_release_probe_frees_the_slot_without_an_outcome(clock):
+    breaker = CircuitBreaker("exa", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_failed_primary_falls_back_in_order(providers):
+    behaviour, calls = providers
+    behaviour.update({"exa": ERROR, "arxiv": RuntimeError("down"), "duckduckgo": OK})
+    sources = _search("exa", ["arxiv", "duckduckgo"])
+    assert calls == ["exa", "arxiv", "duckduckgo"]
+    assert [source.url for source in sources] == ["http://a.com"]
+
+
+def test_open_breakers_skip_the_network_and_return_no_sources(providers):
+    behaviour, calls = providers
+    behaviour["exa"] = ERROR
+    for _ in range(3):
+        assert _search("exa") == []
+    assert calls == ["exa"] * 3
+    # 熔断后不再请求提供商，也不会中断图的运行
+    assert _search("exa") == []
+    assert _search("exa") == []
+    assert calls == ["exa"] * 3
+
+
+def test_open_primary_is_skipped_in_favour_of_a_fallback(providers):
+    behaviour, calls = providers
+    behaviour.update({"exa": ERROR, "duckduckgo": OK})
+    for _ in range(3):
+        _search("exa")
+    calls.clear()
+    behaviour["exa"] = OK
+    sources = _search("exa", ["duckduckgo"])
+    assert calls == ["duckduckgo"]
+    assert len(sources) == 1
+
+
+def test_provider_exception_is_reraised_when_nothing_succeeds(providers):
+    behaviour, _ = providers
+    behaviour.update({"tavily": RuntimeError("timeout"), "exa": RuntimeError("refused")})
+    with pytest.raises(RuntimeError, match="refused"):
+        _search("tavily", ["exa"])
+
+
+def test_error_responses_are_preferred_over_raising(providers):
+    behaviour, _ = providers
+    behaviour.update({"tavily": RuntimeError("timeout"), "exa": ERROR})
+    assert _search("tavily", ["exa"]) == []
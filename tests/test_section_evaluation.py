@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+import open_deep_research.graph as graph_module
+from open_deep_research.state import Section
+
+
+class BlockStreamingModel(GenericFakeChatModel):
+    """Streams content as Anthropic-style lists of thinking and text blocks."""
+
+    text: str = ""
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content=[{"type": "thinking", "thinking": "先看总分。", "index": 0}]
+        ))
+        for i in range(0, len(self.text), 5):
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=[{"type": "text", "text": self.text[i:i + 5], "index": 1}]
+            ))
+
+
+def _evaluation(score):
+    return json.dumps({
+        "total_score": score,
+        "dimension_scores": {},
+        "strengths": ["结构清晰"],
+        "weaknesses": ["证据不足"],
+        "improvement_suggestions": ["补充数据"],
+        "missing_content": [],
+        "overall_assessment": "尚可",
+    }, ensure_ascii=False)
+
+
+@pytest.fixture
+def evaluate(monkeypatch):
+    def run(text):
+        model = BlockStreamingModel(messages=iter([]), text=text)
+        monkeypatch.setattr(graph_module, "get_chat_model", lambda *args, **kwargs: model)
+        state = {
+            "topic": "测试主题",
+            "section": Section(name="方法", description="方法细节", research=True, content="正文内容"),
+            "search_iterations": 1,
+        }
+        config = {"configurable": {"planner_provider": "anthropic", "planner_model": "claude-3-7-sonnet-latest"}}
+        return asyncio.run(graph_module.evaluate_section_content(state, config))
+    return run
+
+
+def test_content_text_keeps_only_text_blocks():
+    content = [{"type": "thinking", "thinking": "x"}, {"type": "text", "text": "总分"}, "：90"]
+    assert graph_module._content_text(content) == "总分：90"
+    assert graph_module._content_text("plain") == "plain"
+
+
+def test_evaluation_parses_block_list_chunks(evaluate):
+    command = evaluate(_evaluation(60))
+    assert command.goto == "revise_section_content"
+    assert command.update["section"].evaluation.total_score == 60
+
+
+def test_evaluation_of_block_list_chunks_stops_early_when_passing(evaluate):
+    command = evaluate(_evaluation(92))
+    assert command.goto != "revise_section_content"
+    assert command.update["completed_sections"][0].evaluation.total_score == 92
@@ -0,0 +1,35 @@
+import asyncio
+
+import open_deep_research.graph as graph_module
+from open_deep_research.graph import order_sections
+from open_deep_research.state import Section
+
+
+def _section(name, index=None, content=""):
+    return Section(name=name, description=name, research=False, content=content, index=index)
+
+
+PLANNED = [_section("引言", 0), _section("方法", 1), _section("结果", 2), _section("结论", 3)]
+
+
+def test_completed_sections_follow_the_plan_not_completion_order():
+    completed = [_section("结论", 3, "d"), _section("方法", 1, "b"), _section("引言", 0, "a")]
+    assert [s.name for s in order_sections(PLANNED, completed)] == ["引言", "方法", "结论"]
+
+
+def test_sections_without_index_are_matched_by_name_including_duplicates():
+    planned = [_section("讨论"), _section("方法"), _section("讨论")]
+    completed = [_section("讨论", content="second"), _section("方法"), _section("讨论", content="first")]
+    ordered = order_sections(planned, completed)
+    assert [s.name for s in ordered] == ["讨论", "方法", "讨论"]
+    assert [s.content for s in ordered] == ["second", "", "first"]
+
+
+def test_final_section_semaphore_is_shared_per_loop_and_limit():
+    async def main():
+        first = graph_module._final_section_semaphore(2)
+        assert graph_module._final_section_semaphore(2) is first
+        assert graph_module._final_section_semaphore(3) is not first
+        return first
+
+    assert asyncio.run(main()) is not asyncio.run(main())
@@ -0,0 +1,50 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+import open_deep_research.graph as graph_module
+from open_deep_research.configuration import Configuration
+
+
+class DraftState(TypedDict):
+    content: str
+
+
+def test_section_text_is_streamed_before_the_node_returns():
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="章节 正文 内容")]))
+
+    async def write(state):
+        content, _ = await graph_module._stream_section_content(
+            model, [HumanMessage(content="写")], "openai", 1, Configuration(), "方法", "write"
+        )
+        return {"content": content}
+
+    builder = StateGraph(DraftState)
+    builder.add_node("write", write)
+    builder.add_edge(START, "write")
+    builder.add_edge("write", END)
+    graph = builder.compile()
+
+    async def collect():
+        return [event async for event in graph.astream({"content": ""}, stream_mode=["custom", "updates"])]
+
+    events = asyncio.run(collect())
+    custom = [payload for mode, payload in events if mode == "custom"]
+    tokens = [event["content"] for event in custom if event["type"] == "section_token"]
+    assert len(tokens) > 1 and "".join(tokens) == "章节 正文 内容"
+    assert custom[-1] == {"type": "section_draft", "section": "方法", "stage": "write", "content": "章节 正文 内容"}
+    # 所有custom事件都在节点的状态更新之前到达
+    assert [mode for mode, _ in events][-1] == "updates"
+    assert events[-1][1] == {"write": {"content": "章节 正文 内容"}}
+
+
+def test_streaming_outside_a_graph_still_returns_the_text():
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="独立 调用")]))
+    content, tokens = asyncio.run(graph_module._stream_section_content(
+        model, [HumanMessage(content="写")], "openai", 1, Configuration(), "结果", "revise"
+    ))
+    assert content == "独立 调用"
+    assert tokens > 0
@@ -0,0 +1,46 @@
+import asyncio
+
+import open_deep_research.graph as graph_module
+from open_deep_research.state import SearchQuery, Section, Source
+
+METHOD = Section(name="方法", description="method", research=True)
+RESULT = Section(name="结果", description="results", research=True)
+INTRO = Section(name="引言", description="intro", research=False)
+
+QUERIES = {
+    "方法": ["transformer attention mechanism", "diffusion model sampling"],
+    "结果": ["Transformer attention mechanisms", "imagenet benchmark results"],
+}
+
+
+def _run(monkeypatch, configurable):
+    searches = []
+
+    async def fake_queries(topic, section, configurable):
+        return [SearchQuery(search_query=q) for q in QUERIES[section.name]]
+
+    async def fake_search(configurable, query_list):
+        searches.append(list(query_list))
+        return [Source(id=f"id-{q}", title=q, content=q, query=q) for q in query_list]
+
+    monkeypatch.setattr(graph_module, "_generate_section_queries", fake_queries)
+    monkeypatch.setattr(graph_module, "execute_configured_search", fake_search)
+    state = {"topic": "测试主题", "sections": [INTRO, METHOD, RESULT], "source_pool": []}
+    command = asyncio.run(graph_module.plan_shared_search(state, {"configurable": configurable}))
+    return command, searches
+
+
+def test_unique_queries_run_as_one_batch_and_map_back_by_query(monkeypatch):
+    command, searches = _run(monkeypatch, {})
+    assert searches == [["transformer attention mechanism", "diffusion model sampling", "imagenet benchmark results"]]
+    method, result = (send.arg for send in command.goto)
+    assert [s.id for s in method["sources"]] == ["id-transformer attention mechanism", "id-diffusion model sampling"]
+    assert [s.id for s in result["sources"]] == ["id-transformer attention mechanism", "id-imagenet benchmark results"]
+    assert command.update == {}
+    assert "shared_sources" not in method
+
+
+def test_pre_searched_sources_join_the_source_pool_when_reused(monkeypatch):
+    command, _ = _run(monkeypatch, {"reuse_source_pool": True})
+    assert len(command.update["source_pool"]) == 3
+    assert [s.id for s in command.goto[0].arg["shared_sources"]] == [s.id for s in command.update["source_pool"]]
@@ -0,0 +1,99 @@
+import asyncio
+
+import open_deep_research.graph as graph_module
+from open_deep_research.graph import _shared_pool_payload, search_web, select_pool_sources
+from open_deep_research.state import SearchQuery, Source
+from open_deep_research.utils import select_relevant_sources, text_terms
+
+KUBERNETES = Source(
+    id="k8s",
+    title="Kubernetes pod scheduling",
+    content="Kubernetes schedules pods onto nodes; the kubelet manages containers "
+            "and the control plane handles deployments and autoscaling.",
+)
+TRANSFORMER = Source(
+    id="transformer",
+    title="Attention Is All You Need",
+    content="The Transformer relies entirely on an attention mechanism to draw global dependencies.",
+)
+MEDICAL = Source(id="medical", title="深度学习在医疗影像中的应用", content="卷积神经网络用于医疗影像诊断")
+
+
+def test_text_terms_drops_stop_words_and_folds_plurals():
+    assert text_terms("The latest attention mechanisms for transformers") == {
+        "attention", "mechanism", "transformer"
+    }
+
+
+def test_text_terms_splits_chinese_into_bigrams_at_function_characters():
+    assert text_terms("医疗影像的诊断") == {"医疗", "疗影", "影像", "诊断"}
+
+
+def test_select_relevant_sources_rejects_off_topic_sources():
+    assert select_relevant_sources([KUBERNETES], ["transformer attention mechanism"]) == []
+    assert select_relevant_sources([KUBERNETES], ["protein folding alphabetic"]) == []
+    assert select_relevant_sources([KUBERNETES, MEDICAL], ["蛋白质折叠预测"]) == []
+
+
+def test_select_relevant_sources_keeps_matching_sources_most_relevant_first():
+    sources = [KUBERNETES, TRANSFORMER, MEDICAL]
+    assert select_relevant_sources(sources, ["transformer attention mechanism"]) == [TRANSFORMER]
+    assert select_relevant_sources(sources, ["医疗影像诊断"]) == [MEDICAL]
+    assert select_relevant_sources(sources, ["kubernetes autoscaling", "attention"]) == [KUBERNETES, TRANSFORMER]
+    assert select_relevant_sources(sources, ["kubernetes", "attention"], max_sources=1) == [KUBERNETES]
+
+
+def _pool_state(used_source_ids, sources):
+    pool = [
+        Source(id=f"s{i}", title=f"Transformer attention study {i}", content="transformer attention mechanism")
+        for i in range(4)
+    ]
+    return {
+        "search_queries": [SearchQuery(search_query="transformer attention mechanism")],
+        "shared_sources": pool,
+        "source_pool": [],
+        "sources": sources,
+        "used_source_ids": used_source_ids,
+        "search_iterations": 2,
+    }
+
+
+def _run_select(state):
+    config = {"configurable": {"reuse_source_pool": True, "source_pool_min_sources": 1}}
+    return asyncio.run(select_pool_sources(state, config))
+
+
+def test_select_pool_sources_excludes_sources_from_all_earlier_iterations():
+    current = [Source(id="s1", title="", content="")]
+    command = _run_select(_pool_state(["s0"], current))
+    assert command.goto == "write_section"
+    assert [source.id for source in command.update["sources"]] == ["s2", "s3"]
+    assert command.update["used_source_ids"] == ["s0", "s1"]
+
+
+def test_select_pool_sources_searches_when_every_pool_source_was_used():
+    command = _run_select(_pool_state(["s0", "s1", "s2"], [Source(id="s3", title="", content="")]))
+    assert command.goto == "evaluate_query_source"
+    assert command.update["used_source_ids"] == ["s0", "s1", "s2", "s3"]
+
+
+def test_source_pool_is_only_sent_to_sections_when_reuse_is_enabled():
+    from open_deep_research.configuration import Configuration
+
+    state = {"source_pool": [TRANSFORMER]}
+    assert _shared_pool_payload(state, Configuration()) == {}
+    assert _shared_pool_payload(state, Configuration(reuse_source_pool=True)) == {"shared_sources": [TRANSFORMER]}
+
+
+def test_searches_only_collect_the_source_pool_when_reuse_is_enabled(monkeypatch):
+    async def fake_search(configurable, query_list):
+        return [TRANSFORMER]
+
+    monkeypatch.setattr(graph_module, "execute_configured_search", fake_search)
+    state = {"search_queries": [SearchQuery(search_query="attention")], "search_iterations": 0}
+
+    disabled = asyncio.run(search_web(state, {"configurable": {}}))
+    assert "source_pool" not in disabled
+    assert disabled["sources"] == [TRANSFORMER]
+    enabled = asyncio.run(search_web(state, {"configurable": {"reuse_source_pool": True}}))
+    assert enabled["source_pool"] == [TRANSFORMER]
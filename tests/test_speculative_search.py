@@ -0,0 +1,63 @@
+import asyncio
+
+import open_deep_research.graph as graph
+from open_deep_research.state import SearchQuery, Source
+
+WEB = Source(id="web", title="Web result", content="from the web")
+KB = Source(id="kb", title="知识库检索结果", content="from the knowledge base")
+
+
+def _state():
+    return {"search_queries": [SearchQuery(search_query="attention mechanism")], "search_iterations": 0}
+
+
+def _config(kb_directory):
+    return {"configurable": {"knowledge_base_path": str(kb_directory), "query_router_mode": "llm", "speculative_search": True}}
+
+
+def _patch_search(monkeypatch, decision):
+    calls = {"web": 0, "kb": 0, "llm": 0}
+
+    async def fake_web(configurable, query_list):
+        calls["web"] += 1
+        return [WEB]
+
+    async def fake_kb(query_list, configurable, web_fallback=True):
+        calls["kb"] += 1
+        return [KB]
+
+    async def fake_llm(state, query_list, configurable):
+        calls["llm"] += 1
+        return decision
+
+    monkeypatch.setattr(graph, "execute_configured_search", fake_web)
+    monkeypatch.setattr(graph, "_search_knowledge_base_sources", fake_kb)
+    monkeypatch.setattr(graph, "_route_query_source_with_llm", fake_llm)
+    return calls
+
+
+def test_empty_knowledge_base_searches_the_web_once_without_routing(tmp_path, monkeypatch):
+    calls = _patch_search(monkeypatch, "kb")
+    result = asyncio.run(graph.speculative_search(_state(), _config(tmp_path)))
+    assert calls == {"web": 1, "kb": 0, "llm": 0}
+    assert result["search_decision"] == "search_web"
+    assert [source.id for source in result["sources"]] == ["web"]
+
+
+def test_unbuilt_vectorstore_is_not_searched_speculatively(tmp_path, monkeypatch):
+    (tmp_path / "paper.pdf").write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(graph, "get_cached_vectorstore", lambda directory: None)
+    calls = _patch_search(monkeypatch, "web")
+    result = asyncio.run(graph.speculative_search(_state(), _config(tmp_path)))
+    assert calls == {"web": 1, "kb": 0, "llm": 1}
+    assert result["search_decision"] == "search_web"
+
+
+def test_built_vectorstore_is_searched_speculatively(tmp_path, monkeypatch):
+    (tmp_path / "paper.pdf").write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(graph, "get_cached_vectorstore", lambda directory: object())
+    calls = _patch_search(monkeypatch, "kb")
+    result = asyncio.run(graph.speculative_search(_state(), _config(tmp_path)))
+    assert calls["kb"] == 1 and calls["llm"] == 1
+    assert result["search_decision"] == "search_knowledge_base"
+    assert [source.id for source in result["sources"]] == ["kb"]